@@ -10,6 +10,7 @@ https://docs.djangoproject.com/en/1.11/ref/settings/
 """
 
 import os
+import sys
 import dj_database_url
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
@@ -40,10 +41,11 @@ INSTALLED_APPS = [
     'whitenoise.runserver_nostatic',
     'django.contrib.staticfiles',
     'widget_tweaks',
-    'rankings',
+    'rankings.apps.RankingsConfig',
 ]
 
 MIDDLEWARE = [
+    'rankings.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -69,6 +71,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'rankings.context_processors.membership',
             ],
             'debug': DEBUG,
         },
@@ -94,6 +97,78 @@ AUTH_PASSWORD_VALIDATORS = [
 
 ELO_WEIGHTING = 32
 
+# How much the Glicko-2 volatility can change, between 0.3 and 1.2.
+GLICKO2_TAU = 0.5
+
+# Number of games listed per page, before "Load more".
+GAMES_PAGE_SIZE = 20
+
+# Most points returned for a player's rating history chart.
+RATING_HISTORY_POINTS = 500
+
+# The snapshot_rankings command snapshots a group's leaderboard once it's
+# played this many games since its last snapshot, so a past leaderboard
+# replays about this many games at most, plus a day's.
+SNAPSHOT_GAMES = 50
+
+# Closest matchups listed on a group's predictions, and the most members
+# to show the full table of win probabilities for.
+PREDICTION_MATCHUPS = 10
+PREDICTION_TABLE_SIZE = 20
+
+# Matchmaking avoids pairs that played each other in the group within
+# this many hours, each of their games costing this many ranking points.
+MATCHMAKING_REMATCH_HOURS = 12
+MATCHMAKING_REMATCH_PENALTY = 200
+
+# Live scores are streamed for this many seconds before the browser
+# reconnects, checking every so often for scores posted to other
+# processes.
+LIVE_SCORE_STREAM_SECONDS = 5 * 60
+LIVE_SCORE_POLL_SECONDS = 2
+LIVE_SCORE_RETRY_MS = 1000
+
+# Each stream holds one of a worker's threads (see the Procfile), so only
+# this many are streamed by each process, the rest of the watchers poll.
+LIVE_SCORE_MAX_STREAMS = 10
+
+# A sample of requests are timed by rankings.middleware, keeping the
+# latest to each page in each worker process for the performance page.
+PERFORMANCE_SAMPLE_RATE = 0.1
+PERFORMANCE_WINDOW = 1000
+
+# Rendered group fragments are cached, see rankings/cache.py. Every
+# process serving the site has to share the cache, or the versions one
+# bumps never reach the others, so it's Redis with $CACHE_URL (or Heroku's
+# $REDIS_URL) and the database otherwise, after `createcachetable`. The
+# tests, and local development with CACHE_URL=locmem://, keep a separate
+# cache in each process.
+CACHE_URL = os.environ.get('CACHE_URL', os.environ.get('REDIS_URL', ''))
+TESTING = sys.argv[1:2] == ['test']
+
+if CACHE_URL.startswith(('redis://', 'rediss://')):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': CACHE_URL,
+        },
+    }
+elif TESTING or CACHE_URL == 'locmem://':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'rankings_cache',
+        },
+    }
+
+FRAGMENT_CACHE_TIMEOUT = 60 * 60
+
 # Internationalization
 # https://docs.djangoproject.com/en/1.11/topics/i18n/
 
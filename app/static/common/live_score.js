@@ -0,0 +1,57 @@
+// Keep the live score of a game up to date, and post points to it.
+$(function () {
+    var scoreboard = $('.live-score');
+
+    function show(score) {
+        $.each(score.players, function (i, pk) {
+            scoreboard.find('tr[data-player="' + pk + '"] .points')
+                .text(score.points[i]);
+        });
+
+        // Show the result once the game's finished.
+        if (!score.active) {
+            window.location.reload();
+        }
+    }
+
+    scoreboard.on('click', 'button', function (event) {
+        event.preventDefault();
+
+        var form = $(this).closest('form');
+        var data = form.serialize() + '&points=' + this.value;
+
+        $.post(form.attr('action'), data, show);
+    });
+
+    // Check the score every so often, when it can't be streamed.
+    function poll() {
+        $.getJSON(scoreboard.data('score-url'), function (score) {
+            show(score);
+            if (score.active) {
+                setTimeout(poll, scoreboard.data('poll-ms'));
+            }
+        });
+    }
+
+    if (scoreboard.length && window.EventSource) {
+        var source = new EventSource(scoreboard.data('live-url'));
+
+        source.addEventListener('score', function (event) {
+            var score = JSON.parse(event.data);
+
+            if (!score.active) {
+                source.close();
+            }
+            show(score);
+        });
+
+        // Closed for good when the server is streaming too many scores.
+        source.addEventListener('error', function () {
+            if (source.readyState === EventSource.CLOSED) {
+                poll();
+            }
+        });
+    } else if (scoreboard.length) {
+        poll();
+    }
+});
@@ -0,0 +1,10 @@
+// Replace a "Load more" row with the next page of rows.
+$(document).on('click', '.load-more a', function (event) {
+    event.preventDefault();
+
+    var row = $(this).closest('tr');
+
+    $.get(this.href, function (rows) {
+        row.replaceWith(rows);
+    });
+});
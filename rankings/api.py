@@ -0,0 +1,252 @@
+"""Read-only JSON API, for wall displays and bots polling the rankings."""
+
+import hashlib
+import json
+
+import numpy as np
+from django.conf import settings
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+from django.views.generic import View
+
+from rankings.cache import cached, group_name, player_name, version_tag
+from rankings.models import Game, Group, Player
+from rankings.predictions import balanced_matchups, win_probabilities
+from rankings.views import GamePagesMixin
+
+
+def player_data(player):
+    return {'id': player.pk, 'name': str(player)}
+
+
+def game_data(game):
+    return {
+        'id': game.pk,
+        'date_time': game.date_time.isoformat(),
+        'active': game.active,
+        'winner': player_data(game.winner) if game.winner else None,
+        'home_score': game.home_score,
+        'away_score': game.away_score,
+    }
+
+
+def standing_data(standing):
+    data = {
+        'ranking': standing.ranking,
+        'peak_ranking': standing.peak_ranking,
+        'wins': standing.wins,
+        'losses': standing.losses,
+        'streak': standing.streak,
+        'points_for': standing.points_for,
+        'points_against': standing.points_against,
+    }
+
+    # Group rankings, only uncertain in groups rated with Glicko-2.
+    if hasattr(standing, 'deviation'):
+        data['deviation'] = standing.deviation
+        data['volatility'] = standing.volatility
+
+    return data
+
+
+class APIView(View):
+    """
+    Base view for the JSON API.
+
+    The ETag is the version of the data the view shows, see
+    rankings/cache.py, so an unchanged poll gets a 304 from a couple of
+    cache lookups, without running any queries. The JSON itself is
+    cached under the same version.
+    """
+
+    # The query parameters get_data() reads, any others are ignored.
+    query_params = ()
+
+    def get_version_name(self):
+        """The version name of the data, like 'group:1'."""
+        raise NotImplementedError
+
+    def get_data(self):
+        """The data to return, only called when it isn't cached."""
+        raise NotImplementedError
+
+    def get_digest(self):
+        """Hash of the view, its kwargs and the query parameters it reads."""
+
+        request = [
+            type(self).__name__,
+            sorted(self.kwargs.items()),
+            [self.request.GET.get(param) for param in self.query_params],
+        ]
+
+        return hashlib.md5(json.dumps(request).encode()).hexdigest()
+
+    def get(self, request, *args, **kwargs):
+        name = self.get_version_name()
+        digest = self.get_digest()
+
+        # The ETag is per object, so one only matches for an object that
+        # was there at that version, deleting it bumps the version.
+        @condition(etag_func=lambda request: f'{version_tag(name)}.{digest}')
+        def respond(request):
+            body = cached(
+                name, f'api:{digest}', lambda: json.dumps(self.get_data()))
+
+            response = HttpResponse(body, content_type='application/json')
+            # Pollers can keep the response, but must check it's current.
+            patch_cache_control(response, no_cache=True)
+
+            return response
+
+        return respond(request)
+
+
+class GroupsAPIView(APIView):
+    """Every group."""
+
+    def get_version_name(self):
+        return 'groups'
+
+    def get_data(self):
+        return {
+            'groups': [
+                {
+                    'id': group['pk'],
+                    'name': group['name'],
+                    'url': reverse('api_group', kwargs={'pk': group['pk']}),
+                }
+                for group in Group.objects.order_by('pk').values('pk', 'name')
+            ],
+        }
+
+
+class GroupAPIView(APIView):
+    """A group and its leaderboard."""
+
+    def get_version_name(self):
+        return group_name(self.kwargs['pk'])
+
+    def get_data(self):
+        group = get_object_or_404(Group, id=self.kwargs['pk'])
+
+        return {
+            'id': group.pk,
+            'name': group.name,
+            'rating_engine': group.rating_engine,
+            'games': reverse('api_group_games', kwargs={'pk': group.pk}),
+            'leaderboard': [
+                dict(player_data(ranking.player), **standing_data(ranking))
+                for ranking in group.leaderboard()
+            ],
+        }
+
+
+class GroupPredictionsAPIView(APIView):
+    """
+    The chance each member of a group beats each other member, in the
+    order of the leaderboard, with the closest matchups.
+    """
+
+    def get_version_name(self):
+        return group_name(self.kwargs['pk'])
+
+    def get_data(self):
+        group = get_object_or_404(Group, id=self.kwargs['pk'])
+        rankings = list(group.leaderboard())
+        probabilities = win_probabilities(group, rankings)
+
+        return {
+            'players': [
+                dict(player_data(ranking.player), ranking=ranking.ranking)
+                for ranking in rankings
+            ],
+            'probabilities': np.round(probabilities, 4).tolist(),
+            'matchups': [
+                {
+                    'player': rankings[row].player_id,
+                    'opponent': rankings[column].player_id,
+                    'probability': round(probability, 4),
+                }
+                for row, column, probability in balanced_matchups(
+                    probabilities, settings.PREDICTION_MATCHUPS)
+            ],
+        }
+
+
+class GroupGamesAPIView(GamePagesMixin, APIView):
+    """
+    A page of a group's active or completed games, newest first.
+
+    Takes the same 'status' and 'after' parameters as the group's
+    'load more' links, the status defaults to completed.
+    """
+
+    games_url_name = 'api_group_games'
+    query_params = ('status', 'after')
+
+    def get_version_name(self):
+        return group_name(self.kwargs['pk'])
+
+    def get_games(self):
+        return Game.objects.filter(group=self.kwargs['pk'])
+
+    def game_items(self, games):
+        return [{'game': game} for game in games]
+
+    def get_data(self):
+        active = self.request.GET.get('status') == 'active'
+        page = self.get_game_page(active, self.request.GET.get('after'))
+
+        return {
+            'games': [game_data(item['game']) for item in page['items']],
+            'next': page['next_url'],
+        }
+
+
+class GameAPIView(APIView):
+    """A game, with the rank changes of its players."""
+
+    def get_version_name(self):
+        return group_name(self.kwargs['group_pk'])
+
+    def get_data(self):
+        game = get_object_or_404(
+            Game.objects.select_related('winner'),
+            id=self.kwargs['game_pk'],
+            group=self.kwargs['group_pk'],
+        )
+        changes = {
+            change.player_id: change
+            for change in game.rankchange_set.all()
+        }
+
+        players = []
+        for player in game.players.order_by('pk'):
+            change = changes.get(player.pk)
+            players.append(dict(
+                player_data(player),
+                before=change.before if change else None,
+                after=change.after if change else None,
+            ))
+
+        return dict(game_data(game), players=players)
+
+
+class PlayerAPIView(APIView):
+    """A player's ranking and stats."""
+
+    def get_version_name(self):
+        return player_name(self.kwargs['pk'])
+
+    def get_data(self):
+        player = get_object_or_404(Player, id=self.kwargs['pk'])
+
+        return dict(
+            player_data(player),
+            games_played=player.games_played,
+            ratings=reverse('player_ratings', kwargs={'pk': player.pk}),
+            **standing_data(player)
+        )
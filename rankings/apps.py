@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class RankingsConfig(AppConfig):
     name = 'rankings'
+
+    def ready(self):
+        # Connect the signals that re-rate deleted games.
+        from rankings import corrections  # noqa: F401
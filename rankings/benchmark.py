@@ -0,0 +1,166 @@
+"""Time every page through the test client, see the benchmark command."""
+
+from time import perf_counter
+
+import numpy as np
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.utils import CursorDebugWrapper, CursorWrapper
+
+from rankings.cache import invalidate_all
+
+
+def timed_cursor(wrapper):
+    """
+    :param wrapper: The CursorWrapper class to time.
+    :return: A subclass of it adding the time of each query to the
+    connection's running SQLTimers.
+    """
+
+    class TimedCursor(wrapper):
+        def time(self, run, *args):
+            start = perf_counter()
+            try:
+                return run(*args)
+            finally:
+                seconds = perf_counter() - start
+                for timer in self.db.sql_timers:
+                    timer.add(seconds)
+
+        def execute(self, sql, params=None):
+            return self.time(super(TimedCursor, self).execute, sql, params)
+
+        def executemany(self, sql, param_list):
+            return self.time(
+                super(TimedCursor, self).executemany, sql, param_list)
+
+    return TimedCursor
+
+
+TimedCursor = timed_cursor(CursorWrapper)
+TimedDebugCursor = timed_cursor(CursorDebugWrapper)
+
+
+class SQLTimer(object):
+    """
+    Count the queries run, and time them, while in the context.
+
+    Django only keeps the time of each query to the millisecond, which
+    rounds most of ours down to zero, so they're timed here instead.
+    Timers can be nested, each counting every query run inside it.
+
+    :param debug: Whether to log the queries, as DEBUG does, which the
+    test client's query counts rely on. That costs a little time per
+    query, so live requests aren't logged.
+    """
+
+    def __init__(self, debug=True):
+        self.debug = debug
+        self.queries = 0
+        self.seconds = 0
+
+    def __enter__(self):
+        # The wrapper of this thread's connection, not the shared proxy.
+        self.db = db = connections[DEFAULT_DB_ALIAS]
+
+        if not getattr(db, 'sql_timers', None):
+            db.sql_timers = []
+            db.make_cursor = lambda cursor: TimedCursor(cursor, db)
+            db.make_debug_cursor = lambda cursor: TimedDebugCursor(cursor, db)
+        db.sql_timers.append(self)
+
+        self.force_debug_cursor = db.force_debug_cursor
+        if self.debug:
+            db.force_debug_cursor = True
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        db = self.db
+        db.force_debug_cursor = self.force_debug_cursor
+
+        db.sql_timers.remove(self)
+        if not db.sql_timers:
+            del db.make_cursor
+            del db.make_debug_cursor
+
+    def add(self, seconds):
+        self.queries += 1
+        self.seconds += seconds
+
+
+def milliseconds(seconds):
+    return round(seconds * 1000, 3)
+
+
+def benchmark_request(client, url, data=None, repeat=20, warmup=2, cold=False):
+    """
+    :param client: The django.test.Client to make the requests with.
+    :param url: The url to GET.
+    :param data: Dict of query parameters, or None.
+    :param repeat: The number of timed requests.
+    :param warmup: The number of untimed requests made first.
+    :param cold: Whether to invalidate the cached fragments before each
+    request.
+    :return: Dict of the response status, the latency percentiles, the
+    queries run and the time spent running them.
+    """
+    latencies = []
+    sql_times = []
+    queries = []
+
+    for i in range(warmup + repeat):
+        if cold:
+            invalidate_all()
+
+        with SQLTimer() as timer:
+            start = perf_counter()
+            response = client.get(url, data)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            latency = perf_counter() - start
+
+        if i >= warmup:
+            latencies.append(latency)
+            sql_times.append(timer.seconds)
+            queries.append(timer.queries)
+
+    p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+
+    return {
+        'status': response.status_code,
+        'p50_ms': milliseconds(p50),
+        'p90_ms': milliseconds(p90),
+        'p99_ms': milliseconds(p99),
+        'max_ms': milliseconds(max(latencies)),
+        'mean_ms': milliseconds(np.mean(latencies)),
+        'queries': max(queries),
+        'sql_ms': milliseconds(np.median(sql_times)),
+    }
+
+
+def compare(baseline, results, tolerance):
+    """
+    :param baseline: The 'views' of an earlier run's results.
+    :param results: The 'views' of this run's results.
+    :param tolerance: The fraction p50 latency may grow by, like 0.2.
+    :return: List of messages describing each regression.
+
+    Any growth in the number of queries is a regression, since it's
+    the first sign of a page that doesn't scale.
+    """
+    regressions = []
+
+    for name, result in sorted(results.items()):
+        before = baseline.get(name)
+        if not before:
+            continue
+
+        if result['queries'] > before['queries']:
+            regressions.append(
+                f'{name}: {before["queries"]} -> {result["queries"]} queries')
+
+        if result['p50_ms'] > before['p50_ms'] * (1 + tolerance):
+            regressions.append(
+                f'{name}: p50 {before["p50_ms"]}ms -> {result["p50_ms"]}ms')
+
+    return regressions
@@ -0,0 +1,135 @@
+"""Versioned caching of rendered group fragments."""
+
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+# Fragment cache hits and misses for this process.
+stats = Counter()
+
+GENERATION_KEY = 'rankings:generation'
+
+
+def _generation():
+    """Version shared by every key, bumped by invalidate_all()."""
+
+    generation = cache.get(GENERATION_KEY)
+
+    if generation is None:
+        # Start from the time, rather than 1, so the versions (and the
+        # ETags made from them) aren't reused after the cache is cleared.
+        cache.add(GENERATION_KEY, int(time.time()), None)
+        generation = cache.get(GENERATION_KEY, 1)
+
+    return generation
+
+
+def _version_key(name):
+    return f'rankings:{_generation()}:{name}:version'
+
+
+def get_version(name):
+    """The current version of the named data, like 'group:1'."""
+
+    key = _version_key(name)
+    version = cache.get(key)
+
+    if version is None:
+        cache.add(key, 1, None)
+        version = cache.get(key, 1)
+
+    return version
+
+
+def bump_version(name):
+    """
+    Invalidate every fragment cached for the named data.
+
+    Waits for the current transaction to commit, otherwise another
+    process could cache what it reads before then under the new version.
+    """
+
+    transaction.on_commit(lambda: _bump_version(name))
+
+
+def _bump_version(name):
+    key = _version_key(name)
+
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Nothing has been cached for it yet.
+        cache.add(key, 1, None)
+
+
+def version_tag(name):
+    """The current version of the named data, unique across generations."""
+
+    return f'{_generation()}.{get_version(name)}'
+
+
+def group_name(group_pk):
+    """The version name for a group's fragments."""
+
+    return f'group:{group_pk}'
+
+
+def player_name(player_pk):
+    """The version name for a player's data."""
+
+    return f'player:{player_pk}'
+
+
+def invalidate_groups(group_pks):
+    """Invalidate the fragments of each of the groups."""
+
+    for group_pk in set(group_pks):
+        bump_version(group_name(group_pk))
+
+
+def invalidate_all():
+    """Invalidate every cached fragment, e.g. after a bulk update."""
+
+    transaction.on_commit(_bump_generation)
+
+
+def _bump_generation():
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.add(GENERATION_KEY, 1, None)
+
+
+def cached(name, part, render):
+    """
+    :param name: The version name of the data, like 'group:1'.
+    :param part: The name of the fragment within that data.
+    :param render: Callable to build the fragment when it isn't cached.
+    :return: The cached, or newly built, fragment.
+
+    Fragments are never deleted, bumping the version moves every
+    fragment of the data onto new keys and the old ones expire.
+    """
+    key = f'rankings:{name}:{version_tag(name)}:{part}'
+    fragment = cache.get(key)
+
+    if fragment is None:
+        stats['misses'] += 1
+        fragment = render()
+        cache.set(key, fragment, settings.FRAGMENT_CACHE_TIMEOUT)
+    else:
+        stats['hits'] += 1
+
+    return fragment
+
+
+def cache_stats():
+    """Fragment cache hits and misses for this process."""
+
+    return {
+        'hits': stats['hits'],
+        'misses': stats['misses'],
+    }
@@ -0,0 +1,9 @@
+"""Template context processors for Table Tennis Rankings."""
+
+from rankings.membership import get_membership
+
+
+def membership(request):
+    """The user's roles in the groups, see the membership template tags."""
+
+    return {'membership': get_membership(request)}
@@ -0,0 +1,545 @@
+"""Correct or delete finished games, re-rating only what they change."""
+
+from django.conf import settings
+from django.db.models import F, Max, Q
+from django.db.models.signals import post_delete, pre_delete
+from django.dispatch import receiver
+
+from rankings.cache import invalidate_all
+from rankings.elo import elo, elo_replay
+from rankings.engines import RatingEngine
+from rankings.history import (
+    RatingIndex,
+    bulk_update,
+    finished_games,
+    played_after,
+)
+from rankings.models import (
+    Game,
+    Group,
+    GroupRanking,
+    Player,
+    RankChange,
+    RankingCheckpoint,
+    SnapshotRanking,
+)
+from rankings.snapshots import (
+    current_period_end,
+    current_standings,
+    latest_snapshot,
+)
+
+# Number of rows to read or write per query.
+CHUNK_SIZE = 500
+
+# The GroupRanking fields replayed by rerate_group().
+GROUP_FIELDS = GroupRanking.standing_fields + ['deviation', 'volatility']
+
+
+def chunked(items):
+    """Split the list into lists of at most CHUNK_SIZE items."""
+
+    return [
+        items[start:start + CHUNK_SIZE]
+        for start in range(0, len(items), CHUNK_SIZE)
+    ]
+
+
+def fetch_results(games, results):
+    """
+    Add the finished games to the results.
+
+    :param games: QuerySet of the Games to look up.
+    :param results: Dict of {game_pk: (date_time, game_pk, winner_pk,
+    loser_pk, home_score, away_score)} to add them to, so sorting the
+    values puts them in the order they were played.
+    :return: None
+    """
+    games = games.filter(active=False, winner__isnull=False)
+    details = {
+        pk: (date_time, home_score, away_score)
+        for pk, date_time, home_score, away_score in games.values_list(
+            'pk', 'date_time', 'home_score', 'away_score')
+    }
+
+    for game_pk, winner_pk, loser_pk in finished_games(
+            Game.players.through.objects.filter(game__in=games)):
+        date_time, home_score, away_score = details[game_pk]
+        results[game_pk] = (
+            date_time, game_pk, winner_pk, loser_pk, home_score, away_score)
+
+
+def follow_results(results, player_pks, start, including):
+    """
+    :return: (games, entries) Tuple, the results of the games from start
+    whose players' rankings have changed, in order, and a dict of
+    {player_pk: (date_time, game_pk)} of the game each of their
+    rankings first changed at.
+    """
+    entries = dict.fromkeys(player_pks, start)
+    games = []
+
+    for result in sorted(results.values()):
+        position = result[:2]
+        if position < start or (position == start and not including):
+            continue
+
+        if result[2] in entries or result[3] in entries:
+            entries.setdefault(result[2], position)
+            entries.setdefault(result[3], position)
+            games.append(result)
+
+    return games, entries
+
+
+def downstream_games(game, player_pks, group=None, including=False):
+    """
+    :param game: The Game whose result changed, or was deleted.
+    :param player_pks: The pks of its players.
+    :param group: Only follow the games of this Group, or None for every
+    game.
+    :param including: Whether to include the game itself.
+    :return: (games, entries) Tuple, see follow_results(), of the later
+    finished games to re-rate.
+
+    A later game is re-rated if either of its players has had their
+    ranking changed, by the game or by a game re-rated before it, which
+    changes both of their rankings in turn. Everyone else's games are
+    left alone.
+
+    Each round looks up the games of the players added by the last one,
+    from the earliest game they were added at, until no more are.
+    """
+    start = (game.date_time, game.pk)
+    results = {}
+    fetched = {}
+    entries = dict.fromkeys(player_pks, start)
+
+    while True:
+        # New players, or those found to have changed earlier.
+        players = sorted(
+            player_pk for player_pk, entry in entries.items()
+            if player_pk not in fetched or entry < fetched[player_pk])
+        if not players:
+            return follow_results(results, player_pks, start, including)
+
+        since = min(entries[player_pk] for player_pk in players)
+        for chunk in chunked(players):
+            games = Game.objects.filter(
+                played_after(*since, including=True),
+                players__in=chunk,
+            )
+            if group:
+                games = games.filter(group=group)
+            fetch_results(games, results)
+
+        fetched.update(dict.fromkeys(players, since))
+        _, entries = follow_results(results, player_pks, start, including)
+
+
+def upstream_games(group, games, entries, since):
+    """
+    :param group: The Group the games were played in.
+    :param games: The results of the downstream_games() in the group.
+    :param entries: Dict of the position each of their players' rankings
+    first changed at, see follow_results().
+    :param since: The time of the snapshot the group is replayed from,
+    or None.
+    :return: List of the results of the other games since, that the
+    rankings of the games' players depend on, in order.
+
+    The games of each player before their ranking changed, and of each
+    of those games' players before them, and so on.
+    """
+    downstream = {result[1] for result in games}
+    results = {}
+    fetched = {}
+    needed = dict(entries)
+    upstream = []
+
+    while True:
+        players = sorted(
+            player_pk for player_pk, until in needed.items()
+            if player_pk not in fetched or until > fetched[player_pk])
+        if not players:
+            break
+
+        until = max(needed[player_pk] for player_pk in players)
+        for chunk in chunked(players):
+            games = Game.objects.filter(
+                ~played_after(*until, including=True),
+                group=group,
+                players__in=chunk,
+            )
+            if since:
+                games = games.filter(date_time__gte=since)
+            fetch_results(games, results)
+
+        fetched.update(dict.fromkeys(players, until))
+
+        # Latest first, a game is needed if a ranking after it is.
+        needed = dict(entries)
+        upstream = []
+        for result in sorted(results.values(), reverse=True):
+            position = result[:2]
+            if result[1] in downstream or not any(
+                    needed.get(player_pk, position) > position
+                    for player_pk in result[2:4]):
+                continue
+
+            upstream.append(result)
+            for player_pk in result[2:4]:
+                needed[player_pk] = max(
+                    needed.get(player_pk, position), position)
+
+    return upstream[::-1]
+
+
+def forget_checkpoint(game):
+    """
+    Delete the rebuild_rankings checkpoint if the game was played before
+    it, as the rankings stored with it include the game's old result.
+    The next run then replays every game.
+    """
+    RankingCheckpoint.objects.filter(
+        Q(date_time__gt=game.date_time) |
+        Q(date_time=game.date_time, game_pk__gte=game.pk),
+    ).delete()
+
+
+def rerate_after(game, rankings):
+    """
+    Re-rate the overall rankings of the games after one whose result
+    changed.
+
+    :param game: The Game whose result changed, or was deleted.
+    :param rankings: Dict of {player_pk: ranking} of its players after
+    it with the new result, or before it if it was deleted.
+    :return: The number of games re-rated.
+
+    Only the downstream_games() are replayed, starting each player from
+    their RankChange before their first one. Their RankChanges are
+    rewritten in bulk, along with the rankings and peaks of everyone
+    who played in them.
+    """
+    results, _ = downstream_games(game, list(rankings))
+    games = [result[1:4] for result in results]
+    date_times = {result[1]: result[0] for result in results}
+    forget_checkpoint(game)
+
+    index = RatingIndex()
+    for player_pk in rankings:
+        index.add(player_pk)
+    winners = [index.add(winner_pk) for _, winner_pk, _ in games]
+    losers = [index.add(loser_pk) for _, _, loser_pk in games]
+
+    # Lock everyone being re-rated, in order, like finishing a game.
+    for chunk in chunked(sorted(index.keys)):
+        list(Player.objects.select_for_update().filter(
+            pk__in=chunk,
+        ).order_by('pk').values_list('pk', flat=True))
+
+    changes = {}
+    for chunk in chunked([game_pk for game_pk, _, _ in games]):
+        for pk, game_pk, player_pk, before in RankChange.objects.filter(
+                game__in=chunk,
+        ).values_list('pk', 'game_id', 'player_id', 'before'):
+            changes[game_pk, player_pk] = (pk, before)
+
+    # Players whose rankings hadn't changed join from their first game
+    # re-rated, as they were before it.
+    default = Player._meta.get_field('ranking').default
+    initial = [rankings.get(player_pk) for player_pk in index.keys]
+    for game_pk, winner_pk, loser_pk in games:
+        for player_pk in (winner_pk, loser_pk):
+            if initial[index[player_pk]] is None:
+                change = changes.get((game_pk, player_pk))
+                initial[index[player_pk]] = change[1] if change else default
+
+    ratings, before, after = elo_replay(
+        initial, winners, losers, settings.ELO_WEIGHTING)
+
+    values = {}
+    missing = []
+    for (game_pk, winner_pk, loser_pk), rankings_before, rankings_after in zip(
+            games, before.tolist(), after.tolist()):
+        for player_pk, ranking_before, ranking_after in zip(
+                (winner_pk, loser_pk), rankings_before, rankings_after):
+            change = changes.get((game_pk, player_pk))
+            if change:
+                values[change[0]] = {
+                    'before': ranking_before,
+                    'after': ranking_after,
+                }
+            else:
+                missing.append(RankChange(
+                    game_id=game_pk,
+                    player_id=player_pk,
+                    before=ranking_before,
+                    after=ranking_after,
+                ))
+
+    if values:
+        bulk_update(RankChange, values, CHUNK_SIZE)
+
+    if missing:
+        for change in missing:
+            change.date_time = date_times[change.game_id]
+        RankChange.objects.bulk_create(missing)
+
+    peaks = {}
+    for chunk in chunked(index.keys):
+        peaks.update(RankChange.objects.filter(
+            player__in=chunk,
+        ).values('player').annotate(
+            peak=Max('after'),
+        ).values_list('player', 'peak'))
+
+    bulk_update(
+        Player,
+        {
+            player_pk: {
+                'ranking': ranking,
+                'peak_ranking': max(default, peaks.get(player_pk) or default),
+            }
+            for player_pk, ranking in zip(index.keys, ratings.tolist())
+        },
+        CHUNK_SIZE,
+    )
+
+    return len(games)
+
+
+def result_totals(winner_pk, loser_pk, winner_score, loser_score):
+    """
+    :return: Dict of {player_pk: (wins, losses, points_for,
+    points_against)} the result adds to each player.
+    """
+    winner_score = winner_score or 0
+    loser_score = loser_score or 0
+
+    return {
+        winner_pk: (1, 0, winner_score, loser_score),
+        loser_pk: (0, 1, loser_score, winner_score),
+    }
+
+
+def current_streak(player_pk):
+    """The player's streak, from their finished games, latest first."""
+
+    winners = Game.objects.filter(
+        players=player_pk,
+        active=False,
+        winner__isnull=False,
+    ).order_by('-date_time', '-pk').values_list('winner_id', flat=True)
+
+    streak = 0
+    for winner_pk in winners.iterator():
+        won = winner_pk == player_pk
+        if streak and (streak > 0) != won:
+            break
+        streak += 1 if won else -1
+
+    return streak
+
+
+def update_totals(old, new):
+    """
+    Swap the overall totals of a result for another.
+
+    :param old: The result_totals() to take away.
+    :param new: The result_totals() to add, empty for a deleted game.
+    :return: None
+    """
+    nothing = (0, 0, 0, 0)
+
+    for player_pk in sorted(set(old) | set(new)):
+        change = [
+            added - taken
+            for added, taken in zip(
+                new.get(player_pk, nothing), old.get(player_pk, nothing))
+        ]
+        Player.objects.filter(pk=player_pk).update(
+            wins=F('wins') + change[0],
+            losses=F('losses') + change[1],
+            points_for=F('points_for') + change[2],
+            points_against=F('points_against') + change[3],
+            streak=current_streak(player_pk),
+        )
+
+
+def rerate_group(group, game, player_pks):
+    """
+    Replay the group's rankings of the players the game changed, from
+    the group's latest snapshot before it, the later snapshots have gone
+    with it.
+
+    :param group: The Group the game was played in.
+    :param game: The Game whose result changed, or was deleted.
+    :param player_pks: The pks of the game's players, back to the
+    defaults if it was their only game in the group.
+    :return: None
+
+    Only the downstream_games() in the group are replayed, along with
+    the upstream_games() since the snapshot their players' rankings
+    depend on, as RankChanges only hold the overall rankings.
+    """
+    if group.engine.per_game:
+        snapshot = latest_snapshot(group, current_period_end())
+    else:
+        snapshot = group.rated_until and latest_snapshot(
+            group, group.rated_until)
+
+    games, entries = downstream_games(
+        game, player_pks, group, including=True)
+    played = sorted(games + upstream_games(
+        group, games, entries, snapshot.date_time if snapshot else None))
+    standings = current_standings(group, (
+        [result[1:4] for result in played],
+        {
+            result[1]: (RatingEngine.period(result[0]), *result[4:])
+            for result in played
+        },
+    ))
+
+    values = {}
+    for chunk in chunked(sorted(entries)):
+        for ranking in GroupRanking.objects.select_for_update().filter(
+                group=group,
+                player__in=chunk,
+        ).order_by('player_id'):
+            standing = standings.get(ranking.player_id) or SnapshotRanking()
+            values[ranking.pk] = {
+                field: getattr(standing, field) for field in GROUP_FIELDS
+            }
+
+    if values:
+        bulk_update(GroupRanking, values, CHUNK_SIZE)
+
+
+def correct_game(game, winner, winner_score, loser_score):
+    """
+    Change the result of a finished game.
+
+    :param game: The finished Game, locked for update.
+    :param winner: The Player that really won it.
+    :param winner_score: The winner's score, or None.
+    :param loser_score: The loser's score, or None.
+    :return: The number of later games re-rated, or None if the result
+    hasn't changed.
+
+    A new winner changes the game's rank changes, then re-rates the
+    later games it affects, see rerate_after(). The totals of both
+    players, and the game's group rankings, follow the new result.
+    """
+    if (winner.pk, winner_score, loser_score) == (
+            game.winner_id, game.home_score, game.away_score):
+        return None
+
+    player_pks = sorted(Game.players.through.objects.filter(
+        game=game,
+    ).values_list('player_id', flat=True))
+    loser_pk = next(pk for pk in player_pks if pk != winner.pk)
+    old = result_totals(
+        game.winner_id,
+        next(pk for pk in player_pks if pk != game.winner_id),
+        game.home_score,
+        game.away_score,
+    )
+
+    winner_changed = winner.pk != game.winner_id
+    game.winner = winner
+    game.home_score = winner_score
+    game.away_score = loser_score
+    game.save()
+
+    games = 0
+    if winner_changed:
+        default = Player._meta.get_field('ranking').default
+        before = dict(RankChange.objects.filter(
+            game=game,
+        ).values_list('player_id', 'before'))
+        before = [before.get(pk, default) for pk in (winner.pk, loser_pk)]
+        after = elo(*before, settings.ELO_WEIGHTING)
+
+        for player_pk, ranking_before, ranking_after in zip(
+                (winner.pk, loser_pk), before, after):
+            RankChange.objects.update_or_create(
+                game=game,
+                player_id=player_pk,
+                defaults={
+                    'before': ranking_before,
+                    'after': ranking_after,
+                    'date_time': game.date_time,
+                },
+            )
+
+        games = rerate_after(game, dict(zip((winner.pk, loser_pk), after)))
+
+    update_totals(
+        old, result_totals(winner.pk, loser_pk, winner_score, loser_score))
+
+    if game.group_id:
+        rerate_group(game.group, game, player_pks)
+
+    # The bulk updates skip the signals that invalidate the caches.
+    invalidate_all()
+
+    return games
+
+
+@receiver(pre_delete, sender=Game)
+def remember_deleted_game(sender, instance, **kwargs):
+    """Keep what the finished game changed, before it's deleted."""
+
+    # From the database, the instance could have been loaded before the
+    # game was finished.
+    game = Game.objects.filter(
+        pk=instance.pk,
+        active=False,
+        winner__isnull=False,
+    ).first()
+    if game is None:
+        return
+
+    player_pks = list(Game.players.through.objects.filter(
+        game=game,
+    ).values_list('player_id', flat=True))
+
+    if len(player_pks) != 2 or game.winner_id not in player_pks:
+        return
+
+    instance.deleted_result = (
+        game,
+        player_pks,
+        dict(RankChange.objects.filter(
+            game=game,
+        ).values_list('player_id', 'before')),
+    )
+
+
+@receiver(post_delete, sender=Game)
+def rerate_deleted_game(sender, instance, **kwargs):
+    """Re-rate what the deleted game changed, as if it was never played."""
+
+    if not hasattr(instance, 'deleted_result'):
+        return
+
+    game, player_pks, before = instance.deleted_result
+    default = Player._meta.get_field('ranking').default
+    loser_pk = next(pk for pk in player_pks if pk != game.winner_id)
+
+    rerate_after(game, {
+        player_pk: before.get(player_pk, default) for player_pk in player_pks
+    })
+    update_totals(
+        result_totals(
+            game.winner_id, loser_pk, game.home_score, game.away_score),
+        {},
+    )
+
+    group = Group.objects.filter(pk=game.group_id).first()
+    if group:
+        rerate_group(group, game, player_pks)
+
+    invalidate_all()
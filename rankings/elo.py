@@ -1,3 +1,31 @@
+"""ELO rating calculations, for single games and batches of games."""
+
+import numpy as np
+
+# The lowest ranking a player can fall to.
+RANKING_FLOOR = 100
+
+# elo_replay() only rates games with numpy when the waves it schedules
+# hold at least this many games on average. Each wave costs about as much
+# as rating 8 games with elo(), and 50,000 random games broke even at
+# around 15 per wave.
+MIN_WAVE_SIZE = 16
+
+# Adds a game's points to its winner and takes them from its loser.
+WINNER_LOSER = np.array([1.0, -1.0])
+
+
+def expected_score(rank, opponent_rank):
+    """
+    :param rank: The ranking (or array of rankings) of the player.
+    :param opponent_rank: The ranking (or array of rankings) of the opponent.
+    :return: The probability that the player beats the opponent.
+
+    Works with plain floats as well as NumPy arrays.
+    """
+    return 1 / (1 + 10 ** ((opponent_rank - rank) / 400))
+
+
 def elo(winner_rank, loser_rank, weighting):
     """
     :param winner: The Player that won the match.
@@ -7,22 +35,165 @@ def elo(winner_rank, loser_rank, weighting):
 
     This follows the ELO ranking method.
     """
-    winner_rank_transformed = 10 ** (winner_rank / 400)
-    opponent_rank_transformed = 10 ** (loser_rank / 400)
-    transformed_sum = winner_rank_transformed + opponent_rank_transformed
-
-    winner_score = winner_rank_transformed / transformed_sum
-    loser_score = opponent_rank_transformed / transformed_sum
+    # The points the winner takes from the loser, scaled by how
+    # unexpected the loser's defeat was.
+    delta = weighting * expected_score(loser_rank, winner_rank)
 
-    winner_rank = winner_rank + weighting * (
-        1 - winner_score)
-    loser_rank = loser_rank - weighting * loser_score
+    winner_rank = winner_rank + delta
+    loser_rank = loser_rank - delta
 
     # Set a floor of 100 for the rankings.
-    winner_rank = 100 if winner_rank < 100 else winner_rank
-    loser_rank = 100 if loser_rank < 100 else loser_rank
+    winner_rank = RANKING_FLOOR if winner_rank < RANKING_FLOOR else winner_rank
+    loser_rank = RANKING_FLOOR if loser_rank < RANKING_FLOOR else loser_rank
 
-    winner_rank = float('{result:.2f}'.format(result=winner_rank))
-    loser_rank = float('{result:.2f}'.format(result=loser_rank))
+    # Round to two decimal places the same way numpy.round does, so
+    # elo_batch gives identical results.
+    winner_rank = round(winner_rank * 100) / 100
+    loser_rank = round(loser_rank * 100) / 100
 
     return winner_rank, loser_rank
+
+
+def elo_batch(winner_ranks, loser_ranks, weighting):
+    """
+    :param winner_ranks: Array of rankings for the winner of each game.
+    :param loser_ranks: Array of rankings for the loser of each game.
+    :param weighting: The weighting factor to suit your comp.
+    :return: (winner_new_ranks, loser_new_ranks) Tuple of arrays.
+
+    Vectorised version of elo(), the games are treated as independent
+    of each other. Use elo_replay() when a player can appear in more
+    than one of the games.
+    """
+    winner_ranks = np.asarray(winner_ranks, dtype=np.float64)
+    loser_ranks = np.asarray(loser_ranks, dtype=np.float64)
+
+    delta = weighting * expected_score(loser_ranks, winner_ranks)
+
+    winner_ranks = np.maximum(winner_ranks + delta, RANKING_FLOOR)
+    loser_ranks = np.maximum(loser_ranks - delta, RANKING_FLOOR)
+
+    return np.round(winner_ranks, 2), np.round(loser_ranks, 2)
+
+
+def schedule_waves(winners, losers):
+    """
+    :param winners: Array of player indexes for the winner of each game.
+    :param losers: Array of player indexes for the loser of each game.
+    :return: Array holding the wave number of each game.
+
+    Games are split into waves so that no player appears twice in the
+    same wave, while each player's games keep their original order
+    across waves. All of the games in a wave can then be rated at once.
+    """
+    winners = np.asarray(winners, dtype=np.intp)
+    losers = np.asarray(losers, dtype=np.intp)
+
+    size = int(max(winners.max(), losers.max())) + 1 if len(winners) else 0
+    # One more than the wave of each player's latest game, kept as plain
+    # ints as this is the one loop over every game.
+    next_wave = [0] * size
+    waves = []
+    append = waves.append
+
+    for winner, loser in zip(winners.tolist(), losers.tolist()):
+        wave = next_wave[winner]
+        other = next_wave[loser]
+        if other > wave:
+            wave = other
+        append(wave)
+        next_wave[winner] = next_wave[loser] = wave + 1
+
+    return np.array(waves, dtype=np.intp)
+
+
+def elo_sequence(ratings, winners, losers, weighting):
+    """
+    :param ratings: Array of starting rankings, indexed by player.
+    :param winners: Array of player indexes for the winner of each game.
+    :param losers: Array of player indexes for the loser of each game.
+    :param weighting: The weighting factor to suit your comp.
+    :return: (ratings, before, after) Tuple of arrays, as elo_replay().
+
+    Calls elo() for each game in turn, on plain floats. Faster than
+    rating waves of a few games each with numpy.
+    """
+    ratings = np.asarray(ratings, dtype=np.float64).tolist()
+    # Flat lists of (winner, loser) pairs, much quicker to copy into
+    # arrays than a list of tuples.
+    before = []
+    after = []
+
+    for winner, loser in zip(
+            np.asarray(winners).tolist(), np.asarray(losers).tolist()):
+        ranks = (ratings[winner], ratings[loser])
+        ratings[winner], ratings[loser] = elo(*ranks, weighting)
+        before.extend(ranks)
+        after.extend((ratings[winner], ratings[loser]))
+
+    return (
+        np.array(ratings, dtype=np.float64),
+        np.array(before, dtype=np.float64).reshape(-1, 2),
+        np.array(after, dtype=np.float64).reshape(-1, 2),
+    )
+
+
+def elo_replay(ratings, winners, losers, weighting):
+    """
+    :param ratings: Array of starting rankings, indexed by player.
+    :param winners: Array of player indexes for the winner of each game.
+    :param losers: Array of player indexes for the loser of each game.
+    :param weighting: The weighting factor to suit your comp.
+    :return: (ratings, before, after) Tuple of arrays.
+
+    Replays the games in order, so a player's later games use the
+    ranking from their earlier ones. ``ratings`` holds the final
+    rankings, ``before`` and ``after`` have one row per game holding
+    the (winner, loser) rankings either side of that game.
+
+    Results are identical to calling elo() for each game in turn, which
+    it falls back to when the waves it schedules hold fewer than
+    MIN_WAVE_SIZE games on average.
+    """
+    ratings = np.array(ratings, dtype=np.float64)
+    winners = np.asarray(winners, dtype=np.intp)
+    losers = np.asarray(losers, dtype=np.intp)
+    count = len(winners)
+
+    if not count:
+        return ratings, np.empty((0, 2)), np.empty((0, 2))
+
+    waves = schedule_waves(winners, losers)
+    wave_count = int(waves.max()) + 1
+    if count < MIN_WAVE_SIZE * wave_count:
+        return elo_sequence(ratings, winners, losers, weighting)
+
+    # Rate the games in wave order, so each wave is a slice.
+    order = np.argsort(waves, kind='mergesort')
+    bounds = np.searchsorted(
+        waves[order], np.arange(wave_count + 1)).tolist()
+    # (winner, loser) of each game, so a wave is one gather and one
+    # scatter.
+    players = np.stack((winners, losers), axis=1)[order]
+    before = np.empty((count, 2), dtype=np.float64)
+    after = np.empty((count, 2), dtype=np.float64)
+
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        wave = players[start:end]
+        ranks = ratings[wave]
+        before[start:end] = ranks
+
+        # As elo_batch(), on both columns at once.
+        delta = weighting * expected_score(ranks[:, 1], ranks[:, 0])
+        ranks = ranks + delta[:, np.newaxis] * WINNER_LOSER
+        np.maximum(ranks, RANKING_FLOOR, out=ranks)
+        np.round(ranks, 2, out=ranks)
+
+        ratings[wave] = ranks
+        after[start:end] = ranks
+
+    # Back in the order the games were played.
+    unsorted = np.empty_like(order)
+    unsorted[order] = np.arange(count)
+
+    return ratings, before[unsorted], after[unsorted]
@@ -0,0 +1,304 @@
+"""Rating engines, selectable per group."""
+
+import math
+from datetime import datetime, time
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from rankings.elo import elo, elo_replay
+
+
+class RatingEngine(object):
+    """
+    Base class for the rating engines.
+
+    Engines rate arrays of ratings, indexed by player, with a dict of
+    {field: array} holding each of the engine's fields.
+
+    Engines rated per game update the ratings as each game is finished.
+    The others leave the ratings alone until the games of a whole
+    rating period (a day, in the league's time zone) are settled at
+    once, by the settle_ratings command.
+    """
+
+    name = None
+    label = None
+    per_game = True
+
+    # The GroupRanking fields the engine rates, and their defaults.
+    fields = {'ranking': 1000}
+
+    def rate(self, ratings, winners, losers):
+        """
+        :param ratings: Dict of {field: array of each player's value}.
+        :param winners: Array of player indexes for the winner of each game.
+        :param losers: Array of player indexes for the loser of each game.
+        :return: (ratings, after) Tuple, the new ratings and an array
+        with a row per game of the (winner, loser) rankings after it.
+
+        Per game engines rate the games in order, the others rate them
+        all as a single rating period.
+        """
+        raise NotImplementedError
+
+    def win_probabilities(self, ratings):
+        """
+        :param ratings: Dict of {field: array of each player's value}.
+        :return: Matrix of the probability each player (the row) beats
+        each other player (the column), with 0.5 against themselves.
+        """
+        raise NotImplementedError
+
+    def play(self, winner, loser):
+        """Rate a single finished game, between two standings."""
+
+        if not self.per_game:
+            return
+
+        ratings, _ = self.rate(
+            {
+                field: np.array([getattr(winner, field), getattr(loser, field)])
+                for field in self.fields
+            },
+            [0],
+            [1],
+        )
+
+        for field, values in ratings.items():
+            setattr(winner, field, values[0])
+            setattr(loser, field, values[1])
+
+    def replay(self, ratings, winners, losers, periods, first_period=None,
+               last_period=None):
+        """
+        :param ratings: Dict of {field: array of each player's value}.
+        :param winners: Array of player indexes for the winner of each game.
+        :param losers: Array of player indexes for the loser of each game.
+        :param periods: Array of the rating period of each game, see
+        period(), in order.
+        :param first_period: The first period to settle, by default the
+        period of the first game.
+        :param last_period: The last period to settle, by default the
+        period of the last game. Every period between them is settled,
+        with or without games.
+        :return: (ratings, after) Tuple, like rate().
+
+        Rates a whole history of games, which must all be in the
+        periods settled.
+        """
+        if self.per_game:
+            return self.rate(ratings, winners, losers)
+
+        winners = np.asarray(winners, dtype=np.intp)
+        losers = np.asarray(losers, dtype=np.intp)
+        periods = np.asarray(periods, dtype=np.intp)
+        after = np.empty((len(winners), 2), dtype=np.float64)
+
+        if first_period is None:
+            first_period = periods[0] if len(periods) else last_period
+        if last_period is None:
+            last_period = periods[-1] if len(periods) else first_period
+        if first_period is None or first_period > last_period:
+            return ratings, after
+
+        bounds = np.searchsorted(
+            periods, np.arange(first_period, last_period + 2))
+
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            ratings, after[start:end] = self.rate(
+                ratings, winners[start:end], losers[start:end])
+
+        return ratings, after
+
+    @staticmethod
+    def period(date_time):
+        """The rating period, a day in the league's time zone, of a time."""
+
+        return timezone.localtime(date_time).date().toordinal()
+
+    @staticmethod
+    def period_start(period):
+        """The time the given rating period starts."""
+
+        return timezone.make_aware(
+            datetime.combine(datetime.fromordinal(period).date(), time()))
+
+
+class EloEngine(RatingEngine):
+    """The original Elo rankings, see rankings/elo.py."""
+
+    name = 'elo'
+    label = 'Elo'
+
+    def rate(self, ratings, winners, losers):
+        rankings, _, after = elo_replay(
+            ratings['ranking'], winners, losers, settings.ELO_WEIGHTING)
+
+        return {'ranking': rankings}, after
+
+    def win_probabilities(self, ratings):
+        rankings = np.asarray(ratings['ranking'], dtype=np.float64)
+
+        # The expectation elo() uses, see expected_score(), for every pair
+        # at once. 10 ** ((opponent - rank) / 400) is the outer product of
+        # each player's power, rather than a power for every pair.
+        powers = 10 ** (rankings / 400)
+
+        return 1 / (1 + np.outer(1 / powers, powers))
+
+    def play(self, winner, loser):
+        # Much quicker than numpy for a single game, with the same result.
+        winner.ranking, loser.ranking = elo(
+            winner.ranking, loser.ranking, settings.ELO_WEIGHTING)
+
+
+class Glicko2Engine(RatingEngine):
+    """
+    Glickman's Glicko-2, rating each player with a deviation (how
+    uncertain their ranking is) and a volatility (how erratic their
+    results are). See http://www.glicko.net/glicko/glicko2.pdf
+
+    Each rating period is rated as a single vectorised batch, players
+    who don't play in a period become less certain.
+    """
+
+    name = 'glicko2'
+    label = 'Glicko-2'
+    per_game = False
+
+    fields = {
+        'ranking': 1000,
+        'deviation': 350,
+        'volatility': 0.06,
+    }
+
+    # Converts between rankings and the Glicko-2 scale.
+    scale = 400 / math.log(10)
+
+    # Convergence tolerance of the volatility.
+    epsilon = 1e-6
+
+    def __init__(self, tau=None):
+        self.tau = tau if tau is not None else settings.GLICKO2_TAU
+
+    def rate(self, ratings, winners, losers):
+        winners = np.asarray(winners, dtype=np.intp)
+        losers = np.asarray(losers, dtype=np.intp)
+        centre = self.fields['ranking']
+
+        mu = (np.asarray(ratings['ranking'], dtype=np.float64) - centre) / self.scale
+        phi = np.asarray(ratings['deviation'], dtype=np.float64) / self.scale
+        sigma = np.asarray(ratings['volatility'], dtype=np.float64)
+        size = len(mu)
+
+        # Each game, from the winner's side then the loser's.
+        players = np.concatenate([winners, losers])
+        opponents = np.concatenate([losers, winners])
+        scores = np.concatenate([np.ones(len(winners)), np.zeros(len(losers))])
+
+        g = 1 / np.sqrt(1 + 3 * phi[opponents] ** 2 / math.pi ** 2)
+        expected = 1 / (1 + np.exp(-g * (mu[players] - mu[opponents])))
+
+        v_inverse = np.bincount(
+            players, g ** 2 * expected * (1 - expected), minlength=size)
+        improvement = np.bincount(
+            players, g * (scores - expected), minlength=size)
+
+        played = v_inverse > 0
+        v = 1 / v_inverse[played]
+        delta = v * improvement[played]
+
+        new_sigma = sigma.copy()
+        new_sigma[played] = self.volatility(
+            delta, phi[played], v, sigma[played])
+
+        # Players without games only become less certain, up to the
+        # deviation of a new player.
+        phi_star = np.minimum(
+            np.sqrt(phi ** 2 + new_sigma ** 2),
+            self.fields['deviation'] / self.scale,
+        )
+        new_phi = phi_star.copy()
+        new_mu = mu.copy()
+        new_phi[played] = 1 / np.sqrt(1 / phi_star[played] ** 2 + v_inverse[played])
+        new_mu[played] = mu[played] + new_phi[played] ** 2 * improvement[played]
+
+        rankings = np.round(new_mu * self.scale + centre, 2)
+        after = np.column_stack([rankings[winners], rankings[losers]])
+
+        return {
+            'ranking': rankings,
+            'deviation': np.round(new_phi * self.scale, 2),
+            'volatility': new_sigma,
+        }, after
+
+    def win_probabilities(self, ratings):
+        mu = np.asarray(ratings['ranking'], dtype=np.float64) / self.scale
+        phi = np.asarray(ratings['deviation'], dtype=np.float64) / self.scale
+
+        # Both players' deviations make the result less certain.
+        phi = np.sqrt(phi[:, np.newaxis] ** 2 + phi[np.newaxis, :] ** 2)
+        g = 1 / np.sqrt(1 + 3 * phi ** 2 / math.pi ** 2)
+
+        return 1 / (1 + np.exp(-g * (mu[:, np.newaxis] - mu[np.newaxis, :])))
+
+    def volatility(self, delta, phi, v, sigma):
+        """The new volatilities, by the Illinois algorithm (step 5)."""
+
+        a = np.log(sigma ** 2)
+        tau = self.tau
+
+        def f(x):
+            ex = np.exp(x)
+            return (
+                ex * (delta ** 2 - phi ** 2 - v - ex) /
+                (2 * (phi ** 2 + v + ex) ** 2) -
+                (x - a) / tau ** 2
+            )
+
+        big = delta ** 2 > phi ** 2 + v
+        upper = np.where(big, np.log(np.maximum(delta ** 2 - phi ** 2 - v, 1e-300)), 0)
+
+        k = np.ones(len(a))
+        low = ~big & (f(a - k * tau) < 0)
+        while low.any():
+            k[low] += 1
+            low = ~big & (f(a - k * tau) < 0)
+        upper = np.where(big, upper, a - k * tau)
+
+        lower = a.copy()
+        f_lower = f(lower)
+        f_upper = f(upper)
+
+        while True:
+            active = np.abs(upper - lower) > self.epsilon
+            if not active.any():
+                break
+
+            c = lower + (lower - upper) * f_lower / (f_upper - f_lower)
+            f_c = f(c)
+
+            swap = active & (f_c * f_upper <= 0)
+            halve = active & ~swap
+            lower = np.where(swap, upper, lower)
+            f_lower = np.where(swap, f_upper, np.where(halve, f_lower / 2, f_lower))
+            upper = np.where(active, c, upper)
+            f_upper = np.where(active, f_c, f_upper)
+
+        return np.exp(lower / 2)
+
+
+ENGINES = {
+    engine.name: engine
+    for engine in (EloEngine, Glicko2Engine)
+}
+
+ENGINE_CHOICES = [(name, engine.label) for name, engine in ENGINES.items()]
+
+
+def get_engine(name):
+    """An instance of the named rating engine."""
+
+    return ENGINES[name]()
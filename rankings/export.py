@@ -0,0 +1,131 @@
+"""Streaming export of a group's finished games."""
+
+import csv
+import json
+from itertools import groupby
+
+from rankings.models import Game, RankChange
+
+# The first columns are the ones import_games reads.
+FIELDS = [
+    'date_time',
+    'group',
+    'winner',
+    'loser',
+    'winner_score',
+    'loser_score',
+    'winner_before',
+    'winner_after',
+    'loser_before',
+    'loser_after',
+    'game',
+]
+
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+
+def game_rows(group):
+    """
+    :param group: The Group to export.
+    :return: Generator of a dict of FIELDS for each finished game, in
+    the order they were played.
+
+    The players and the rank changes of the games are streamed side by
+    side with iterator(), in the same order, so only one game is held
+    in memory at a time.
+    """
+    order = ['game__date_time', 'game_id']
+    players = Game.players.through.objects.filter(
+        game__group=group,
+        game__active=False,
+    ).order_by(*order).values_list(
+        'game_id',
+        'game__date_time',
+        'game__winner_id',
+        'game__home_score',
+        'game__away_score',
+        'player_id',
+        'player__user__username',
+    ).iterator()
+    changes = groupby(RankChange.objects.filter(
+        game__group=group,
+        game__active=False,
+    ).order_by(*order).values_list(
+        'game__date_time',
+        'game_id',
+        'player_id',
+        'before',
+        'after',
+    ).iterator(), lambda change: change[:2])
+
+    # The (date_time, game pk) and changes of the next game with any.
+    changes_key, game_changes = next(changes, (None, None))
+
+    for game_pk, rows in groupby(players, lambda row: row[0]):
+        rows = list(rows)
+        _, date_time, winner_pk, winner_score, loser_score, _, _ = rows[0]
+        usernames = {row[5]: row[6] for row in rows}
+
+        # Catch the changes up with this game.
+        key = (date_time, game_pk)
+        while changes_key is not None and changes_key < key:
+            changes_key, game_changes = next(changes, (None, None))
+
+        if changes_key == key:
+            deltas = {
+                player_pk: (before, after)
+                for _, _, player_pk, before, after in game_changes
+            }
+        else:
+            deltas = {}
+
+        if len(usernames) != 2 or winner_pk not in usernames:
+            continue
+
+        loser_pk = next(pk for pk in usernames if pk != winner_pk)
+        winner_change = deltas.get(winner_pk, (None, None))
+        loser_change = deltas.get(loser_pk, (None, None))
+
+        yield {
+            'date_time': date_time.isoformat(),
+            'group': group.name,
+            'winner': usernames[winner_pk],
+            'loser': usernames[loser_pk],
+            'winner_score': winner_score,
+            'loser_score': loser_score,
+            'winner_before': winner_change[0],
+            'winner_after': winner_change[1],
+            'loser_before': loser_change[0],
+            'loser_after': loser_change[1],
+            'game': game_pk,
+        }
+
+
+class Echo(object):
+    """File-like object returning what's written, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def export_lines(group, file_format):
+    """
+    :param group: The Group to export.
+    :param file_format: 'csv' or 'jsonl'.
+    :return: Generator of the lines of the export.
+
+    The CSV header is yielded before any query runs, so a response
+    streaming the lines starts straight away.
+    """
+    if file_format == 'csv':
+        writer = csv.DictWriter(Echo(), FIELDS)
+        yield writer.writerow(dict(zip(FIELDS, FIELDS)))
+
+        for row in game_rows(group):
+            yield writer.writerow(row)
+    else:
+        for row in game_rows(group):
+            yield json.dumps(row) + '\n'
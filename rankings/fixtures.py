@@ -0,0 +1,79 @@
+"""Tournament fixtures, the games to play between a set of players."""
+
+
+def round_robin(players):
+    """
+    :param players: List of the players, like pks, best seed first.
+    :return: List of rounds, each a list of (player, opponent) Tuples.
+
+    Everyone plays everyone once, by the circle method: the first player
+    stays put while the rest rotate around them. With an odd number of
+    players, the one drawn against None sits the round out.
+    """
+    players = list(players)
+    if len(players) % 2:
+        players.append(None)
+
+    size = len(players)
+    rounds = []
+
+    for _ in range(size - 1):
+        pairs = [
+            (players[i], players[size - 1 - i])
+            for i in range(size // 2)
+        ]
+        rounds.append([pair for pair in pairs if None not in pair])
+
+        # Keep the first player where they are, rotate the rest.
+        players = [players[0], players[-1]] + players[1:-1]
+
+    return rounds
+
+
+def bracket_order(size):
+    """
+    :param size: The size of the bracket, a power of two.
+    :return: List of the seeds (0 first) in bracket order, so the top
+    two seeds can only meet in the final.
+    """
+    order = [0]
+
+    while len(order) < size:
+        total = 2 * len(order) - 1
+        order = [seed for top in order for seed in (top, total - top)]
+
+    return order
+
+
+def elimination_round(players):
+    """
+    :param players: List of the players left in, best seed first.
+    :return: (pairs, byes) Tuple, a list of (player, opponent) Tuples to
+    play this round, and the list of players through to the next round
+    without playing.
+
+    The bracket is filled out to a power of two, and the top seeds are
+    drawn against the gaps. Call it again with the winners and the
+    byes, best seed first, for each following round.
+    """
+    players = list(players)
+    size = 1
+    while size < len(players):
+        size *= 2
+
+    seeds = bracket_order(size)
+    pairs = []
+    byes = []
+
+    for i in range(0, size, 2):
+        player, opponent = (
+            players[seed] if seed < len(players) else None
+            for seed in seeds[i:i + 2]
+        )
+
+        if player is None or opponent is None:
+            byes.append(opponent if player is None else player)
+        else:
+            pairs.append((player, opponent))
+
+    return pairs, [player for player in byes if player is not None]
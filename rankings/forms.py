@@ -1,8 +1,11 @@
 """Forms for Rankings app."""
 
+from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
 
+from rankings.models import Player
+
 
 class RegistrationForm(UserCreationForm):
     """Simple Registration Form."""
@@ -14,3 +17,41 @@ class RegistrationForm(UserCreationForm):
             'first_name',
             'last_name',
         ]
+
+
+class FixturesForm(forms.Form):
+    """Pick the players and format of a tournament in a group."""
+
+    FORMATS = [
+        ('round_robin', 'Round robin'),
+        ('elimination', 'Single elimination'),
+    ]
+
+    format = forms.ChoiceField(
+        choices=FORMATS,
+    )
+    players = forms.ModelMultipleChoiceField(
+        queryset=Player.objects.none(),
+    )
+
+    def __init__(self, group, *args, **kwargs):
+        super(FixturesForm, self).__init__(*args, **kwargs)
+
+        self.fields['players'].queryset = group.players.all()
+
+    def clean_players(self):
+        players = self.cleaned_data['players']
+        if len(players) < 2:
+            raise forms.ValidationError('A tournament needs two players.')
+
+        return players
+
+
+class LeaderboardForm(forms.Form):
+    """Pick the day to show a group's leaderboard as of."""
+
+    date = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={'type': 'date'}),
+        help_text='The leaderboard at the end of the day, now if blank.',
+    )
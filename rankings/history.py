@@ -0,0 +1,277 @@
+"""Helpers for replaying the finished game history."""
+
+from collections import defaultdict, deque
+from itertools import groupby
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Case, Max, Q, Value, When
+from django.utils import timezone
+
+
+def finished_games(game_players):
+    """
+    :param game_players: QuerySet of Game.players through rows to replay.
+    :return: Generator of (game_pk, winner_pk, loser_pk) Tuples.
+
+    Yields the finished games in the order they were played, streaming
+    the rows with iterator() (a server-side cursor on PostgreSQL). Games
+    without a winner or without exactly two players can't be rated and
+    are skipped.
+
+    Takes the through model's QuerySet, rather than importing it, so it
+    can be used from migrations with the historical models.
+    """
+    rows = game_players.filter(
+        game__active=False,
+        game__winner__isnull=False,
+    ).order_by(
+        'game__date_time',
+        'game_id',
+    ).values_list(
+        'game_id',
+        'game__winner_id',
+        'player_id',
+    )
+
+    for game_pk, game_rows in groupby(rows.iterator(), lambda row: row[0]):
+        game_rows = list(game_rows)
+        winner_pk = game_rows[0][1]
+        player_pks = [row[2] for row in game_rows]
+
+        if len(player_pks) != 2 or winner_pk not in player_pks:
+            continue
+
+        loser_pk = player_pks[0] if player_pks[1] == winner_pk else player_pks[1]
+
+        yield game_pk, winner_pk, loser_pk
+
+
+def played_after(date_time, game_pk, prefix='', including=False):
+    """
+    Filter for the games (or related rows) played after the given game,
+    or from it on if including it.
+    """
+    lookup = 'gte' if including else 'gt'
+
+    return (
+        Q(**{f'{prefix}date_time__gt': date_time}) |
+        Q(**{
+            f'{prefix}date_time': date_time,
+            f'{prefix}pk__{lookup}': game_pk,
+        })
+    )
+
+
+class RatingIndex(object):
+    """Maps keys, like Player pks, to positions in a ratings array."""
+
+    def __init__(self):
+        self.keys = []
+        self.positions = {}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return key in self.positions
+
+    def __getitem__(self, key):
+        return self.positions[key]
+
+    def add(self, key):
+        """Return the position of the key, adding it if it's new."""
+
+        if key not in self.positions:
+            self.positions[key] = len(self.keys)
+            self.keys.append(key)
+
+        return self.positions[key]
+
+
+def replay_groups(games, groups, engines, last_periods):
+    """
+    :param games: List of (game_pk, winner_pk, loser_pk, period) Tuples,
+    in the order they were played.
+    :param groups: Dict of {game_pk: group_pk}.
+    :param engines: Dict of {group_pk: RatingEngine}.
+    :param last_periods: Dict of {group_pk: the last rating period to
+    settle, or None}, for the groups rated a period at a time.
+    :return: (ratings, after) Tuple, a dict of {(group_pk, player_pk):
+    {field: value}} and a dict of {game_pk: (winner ranking, loser
+    ranking)} after each game.
+
+    The groups using the same engine are replayed together, since their
+    players never meet. Games after the last settled period aren't
+    rated, they leave the rankings as they were.
+    """
+    replays = {}
+
+    for game_pk, winner_pk, loser_pk, period in games:
+        group_pk = groups.get(game_pk)
+        if group_pk is None:
+            continue
+
+        engine = engines[group_pk]
+        last_period = last_periods.get(group_pk)
+        replay = replays.setdefault(engine.name, {
+            'engine': engine,
+            'index': RatingIndex(),
+            'games': [],
+            'unsettled': [],
+            'last_period': None,
+        })
+        players = (
+            replay['index'].add((group_pk, winner_pk)),
+            replay['index'].add((group_pk, loser_pk)),
+        )
+
+        if engine.per_game or (
+                last_period is not None and period <= last_period):
+            replay['games'].append((game_pk, players, period))
+        else:
+            replay['unsettled'].append((game_pk, players))
+
+        if last_period is not None:
+            replay['last_period'] = max(
+                replay['last_period'] or last_period, last_period)
+
+    ratings = {}
+    after = {}
+
+    for replay in replays.values():
+        engine = replay['engine']
+        index = replay['index']
+        games = replay['games']
+
+        values, game_after = engine.replay(
+            {
+                field: np.full(len(index), default, dtype=np.float64)
+                for field, default in engine.fields.items()
+            },
+            [players[0] for _, players, _ in games],
+            [players[1] for _, players, _ in games],
+            [period for _, _, period in games],
+            last_period=replay['last_period'],
+        )
+        values = {field: array.tolist() for field, array in values.items()}
+
+        for position, key in enumerate(index.keys):
+            ratings[key] = {
+                field: array[position] for field, array in values.items()
+            }
+        for (game_pk, _, _), rankings in zip(games, game_after.tolist()):
+            after[game_pk] = tuple(rankings)
+        for game_pk, players in replay['unsettled']:
+            after[game_pk] = tuple(
+                values['ranking'][player] for player in players)
+
+    return ratings, after
+
+
+def bulk_update(model, values, chunk_size):
+    """
+    :param model: The model class to update.
+    :param values: Dict of {pk: {field: value}}, each with the same fields.
+    :param chunk_size: The number of rows to update per query.
+    :return: None
+
+    Each chunk is saved with a single UPDATE, using a CASE on the pk for
+    each field.
+    """
+    pks = list(values)
+
+    for start in range(0, len(pks), chunk_size):
+        chunk = pks[start:start + chunk_size]
+        fields = values[chunk[0]].keys()
+
+        model.objects.filter(pk__in=chunk).update(**{
+            field: Case(
+                *[When(pk=pk, then=Value(values[pk][field])) for pk in chunk],
+                output_field=model._meta.get_field(field)
+            )
+            for field in fields
+        })
+
+
+def insert_games(model, games):
+    """
+    :param model: The Game model class.
+    :param games: List of dicts of each game's 'date_time', 'group' pk
+    (or None) and 'players' pks, with the 'winner' pk, 'home_score'
+    and 'away_score' of finished games.
+    :return: List of the new Game pks, in the same order as the games.
+
+    A bulk_create each for the games, their players and their groups,
+    in one transaction. Pass the games a chunk at a time.
+    """
+    if not games:
+        return []
+
+    now = timezone.now()
+
+    # Joins the caller's transaction, if any, without a savepoint.
+    with transaction.atomic(savepoint=False):
+        last_pk = model.objects.aggregate(last_pk=Max('pk'))['last_pk'] or 0
+
+        objects = model.objects.bulk_create([
+            model(
+                date_time=game['date_time'],
+                group_id=game['group'],
+                active='winner' not in game,
+                winner_id=game.get('winner'),
+                home_score=game.get('home_score'),
+                away_score=game.get('away_score'),
+                finished=now if 'winner' in game else None,
+            )
+            for game in games
+        ])
+        game_pks = [game.pk for game in objects]
+
+        # Only some databases (like PostgreSQL) return the pks.
+        if None in game_pks:
+            game_pks = inserted_pks(model, objects, last_pk)
+
+        model.players.through.objects.bulk_create([
+            model.players.through(game_id=game_pk, player_id=player_pk)
+            for game_pk, game in zip(game_pks, games)
+            for player_pk in game['players']
+        ])
+        model.groups.through.objects.bulk_create([
+            model.groups.through(group_id=game['group'], game_id=game_pk)
+            for game_pk, game in zip(game_pks, games)
+            if game['group'] is not None
+        ])
+
+    return game_pks
+
+
+def inserted_pks(model, objects, last_pk):
+    """
+    :param model: The Game model class.
+    :param objects: The Games just inserted by bulk_create().
+    :param last_pk: The highest Game pk before they were inserted.
+    :return: List of their pks, in the same order.
+
+    Looks the games up by their fields, rather than taking the next pks,
+    as other games can be inserted after reading last_pk. Those games are
+    skipped by only matching games without players yet, as insert_games()
+    adds the players in the same transaction. Games with the same fields
+    are interchangeable, until their players are added.
+    """
+    fields = [
+        'date_time', 'group_id', 'winner_id', 'home_score', 'away_score',
+        'finished',
+    ]
+    pks = defaultdict(deque)
+
+    for row in model.objects.filter(
+            pk__gt=last_pk,
+            players=None,
+    ).order_by('pk').values_list('pk', *fields):
+        pks[row[1:]].append(row[0])
+
+    return [
+        pks[tuple(getattr(game, field) for field in fields)].popleft()
+        for game in objects
+    ]
@@ -0,0 +1,278 @@
+"""Live scores of the games in progress, pushed to everyone watching."""
+
+import inspect
+import json
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+
+from rankings.models import Game
+
+
+class Channel(object):
+    """The latest message on a topic, and the watchers waiting for more."""
+
+    def __init__(self, lock, message):
+        self.condition = threading.Condition(lock)
+        self.version = 1
+        self.message = message
+        self.watchers = 0
+        self.checked = time.monotonic()
+
+
+class Broker(object):
+    """
+    Publish/subscribe within the process, keeping only the latest
+    message on each topic being watched.
+
+    The watchers of a topic wait on the same condition, so a publish
+    wakes every one of them with the new message already in memory.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.channels = {}
+        # Watchers of every topic, each holding a thread while it waits.
+        self.watchers = 0
+
+    def latest(self, topic):
+        """
+        :param topic: The topic, like a game pk.
+        :return: The latest message on the topic, or None if it isn't
+        being watched.
+        """
+        with self.lock:
+            channel = self.channels.get(topic)
+            return channel.message if channel else None
+
+    def publish(self, topic, message):
+        """
+        :param topic: The topic to publish on.
+        :param message: The new message, only passed on if it's changed.
+        :return: Whether anyone is watching the topic.
+        """
+        with self.lock:
+            channel = self.channels.get(topic)
+            if channel is None:
+                return False
+
+            if message != channel.message:
+                channel.version += 1
+                channel.message = message
+                channel.condition.notify_all()
+
+            return True
+
+    def subscribe(self, topic, message, limit=None):
+        """
+        :param topic: The topic to watch.
+        :param message: The message to start from if nothing's watching
+        the topic yet.
+        :param limit: The most watchers of every topic, or None for no
+        limit.
+        :return: (version, message) Tuple of the latest message, or None
+        if there are already limit watchers.
+        """
+        with self.lock:
+            if limit is not None and self.watchers >= limit:
+                return None
+
+            channel = self.channels.get(topic)
+            if channel is None:
+                channel = self.channels[topic] = Channel(self.lock, message)
+
+            channel.watchers += 1
+            self.watchers += 1
+            return channel.version, channel.message
+
+    def unsubscribe(self, topic):
+        """Stop watching the topic, forgetting it when no one's left."""
+
+        with self.lock:
+            channel = self.channels[topic]
+            channel.watchers -= 1
+            self.watchers -= 1
+            if not channel.watchers:
+                del self.channels[topic]
+
+    def wait(self, topic, version, timeout):
+        """
+        :param topic: A topic being watched.
+        :param version: The version of the last message seen.
+        :param timeout: The most seconds to wait for a newer message.
+        :return: (version, message) Tuple of the latest message, the
+        same version if nothing was published in time.
+        """
+        with self.lock:
+            channel = self.channels[topic]
+            channel.condition.wait_for(
+                lambda: channel.version != version, timeout)
+
+            return channel.version, channel.message
+
+    def claim_check(self, topic, interval):
+        """
+        :param topic: A topic being watched.
+        :param interval: The seconds between checks.
+        :return: Whether the caller should check the topic's source, at
+        most one watcher of each topic once every interval.
+        """
+        with self.lock:
+            channel = self.channels[topic]
+            now = time.monotonic()
+            if now - channel.checked < interval:
+                return False
+
+            channel.checked = now
+            return True
+
+
+broker = Broker()
+
+
+def game_message(game, player_pks):
+    """
+    :param game: The Game.
+    :param player_pks: List of the pks of its players, lowest first.
+    :return: Dict of the game's live score, the points of each of the
+    players in order, and the result once it's finished.
+    """
+    return {
+        'game': game.pk,
+        'group': game.group_id,
+        'active': game.active,
+        'players': player_pks,
+        'points': [game.home_points, game.away_points],
+        'winner': game.winner_id,
+        'score': [game.home_score, game.away_score],
+    }
+
+
+def load_message(game_pk):
+    """
+    :param game_pk: The pk of the Game.
+    :return: Dict of the game's live score from the database, or None if
+    there's no such game.
+    """
+    game = Game.objects.filter(pk=game_pk).first()
+    if game is None:
+        return None
+
+    player_pks = list(Game.players.through.objects.filter(
+        game_id=game_pk,
+    ).order_by('player_id').values_list('player_id', flat=True))
+
+    return game_message(game, player_pks)
+
+
+def latest_message(game_pk):
+    """
+    :param game_pk: The pk of the Game.
+    :return: Dict of the game's live score, from memory while anyone in
+    this process is watching it, or None if there's no such game.
+    """
+    message = broker.latest(game_pk)
+    if message is None:
+        message = load_message(game_pk)
+
+    return message
+
+
+def publish_game(message):
+    """Push the game's new live score to everyone watching it."""
+
+    broker.publish(message['game'], message)
+
+
+def release_connection():
+    """
+    Close the thread's database connection, rather than hold one of the
+    database's connections for as long as a stream waits. Unless it's in
+    a transaction, like in the tests.
+    """
+    if not connection.in_atomic_block:
+        connection.close()
+
+
+def server_event(message, retry=None):
+    """
+    :param message: Dict of the game's live score.
+    :param retry: Milliseconds for the browser to wait before
+    reconnecting, or None to leave it be.
+    :return: The message as a server-sent 'score' event.
+    """
+    lines = []
+    if retry is not None:
+        lines.append(f'retry: {retry}')
+    lines += ['event: score', f'data: {json.dumps(message)}']
+
+    return '\n'.join(lines) + '\n\n'
+
+
+def stream_game(game_pk, version, message):
+    """
+    :param game_pk: The pk of the Game being watched.
+    :param version: The version of its latest message.
+    :param message: Its latest message, see Broker.subscribe().
+    :return: Generator of the server-sent events of the game's live
+    score, ending once it's finished, or after LIVE_SCORE_STREAM_SECONDS
+    for the browser to reconnect. Unsubscribes when it ends or is closed.
+
+    Scores published in this process are passed straight on. Those
+    published by other processes are picked up by checking the database
+    every LIVE_SCORE_POLL_SECONDS, by one watcher of the game at a time,
+    which only connects to the database for the check.
+    """
+    poll = settings.LIVE_SCORE_POLL_SECONDS
+    deadline = time.monotonic() + settings.LIVE_SCORE_STREAM_SECONDS
+
+    try:
+        release_connection()
+        yield server_event(message, retry=settings.LIVE_SCORE_RETRY_MS)
+
+        while message['active']:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+
+            latest, message = broker.wait(game_pk, version, min(poll, remaining))
+            if latest != version:
+                version = latest
+                yield server_event(message)
+                continue
+
+            if broker.claim_check(game_pk, poll):
+                stored = load_message(game_pk)
+                release_connection()
+                if stored is None:
+                    return
+                broker.publish(game_pk, stored)
+
+            # Keep the connection open through any proxies.
+            yield ': keepalive\n\n'
+    finally:
+        broker.unsubscribe(game_pk)
+
+
+class GameStream(object):
+    """
+    The events of a subscription to a game, see stream_game().
+
+    Django closes the streaming content once the response is done. A
+    generator closed before it started never runs its finally, so this
+    unsubscribes for it, like when the watcher leaves straight away.
+    """
+
+    def __init__(self, game_pk, version, message):
+        self.game_pk = game_pk
+        self.events = stream_game(game_pk, version, message)
+
+    def __iter__(self):
+        return self.events
+
+    def close(self):
+        if inspect.getgeneratorstate(self.events) == inspect.GEN_CREATED:
+            broker.unsubscribe(self.game_pk)
+        self.events.close()
@@ -0,0 +1,272 @@
+"""Benchmark every page of the rankings app, see rankings/benchmark.py."""
+
+import json
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rankings.benchmark import benchmark_request, compare
+from rankings.models import Game, Group, Player, RankChange
+from rankings.urls import urlpatterns
+
+
+class Rollback(Exception):
+    """Raised to roll back anything the benchmarked requests changed."""
+
+
+class Command(BaseCommand):
+    """GET every named url in rankings.urls and time it."""
+
+    help = (
+        'Benchmark every page against the current database (see seed_league), '
+        'reporting latency percentiles, queries and SQL time. Anything the '
+        'requests change is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument(
+            '--cold',
+            action='store_true',
+            help='Invalidate the cached fragments before each request.',
+        )
+        parser.add_argument(
+            '--label',
+            default='',
+            help='Label for the run, like the commit being benchmarked.',
+        )
+        parser.add_argument('--output', help='File to save the results to.')
+        parser.add_argument(
+            '--baseline',
+            help='Results of an earlier run, to check for regressions.',
+        )
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=0.2,
+            help='Fraction the p50 latency may grow by over the baseline.',
+        )
+
+    def handle(self, *args, **options):
+        results = {
+            'label': options['label'],
+            'created': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'repeat': options['repeat'],
+            'cold': options['cold'],
+            'size': {
+                'players': Player.objects.count(),
+                'groups': Group.objects.count(),
+                'games': Game.objects.count(),
+                'rank_changes': RankChange.objects.count(),
+            },
+            'views': {},
+        }
+
+        # The manifest storage needs collectstatic to have been run.
+        storage = 'django.contrib.staticfiles.storage.StaticFilesStorage'
+
+        try:
+            with transaction.atomic(), override_settings(
+                    STATICFILES_STORAGE=storage):
+                client = Client()
+                requests = self.get_requests(client)
+
+                for name, (url, data) in sorted(requests.items()):
+                    results['views'][name] = dict(
+                        url=url,
+                        **benchmark_request(
+                            client,
+                            url,
+                            data,
+                            repeat=options['repeat'],
+                            warmup=options['warmup'],
+                            cold=options['cold'],
+                        )
+                    )
+                    self.report(name, results['views'][name])
+
+                raise Rollback
+        except Rollback:
+            pass
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2, sort_keys=True)
+
+        if options['baseline']:
+            with open(options['baseline']) as baseline:
+                regressions = compare(
+                    json.load(baseline)['views'],
+                    results['views'],
+                    options['tolerance'],
+                )
+
+            if regressions:
+                raise CommandError(
+                    'Regressions against the baseline:\n' +
+                    '\n'.join(regressions)
+                )
+
+            self.stdout.write(self.style.SUCCESS('No regressions.'))
+
+    def report(self, name, result):
+        self.stdout.write(
+            f'{name:<16} {result["status"]} '
+            f'p50 {result["p50_ms"]:>8.2f}ms '
+            f'p90 {result["p90_ms"]:>8.2f}ms '
+            f'p99 {result["p99_ms"]:>8.2f}ms '
+            f'{result["queries"]:>3} queries '
+            f'{result["sql_ms"]:>8.2f}ms SQL'
+        )
+
+    def get_requests(self, client):
+        """
+        :param client: The Client, logged in here as the busiest admin.
+        :return: Dict of {url name: (url, data)} for every named url.
+
+        Each page is benchmarked with the largest group, and the busiest
+        of its admins, in the database.
+        """
+        group = Group.objects.annotate(
+            game_count=Count('game'),
+        ).order_by('-game_count', 'pk').first()
+
+        if not group:
+            raise CommandError('There are no groups, run seed_league first.')
+
+        player = group.admins.annotate(
+            game_count=Count('games'),
+        ).order_by('-game_count', 'pk').first()
+
+        if not player:
+            raise CommandError(f'{group} has no admins.')
+
+        # Let the admin see the staff pages too, rolled back afterwards.
+        User.objects.filter(pk=player.user_id).update(is_staff=True)
+        client.force_login(player.user)
+
+        opponent = group.players.exclude(pk=player.pk).first() or player
+        games = Game.objects.filter(group=group)
+        game = games.filter(active=False).order_by('-date_time').first()
+        active_game = games.filter(active=True).first() or game
+        other_group = Group.objects.exclude(players=player).first() or group
+
+        if not game:
+            raise CommandError(f'{group} has no finished games.')
+
+        requests = {
+            'index': (reverse('index'), None),
+            'groups': (reverse('groups'), None),
+            'group': (reverse('group', kwargs={'pk': group.pk}), None),
+            'group_games': (
+                reverse('group_games', kwargs={'pk': group.pk}),
+                {'status': 'completed'},
+            ),
+            'group_leaderboard': (
+                reverse('group_leaderboard', kwargs={'pk': group.pk}),
+                {'date': str(timezone.localdate(game.date_time))},
+            ),
+            'group_predictions': (
+                reverse('group_predictions', kwargs={'pk': group.pk}),
+                {'player': player.pk, 'opponent': opponent.pk},
+            ),
+            'matchmaking': (
+                reverse('matchmaking', kwargs={'pk': group.pk}),
+                None,
+            ),
+            'join_group': (
+                reverse('join_group', kwargs={'pk': other_group.pk}),
+                None,
+            ),
+            'game': (
+                reverse('game', kwargs={
+                    'group_pk': group.pk,
+                    'game_pk': game.pk,
+                }),
+                None,
+            ),
+            # A finished game's stream ends after its result.
+            'live_game': (
+                reverse('live_game', kwargs={
+                    'group_pk': group.pk,
+                    'game_pk': game.pk,
+                }),
+                None,
+            ),
+            'game_score': (
+                reverse('game_score', kwargs={
+                    'group_pk': group.pk,
+                    'game_pk': active_game.pk,
+                }),
+                None,
+            ),
+            'create_game': (
+                reverse('create_game', kwargs={'pk': group.pk}),
+                None,
+            ),
+            'finish_game': (
+                reverse('finish_game', kwargs={'pk': active_game.pk}),
+                None,
+            ),
+            'create_fixtures': (
+                reverse('create_fixtures', kwargs={'pk': group.pk}),
+                None,
+            ),
+            'edit_group': (
+                reverse('edit_group', kwargs={'pk': group.pk}),
+                None,
+            ),
+            'export_group': (
+                reverse('export_group', kwargs={'pk': group.pk}),
+                None,
+            ),
+            'player_profile': (
+                reverse('player_profile', kwargs={'pk': player.pk}),
+                None,
+            ),
+            'player_games': (
+                reverse('player_games', kwargs={'pk': player.pk}),
+                {'status': 'completed'},
+            ),
+            'player_ratings': (
+                reverse('player_ratings', kwargs={'pk': player.pk}),
+                None,
+            ),
+            'performance': (reverse('performance'), None),
+            'api_groups': (reverse('api_groups'), None),
+            'api_group': (reverse('api_group', kwargs={'pk': group.pk}), None),
+            'api_group_games': (
+                reverse('api_group_games', kwargs={'pk': group.pk}),
+                None,
+            ),
+            'api_group_predictions': (
+                reverse('api_group_predictions', kwargs={'pk': group.pk}),
+                None,
+            ),
+            'api_game': (
+                reverse('api_game', kwargs={
+                    'group_pk': group.pk,
+                    'game_pk': game.pk,
+                }),
+                None,
+            ),
+            'api_player': (
+                reverse('api_player', kwargs={'pk': player.pk}),
+                None,
+            ),
+        }
+
+        missing = {pattern.name for pattern in urlpatterns} - set(requests)
+        if missing:
+            raise CommandError(
+                f'No benchmark for: {", ".join(sorted(missing))}')
+
+        return requests
@@ -0,0 +1,43 @@
+"""Export a group's finished games, see rankings/export.py."""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from rankings.export import CONTENT_TYPES, export_lines
+from rankings.models import Group
+
+
+class Command(BaseCommand):
+    """Stream a group's games to a file, or stdout."""
+
+    help = (
+        'Export the finished games of a group, with their rank changes, as '
+        'CSV or JSON lines that import_games can read back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('group', type=int, help='The pk of the group.')
+        parser.add_argument(
+            '--format',
+            choices=sorted(CONTENT_TYPES),
+            default='csv',
+        )
+        parser.add_argument(
+            '--output',
+            help='File to write the games to, by default stdout.',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            group = Group.objects.get(pk=options['group'])
+        except Group.DoesNotExist:
+            raise CommandError(f'There is no group {options["group"]}.')
+
+        lines = export_lines(group, options['format'])
+
+        if not options['output']:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+
+        with open(options['output'], 'w', newline='') as output:
+            output.writelines(lines)
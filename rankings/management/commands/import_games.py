@@ -0,0 +1,403 @@
+"""Import finished games, like a spreadsheet of old results."""
+
+import csv
+import json
+from collections import defaultdict
+from datetime import datetime, time
+from itertools import islice
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from pytz.exceptions import InvalidTimeError
+
+from rankings.cache import invalidate_all
+from rankings.engines import get_engine
+from rankings.history import bulk_update, insert_games
+from rankings.models import (
+    Game,
+    Group,
+    GroupRanking,
+    LeaderboardSnapshot,
+    Player,
+    RankChange,
+    Standing,
+)
+
+FIELDS = [
+    'date_time',
+    'group',
+    'winner',
+    'loser',
+    'winner_score',
+    'loser_score',
+]
+
+
+class RowError(CommandError):
+    """A row of the file that can't be imported."""
+
+    def __init__(self, line, message):
+        super(RowError, self).__init__(f'Line {line}: {message}')
+
+
+def read_rows(path, file_format):
+    """
+    :param path: Path of the CSV (with a header row) or JSON lines file.
+    :param file_format: 'csv' or 'jsonl'.
+    :return: Generator of (line number, row dict) Tuples.
+    """
+    with open(path, newline='') as lines:
+        if file_format == 'csv':
+            reader = csv.DictReader(lines)
+            for row in reader:
+                yield reader.line_num, row
+            return
+
+        for line, text in enumerate(lines, 1):
+            if not text.strip():
+                continue
+            try:
+                yield line, json.loads(text)
+            except ValueError:
+                raise RowError(line, 'Invalid JSON.')
+
+
+class Command(BaseCommand):
+    """Stream games from a file into the database, a chunk at a time."""
+
+    help = (
+        'Import finished games from a CSV or JSON lines file with the '
+        f'columns (or keys): {", ".join(FIELDS)}. Players are usernames, '
+        'groups are names and the games must be in the order they were '
+        'played. Players join the groups they played in. Games played before the latest game in the database, or '
+        'before a group\'s ratings were last settled, are rated by replaying '
+        'the whole history with rebuild_rankings.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument(
+            '--format',
+            choices=['csv', 'jsonl'],
+            help='Format of the file, by default from its extension.',
+        )
+        parser.add_argument(
+            '--create-missing',
+            action='store_true',
+            help='Create the users and groups that don\'t exist yet.',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Number of games to read and write at a time.',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or (
+            'jsonl' if path.endswith(('.jsonl', '.json')) else 'csv')
+
+        self.chunk_size = options['chunk_size']
+        self.create_missing = options['create_missing']
+
+        # Loaded as they're needed, at most one of each per player.
+        self.players = {}
+        self.players_by_pk = {}
+        self.groups = {}
+        self.engines = {}
+        self.members = set()
+        self.group_rankings = {}
+
+        with transaction.atomic():
+            latest = Game.objects.filter(
+                active=False,
+            ).order_by('-date_time').values_list('date_time', flat=True).first()
+
+            # Days already settled can't take any more games either.
+            settled = Group.objects.filter(
+                rated_until__isnull=False,
+            ).order_by('-rated_until').values_list(
+                'rated_until', flat=True).first()
+            if settled and (latest is None or settled > latest):
+                latest = settled
+
+            self.rate = None
+            self.last_date_time = None
+            count = 0
+            rows = read_rows(path, file_format)
+
+            while True:
+                chunk = [
+                    self.parse(line, row)
+                    for line, row in islice(rows, self.chunk_size)
+                ]
+                if not chunk:
+                    break
+
+                if self.rate is None:
+                    # Older games change the ratings of everything since.
+                    self.rate = (
+                        latest is None or chunk[0]['date_time'] > latest)
+
+                self.import_chunk(chunk)
+                count += len(chunk)
+
+            if self.rate:
+                self.write_standings()
+            elif count:
+                call_command(
+                    'rebuild_rankings',
+                    chunk_size=self.chunk_size,
+                    stdout=self.stdout,
+                )
+
+        invalidate_all()
+
+        self.stdout.write(self.style.SUCCESS(f'Imported {count} games.'))
+
+    def parse(self, line, row):
+        """Check a row and parse its values."""
+
+        missing = [field for field in FIELDS[:4] if not row.get(field)]
+        if missing:
+            raise RowError(line, f'Missing {", ".join(missing)}.')
+
+        value = str(row['date_time'])
+        date_time = parse_datetime(value)
+        if date_time is None:
+            date = parse_date(value)
+            if date is None:
+                raise RowError(line, f'Invalid date_time "{value}".')
+            date_time = datetime.combine(date, time())
+        if timezone.is_naive(date_time):
+            try:
+                date_time = timezone.make_aware(date_time)
+            except InvalidTimeError:
+                raise RowError(
+                    line, f'Ambiguous date_time "{value}", add its UTC offset.')
+
+        if self.last_date_time and date_time < self.last_date_time:
+            raise RowError(line, 'Games must be in the order they were played.')
+        self.last_date_time = date_time
+
+        if row['winner'] == row['loser']:
+            raise RowError(line, 'The winner and loser must be different.')
+
+        scores = []
+        for field in ('winner_score', 'loser_score'):
+            score = row.get(field)
+            try:
+                scores.append(int(score) if score not in (None, '') else None)
+            except ValueError:
+                raise RowError(line, f'Invalid {field} "{score}".')
+
+        return {
+            'line': line,
+            'date_time': date_time,
+            'group': str(row['group']),
+            'winner': str(row['winner']),
+            'loser': str(row['loser']),
+            'home_score': scores[0],
+            'away_score': scores[1],
+        }
+
+    def import_chunk(self, chunk):
+        """Insert a chunk of games, with their rank changes when rating."""
+
+        self.load_players({
+            username
+            for row in chunk
+            for username in (row['winner'], row['loser'])
+        }, chunk)
+        self.load_groups({row['group'] for row in chunk}, chunk)
+
+        games = []
+        for row in chunk:
+            winner = self.players[row['winner']]
+            loser = self.players[row['loser']]
+            games.append({
+                'date_time': row['date_time'],
+                'group': self.groups[row['group']],
+                'players': (winner.pk, loser.pk),
+                'winner': winner.pk,
+                'home_score': row['home_score'],
+                'away_score': row['away_score'],
+            })
+
+        game_pks = insert_games(Game, games)
+        self.add_members(games)
+
+        # The bulk inserts skip the signals that forget the snapshots
+        # taken since.
+        LeaderboardSnapshot.objects.filter(
+            group__in={game['group'] for game in games},
+            date_time__gt=min(game['date_time'] for game in games),
+        ).delete()
+
+        if not self.rate:
+            return
+
+        self.load_group_rankings(games)
+
+        changes = []
+        for game_pk, game in zip(game_pks, games):
+            winner, loser = (self.players_by_pk[pk] for pk in game['players'])
+            before = (winner.ranking, loser.ranking)
+
+            Standing.play(
+                winner, loser, game['home_score'], game['away_score'])
+            Standing.play(
+                self.group_rankings[game['group'], winner.pk],
+                self.group_rankings[game['group'], loser.pk],
+                game['home_score'],
+                game['away_score'],
+                self.engines[game['group']],
+            )
+
+            changes += [
+                RankChange(
+                    game_id=game_pk,
+                    player=player,
+                    before=ranking,
+                    after=player.ranking,
+                    date_time=game['date_time'],
+                )
+                for player, ranking in zip((winner, loser), before)
+            ]
+
+        RankChange.objects.bulk_create(changes)
+
+    def load_players(self, usernames, chunk):
+        """Look up the players not seen yet, creating them if allowed."""
+
+        usernames -= set(self.players)
+        if not usernames:
+            return
+
+        self.add_players(Player.objects.select_related('user').filter(
+            user__username__in=usernames))
+
+        missing = usernames - set(self.players)
+        if missing:
+            if not self.create_missing:
+                row = next(
+                    row for row in chunk
+                    if row['winner'] in missing or row['loser'] in missing)
+                raise RowError(
+                    row['line'],
+                    f'Unknown players: {", ".join(sorted(missing))}.',
+                )
+
+            # bulk_create() skips the signal that creates each user's Player.
+            User.objects.bulk_create([
+                User(username=username, password='!') for username in missing
+            ])
+            Player.objects.bulk_create([
+                Player(user=user, name=Player.display_name(user))
+                for user in User.objects.filter(username__in=missing)
+            ])
+            self.add_players(Player.objects.select_related('user').filter(
+                user__username__in=missing))
+
+    def add_players(self, players):
+        for player in players:
+            self.players[player.user.username] = player
+            self.players_by_pk[player.pk] = player
+
+    def load_groups(self, names, chunk):
+        """Look up the groups not seen yet, creating them if allowed."""
+
+        names -= set(self.groups)
+        if not names:
+            return
+
+        for name, pk, engine in Group.objects.filter(
+                name__in=names).order_by('pk').values_list(
+                    'name', 'pk', 'rating_engine'):
+            if name in self.groups:
+                row = next(row for row in chunk if row['group'] == name)
+                raise RowError(
+                    row['line'], f'There is more than one group "{name}".')
+            self.groups[name] = pk
+            self.engines[pk] = get_engine(engine)
+
+        missing = names - set(self.groups)
+        if missing:
+            if not self.create_missing:
+                row = next(row for row in chunk if row['group'] in missing)
+                raise RowError(
+                    row['line'], f'Unknown groups: {", ".join(sorted(missing))}.')
+
+            Group.objects.bulk_create([Group(name=name) for name in missing])
+            for name, pk, engine in Group.objects.filter(
+                    name__in=missing).values_list('name', 'pk', 'rating_engine'):
+                self.groups[name] = pk
+                self.engines[pk] = get_engine(engine)
+
+    def add_members(self, games):
+        """Add the players to the groups they played in, if they aren't."""
+
+        memberships = {
+            (game['group'], player_pk)
+            for game in games
+            for player_pk in game['players']
+        } - self.members
+        if not memberships:
+            return
+
+        players = defaultdict(set)
+        for group_pk, player_pk in memberships:
+            players[group_pk].add(player_pk)
+
+        # One add() per group, which only inserts the missing rows, and
+        # sends the signal that creates or shows their group rankings.
+        for group_pk, player_pks in players.items():
+            Group(pk=group_pk).players.add(*player_pks)
+
+        self.members |= memberships
+
+    def load_group_rankings(self, games):
+        """Look up the group rankings of the games' players."""
+
+        keys = {
+            (game['group'], player_pk)
+            for game in games
+            for player_pk in game['players']
+        } - set(self.group_rankings)
+        if not keys:
+            return
+
+        rankings = GroupRanking.objects.filter(
+            group__in={group_pk for group_pk, _ in keys},
+            player__in={player_pk for _, player_pk in keys},
+        )
+        for ranking in rankings:
+            key = ranking.group_id, ranking.player_id
+            if key in keys:
+                self.group_rankings[key] = ranking
+
+    def write_standings(self):
+        """
+        Save the rankings and stats of every player that played, and their
+        group rankings.
+        """
+        fields = Standing.standing_fields
+
+        for model, standings in (
+                (Player, self.players.values()),
+                (GroupRanking, self.group_rankings.values())):
+            bulk_update(
+                model,
+                {
+                    standing.pk: {
+                        field: getattr(standing, field) for field in fields
+                    }
+                    for standing in standings
+                },
+                self.chunk_size,
+            )
@@ -0,0 +1,356 @@
+"""Rebuild Player rankings and RankChange history from the Game history."""
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from rankings.cache import invalidate_all
+from rankings.elo import elo_replay
+from rankings.engines import RatingEngine
+from rankings.history import (
+    RatingIndex,
+    bulk_update,
+    finished_games,
+    played_after,
+    replay_groups,
+)
+from rankings.models import (
+    CheckpointRanking,
+    Game,
+    Group,
+    GroupRanking,
+    Player,
+    RankChange,
+    RankingCheckpoint,
+)
+
+
+class Command(BaseCommand):
+    """Replay every finished game in order to recompute the rankings."""
+
+    help = (
+        'Rebuild all player rankings and rank changes from the games. '
+        'Group rankings and stats are only rebuilt by a full (not '
+        'incremental) run, an incremental run only updates the peak '
+        'rankings of the players it replays.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--incremental',
+            action='store_true',
+            help='Only replay the games finished after the stored checkpoint.',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Number of rows to write per query.',
+        )
+
+    def handle(self, *args, **options):
+        self.chunk_size = options['chunk_size']
+        self.default_ranking = Player._meta.get_field('ranking').default
+
+        checkpoint = None
+        if options['incremental']:
+            # Checkpoints from before games had a finished time start over.
+            checkpoint = RankingCheckpoint.objects.exclude(
+                finished=None,
+            ).first()
+
+        with transaction.atomic():
+            # Games finished while this runs are left to the next run.
+            self.finished = Game.objects.filter(
+                active=False,
+            ).aggregate(finished=Max('finished'))['finished']
+            self.start = self.replay_start(checkpoint)
+            self.load_games()
+
+            ratings, before, after = elo_replay(
+                self.starting_rankings(checkpoint),
+                self.winners,
+                self.losers,
+                settings.ELO_WEIGHTING,
+            )
+
+            self.write_rank_changes(before, after)
+            self.write_rankings(checkpoint, ratings)
+            self.write_checkpoint(checkpoint, ratings)
+
+            if checkpoint:
+                # The replayed games were counted as they finished, only
+                # the peak rankings follow the replayed rankings.
+                self.write_peaks()
+            else:
+                self.write_group_rankings()
+                call_command(
+                    'rebuild_stats',
+                    chunk_size=self.chunk_size,
+                    stdout=self.stdout,
+                )
+
+        # The bulk updates skip the signals that invalidate the caches.
+        invalidate_all()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Replayed {len(self.games)} games '
+            f'for {len(self.players)} players.'
+        ))
+
+    def replay_start(self, checkpoint):
+        """
+        :param checkpoint: The RankingCheckpoint, or None to replay every
+        game.
+        :return: (date_time, game_pk, including) Tuple of the game to
+        replay from, or None.
+
+        Replays from the checkpoint, or from the first game finished since
+        that was played before it.
+        """
+        if not checkpoint:
+            return None
+
+        late = Game.objects.filter(
+            ~played_after(checkpoint.date_time, checkpoint.game_pk),
+            active=False,
+            finished__gt=checkpoint.finished,
+            finished__lte=self.finished,
+        ).order_by('date_time', 'pk').values_list('date_time', 'pk').first()
+
+        if late:
+            return (*late, True)
+
+        return checkpoint.date_time, checkpoint.game_pk, False
+
+    def replayed(self, prefix=''):
+        """Filter for the games (or related rows) being replayed."""
+
+        replayed = Q()
+        if self.start:
+            replayed &= played_after(*self.start[:2], prefix, self.start[2])
+        if self.finished:
+            replayed &= ~Q(**{f'{prefix}finished__gt': self.finished})
+
+        return replayed
+
+    def load_games(self):
+        """Load the finished games to replay, in the order they were played."""
+
+        rows = Game.players.through.objects.filter(self.replayed('game__'))
+
+        self.games = []
+        self.winners = []
+        self.losers = []
+        self.players = RatingIndex()
+        self.last_game = None
+
+        for game_pk, winner_pk, loser_pk in finished_games(rows):
+            self.games.append(game_pk)
+            self.winners.append(self.players.add(winner_pk))
+            self.losers.append(self.players.add(loser_pk))
+
+        if self.games:
+            self.last_game = Game.objects.get(pk=self.games[-1])
+
+        # Copied onto the rank changes, for the rating histories.
+        games = Game.objects.filter(self.replayed(), active=False)
+        self.date_times = dict(games.values_list('pk', 'date_time').iterator())
+
+    def starting_rankings(self, checkpoint):
+        """
+        Rankings of the replayed players before their first game.
+
+        Those stored at the checkpoint, unless replaying from a game
+        played before it. Then each player's ranking is the one before
+        their first game the last run replayed, if they have one since.
+        The work is in proportion to the games replayed.
+        """
+        rankings = [self.default_ranking] * len(self.players)
+
+        if not checkpoint:
+            return rankings
+
+        for start in range(0, len(self.players), self.chunk_size):
+            chunk = self.players.keys[start:start + self.chunk_size]
+
+            stored = CheckpointRanking.objects.filter(
+                player__in=chunk,
+            ).values_list('player_id', 'ranking')
+            for player_pk, ranking in stored:
+                rankings[self.players[player_pk]] = ranking
+
+            if not self.start[2]:
+                continue
+
+            # Latest first, leaving each player's earliest.
+            changes = RankChange.objects.filter(
+                self.replayed('game__'),
+                ~played_after(
+                    checkpoint.date_time, checkpoint.game_pk, 'game__'),
+                player__in=chunk,
+                game__finished__lte=checkpoint.finished,
+            ).order_by(
+                '-game__date_time',
+                '-game_id',
+            ).values_list(
+                'player_id',
+                'before',
+            )
+            for player_pk, ranking in changes.iterator():
+                rankings[self.players[player_pk]] = ranking
+
+        return rankings
+
+    def write_rank_changes(self, before, after):
+        """Replace the RankChange rows for the replayed games."""
+
+        RankChange.objects.filter(self.replayed('game__')).delete()
+
+        before = before.tolist()
+        after = after.tolist()
+
+        for start in range(0, len(self.games), self.chunk_size):
+            end = start + self.chunk_size
+            RankChange.objects.bulk_create([
+                RankChange(
+                    game_id=self.games[i],
+                    player_id=self.players.keys[player],
+                    before=before[i][side],
+                    after=after[i][side],
+                    date_time=self.date_times[self.games[i]],
+                )
+                for i in range(start, min(end, len(self.games)))
+                for side, player in enumerate((self.winners[i], self.losers[i]))
+            ])
+
+    def write_rankings(self, checkpoint, ratings):
+        """Save the final rankings."""
+
+        if not checkpoint:
+            # Players without any finished games go back to the default.
+            Player.objects.exclude(
+                ranking=self.default_ranking,
+            ).update(
+                ranking=self.default_ranking,
+            )
+
+        bulk_update(
+            Player,
+            {
+                player_pk: {'ranking': ranking}
+                for player_pk, ranking in zip(self.players.keys, ratings.tolist())
+            },
+            self.chunk_size,
+        )
+
+    def write_peaks(self):
+        """Save the peak rankings of the replayed players."""
+
+        peaks = {}
+        for start in range(0, len(self.players), self.chunk_size):
+            peaks.update(RankChange.objects.filter(
+                player__in=self.players.keys[start:start + self.chunk_size],
+            ).values('player').annotate(
+                peak=Max('after'),
+            ).values_list('player', 'peak'))
+
+        bulk_update(
+            Player,
+            {
+                player_pk: {'peak_ranking': max(self.default_ranking, peak)}
+                for player_pk, peak in peaks.items()
+            },
+            self.chunk_size,
+        )
+
+    def write_checkpoint(self, checkpoint, ratings):
+        """
+        Store the last replayed game, and the rankings after it, for the
+        next incremental run.
+        """
+        if checkpoint and not self.last_game:
+            # Nothing new was replayed, keep the existing checkpoint.
+            return
+
+        RankingCheckpoint.objects.all().delete()
+
+        if self.last_game:
+            RankingCheckpoint.objects.create(
+                date_time=self.last_game.date_time,
+                game_pk=self.last_game.pk,
+                finished=self.finished,
+            )
+
+        if not checkpoint:
+            CheckpointRanking.objects.all().delete()
+
+        ratings = ratings.tolist()
+        for start in range(0, len(self.players), self.chunk_size):
+            end = start + self.chunk_size
+            chunk = self.players.keys[start:end]
+
+            if checkpoint:
+                CheckpointRanking.objects.filter(player__in=chunk).delete()
+            CheckpointRanking.objects.bulk_create([
+                CheckpointRanking(player_id=player_pk, ranking=ranking)
+                for player_pk, ranking in zip(chunk, ratings[start:end])
+            ])
+
+    def write_group_rankings(self):
+        """
+        Replace every GroupRanking from the games played in each group,
+        with the group's rating engine.
+
+        Groups rated a day at a time are settled up to the start of
+        today, like settle_ratings.
+        """
+        today = RatingEngine.period(timezone.now())
+        rated_until = RatingEngine.period_start(today)
+        last_period = today - 1
+
+        engines = {}
+        last_periods = {}
+        for group in Group.objects.only('pk', 'rating_engine'):
+            engines[group.pk] = group.engine
+            if not group.engine.per_game:
+                last_periods[group.pk] = last_period
+
+        ratings, _ = replay_groups(
+            [
+                (game_pk, winner_pk, loser_pk,
+                 RatingEngine.period(self.date_times[game_pk]))
+                for game_pk, winner_pk, loser_pk in finished_games(
+                    Game.players.through.objects.all())
+            ],
+            dict(Game.objects.filter(
+                group__isnull=False,
+            ).values_list('pk', 'group_id').iterator()),
+            engines,
+            last_periods,
+        )
+        members = set(Group.players.through.objects.values_list(
+            'group_id', 'player_id').iterator())
+        # Former members keep their rankings, hidden.
+        former = set(GroupRanking.objects.filter(
+            member=False,
+        ).values_list('group_id', 'player_id').iterator()) - members
+
+        GroupRanking.objects.all().delete()
+        GroupRanking.objects.bulk_create(
+            [
+                GroupRanking(
+                    group_id=group_pk,
+                    player_id=player_pk,
+                    member=(group_pk, player_pk) in members,
+                    **ratings.get((group_pk, player_pk), {})
+                )
+                for group_pk, player_pk in sorted(members | former)
+            ],
+            batch_size=self.chunk_size,
+        )
+        Group.objects.filter(pk__in=last_periods).update(
+            rated_until=rated_until)
@@ -0,0 +1,185 @@
+"""Rebuild the stats of every Player and GroupRanking from the Game history."""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from rankings.cache import invalidate_all
+from rankings.elo import elo_replay
+from rankings.engines import RatingEngine
+from rankings.history import (
+    RatingIndex,
+    bulk_update,
+    finished_games,
+    replay_groups,
+)
+from rankings.models import Game, Group, GroupRanking, Player, Standing
+
+
+class Command(BaseCommand):
+    """Replay every finished game in order to recompute the stats."""
+
+    help = (
+        'Rebuild the wins, losses, streaks, points and peak rankings of every '
+        'player, overall and within each group. Rankings are left alone.'
+    )
+
+    # Everything but the ranking, which rebuild_rankings looks after.
+    fields = [
+        field for field in Standing.standing_fields if field != 'ranking'
+    ]
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Number of rows to write per query.',
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            games = list(finished_games(Game.players.through.objects.all()))
+            finished = Game.objects.filter(active=False).values_list(
+                'pk', 'date_time', 'home_score', 'away_score')
+            scores = {}
+            periods = {}
+            for pk, date_time, home_score, away_score in finished.iterator():
+                scores[pk] = (home_score, away_score)
+                periods[pk] = RatingEngine.period(date_time)
+            groups = dict(Game.objects.filter(
+                group__isnull=False,
+            ).values_list('pk', 'group_id').iterator())
+
+            players = self.reset(Player.objects.all(), lambda player: player.pk)
+            group_rankings = self.reset(
+                GroupRanking.objects.all(),
+                lambda ranking: (ranking.group_id, ranking.player_id),
+            )
+
+            self.replay(
+                games,
+                players,
+                lambda game_pk, player_pk: player_pk,
+                scores,
+                self.player_rankings(games),
+            )
+            self.replay(
+                games,
+                group_rankings,
+                lambda game_pk, player_pk: (groups.get(game_pk), player_pk),
+                scores,
+                self.group_rankings(games, groups, periods),
+            )
+
+            self.write(Player, players.values(), options['chunk_size'])
+            self.write(
+                GroupRanking, group_rankings.values(), options['chunk_size'])
+
+        invalidate_all()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt stats from {len(games)} games.'
+        ))
+
+    def reset(self, standings, key):
+        """Load the standings, by key, with their stats back at the default."""
+
+        standings = {
+            key(standing): standing
+            for standing in standings.iterator()
+        }
+
+        for standing in standings.values():
+            for field in Standing.standing_fields:
+                setattr(standing, field, standing._meta.get_field(field).default)
+
+        return standings
+
+    def player_rankings(self, games):
+        """Dict of {game_pk: (winner, loser) ranking} after each game."""
+
+        index = RatingIndex()
+        winners = []
+        losers = []
+
+        for game_pk, winner_pk, loser_pk in games:
+            winners.append(index.add(winner_pk))
+            losers.append(index.add(loser_pk))
+
+        default = Player._meta.get_field('ranking').default
+        _, _, after = elo_replay(
+            [default] * len(index), winners, losers, settings.ELO_WEIGHTING)
+
+        return {
+            game_pk: tuple(rankings)
+            for (game_pk, _, _), rankings in zip(games, after.tolist())
+        }
+
+    def group_rankings(self, games, groups, periods):
+        """
+        Dict of {game_pk: (winner, loser) ranking} after each game, in
+        its group. The rankings of groups rated a day at a time only
+        change once the day is settled.
+        """
+        engines = {}
+        last_periods = {}
+        for group in Group.objects.only('pk', 'rating_engine', 'rated_until'):
+            engines[group.pk] = group.engine
+            if group.rated_until:
+                last_periods[group.pk] = RatingEngine.period(
+                    group.rated_until) - 1
+
+        _, after = replay_groups(
+            [
+                (game_pk, winner_pk, loser_pk, periods[game_pk])
+                for game_pk, winner_pk, loser_pk in games
+            ],
+            groups,
+            engines,
+            last_periods,
+        )
+
+        return after
+
+    def replay(self, games, standings, key, scores, after):
+        """
+        Record every game against the standings.
+
+        The rankings after each game are replayed alongside the results,
+        so the peak rankings follow the same games.
+        """
+        for game_pk, winner_pk, loser_pk in games:
+            rankings = after.get(game_pk)
+            if rankings is None:
+                continue
+
+            winner_score, loser_score = scores[game_pk]
+            results = (
+                (winner_pk, True, rankings[0], winner_score, loser_score),
+                (loser_pk, False, rankings[1], loser_score, winner_score),
+            )
+
+            for player_pk, won, ranking, points_for, points_against in results:
+                standing = standings.get(key(game_pk, player_pk))
+
+                # Players can have since left the group.
+                if standing is None:
+                    continue
+
+                standing.ranking = ranking
+                standing.record_result(won, points_for, points_against)
+
+    def write(self, model, standings, chunk_size):
+        """Save the stats of the standings."""
+
+        bulk_update(
+            model,
+            {
+                standing.pk: {
+                    field: getattr(standing, field) for field in self.fields
+                }
+                for standing in standings
+            },
+            chunk_size,
+        )
@@ -0,0 +1,232 @@
+"""Generate a reproducible synthetic league, for benchmarks."""
+
+import random
+from datetime import datetime, timedelta
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from rankings.elo import expected_score
+from rankings.history import insert_games
+from rankings.models import Game, Group, Player
+
+
+class Command(BaseCommand):
+    """Bulk insert users, groups, memberships and finished games."""
+
+    help = (
+        'Generate a synthetic league. The same --seed always generates the '
+        'same league, the rankings and rank changes are then rebuilt from '
+        'the generated games with rebuild_rankings.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--groups', type=int, default=10)
+        parser.add_argument(
+            '--memberships',
+            type=int,
+            default=1000,
+            help='Number of (group, player) memberships, at most users * groups.',
+        )
+        parser.add_argument(
+            '--games',
+            type=int,
+            default=10000,
+            help='Number of finished games.',
+        )
+        parser.add_argument(
+            '--active-games',
+            type=int,
+            default=20,
+            help='Number of games still to be played.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--start',
+            default='2017-01-01',
+            help='Date (YYYY-MM-DD) of the first game.',
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=365,
+            help='Number of days the games are spread over.',
+        )
+        parser.add_argument(
+            '--prefix',
+            default='seed',
+            help='Prefix of the generated usernames and group names.',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Number of rows to write per query.',
+        )
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.chunk_size = options['chunk_size']
+        self.prefix = options['prefix']
+
+        if options['users'] < 2 or options['groups'] < 1:
+            raise CommandError('A league needs at least 2 users and 1 group.')
+
+        if User.objects.filter(username__startswith=self.prefix).exists():
+            raise CommandError(
+                f'Users starting with "{self.prefix}" already exist, '
+                f'use another --prefix.'
+            )
+
+        try:
+            start = timezone.make_aware(
+                datetime.strptime(options['start'], '%Y-%m-%d'), timezone.utc)
+        except ValueError:
+            raise CommandError('--start must be a YYYY-MM-DD date.')
+
+        with transaction.atomic():
+            players = self.create_players(options['users'])
+            groups = self.create_groups(options['groups'])
+            members = self.create_memberships(
+                groups, players, options['memberships'])
+
+            self.create_games(
+                members,
+                options['games'],
+                options['active_games'],
+                start,
+                timedelta(days=options['days']),
+            )
+
+            # RankChange rows, rankings, group rankings and stats.
+            call_command(
+                'rebuild_rankings',
+                chunk_size=self.chunk_size,
+                stdout=self.stdout,
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {len(players)} players in {len(groups)} groups '
+            f'with {options["games"]} games.'
+        ))
+
+    def bulk_create(self, model, objects):
+        """Insert the objects, a chunk at a time."""
+
+        for start in range(0, len(objects), self.chunk_size):
+            model.objects.bulk_create(objects[start:start + self.chunk_size])
+
+    def create_players(self, count):
+        """:return: List of the new Player pks."""
+
+        # bulk_create() skips the signal that creates each user's Player.
+        self.bulk_create(User, [
+            User(username=f'{self.prefix}{i}', password='!')
+            for i in range(count)
+        ])
+        users = dict(User.objects.filter(
+            username__startswith=self.prefix,
+        ).values_list('username', 'pk'))
+
+        self.bulk_create(Player, [
+            Player(user_id=users[f'{self.prefix}{i}'], name=f'{self.prefix}{i}')
+            for i in range(count)
+        ])
+        players = dict(Player.objects.filter(
+            user__username__startswith=self.prefix,
+        ).values_list('user_id', 'pk'))
+
+        return [players[users[f'{self.prefix}{i}']] for i in range(count)]
+
+    def create_groups(self, count):
+        """:return: List of the new Group pks."""
+
+        names = [f'{self.prefix} group {i}' for i in range(count)]
+        self.bulk_create(Group, [Group(name=name) for name in names])
+        groups = dict(Group.objects.filter(
+            name__startswith=f'{self.prefix} group ',
+        ).values_list('name', 'pk'))
+
+        return [groups[name] for name in names]
+
+    def create_memberships(self, groups, players, count):
+        """
+        :return: Dict of the member pks of each group pk, the first
+        member of each group is also its admin.
+        """
+        count = min(count, len(groups) * len(players))
+        members = {group_pk: [] for group_pk in groups}
+
+        for i in sorted(self.random.sample(range(len(groups) * len(players)), count)):
+            group_pk, player_pk = divmod(i, len(players))
+            members[groups[group_pk]].append(players[player_pk])
+
+        self.bulk_create(Group.players.through, [
+            Group.players.through(group_id=group_pk, player_id=player_pk)
+            for group_pk, player_pks in members.items()
+            for player_pk in player_pks
+        ])
+        self.bulk_create(Group.admins.through, [
+            Group.admins.through(group_id=group_pk, player_id=player_pks[0])
+            for group_pk, player_pks in members.items()
+            if player_pks
+        ])
+
+        return {
+            group_pk: player_pks
+            for group_pk, player_pks in members.items()
+            if len(player_pks) >= 2
+        }
+
+    def create_games(self, members, count, active_count, start, period):
+        """
+        Insert the games, in the order they were played.
+
+        Each player has a hidden skill, and the winner of each game is
+        drawn from the expected score of their skills, so the rankings
+        have something to converge on.
+        """
+        if not members:
+            if count or active_count:
+                raise CommandError('No group has enough members for a game.')
+            return
+
+        skills = {
+            player_pk: self.random.gauss(1000, 200)
+            for player_pks in members.values()
+            for player_pk in player_pks
+        }
+        groups = sorted(members)
+        offsets = sorted(
+            self.random.random() * period.total_seconds()
+            for _ in range(count + active_count)
+        )
+
+        games = []
+        for i, offset in enumerate(offsets):
+            group_pk = self.random.choice(groups)
+            home, away = self.random.sample(members[group_pk], 2)
+            game = {
+                'group': group_pk,
+                'players': (home, away),
+                'date_time': start + timedelta(seconds=offset),
+            }
+
+            # The latest games are still to be played.
+            if i < count:
+                won = self.random.random() < expected_score(
+                    skills[home], skills[away])
+                game.update({
+                    'winner': home if won else away,
+                    'home_score': 11,
+                    'away_score': self.random.randint(0, 9),
+                })
+
+            games.append(game)
+
+        for first in range(0, len(games), self.chunk_size):
+            insert_games(Game, games[first:first + self.chunk_size])
@@ -0,0 +1,136 @@
+"""Settle the group rankings of the engines rating a day at a time."""
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from rankings.cache import invalidate_groups
+from rankings.engines import ENGINES, RatingEngine
+from rankings.history import RatingIndex, bulk_update, finished_games
+from rankings.models import Game, Group, GroupRanking
+
+
+class Command(BaseCommand):
+    """Rate each complete day of games since the groups were last settled."""
+
+    help = (
+        'Settle the rankings of the groups whose rating engine (like '
+        'Glicko-2) rates a whole day of games at once, up to the start of '
+        'today. Run it daily, after midnight.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Number of rows to write per query.',
+        )
+
+    def handle(self, *args, **options):
+        self.chunk_size = options['chunk_size']
+
+        today = RatingEngine.period(timezone.now())
+        groups = Group.objects.filter(
+            Q(rated_until__isnull=True) |
+            Q(rated_until__lt=RatingEngine.period_start(today)),
+            rating_engine__in=[
+                name for name, engine in ENGINES.items() if not engine.per_game
+            ],
+        ).order_by('pk')
+
+        settled = []
+        for group in groups:
+            with transaction.atomic():
+                games = self.settle(group, today)
+            settled.append(group.pk)
+
+            self.stdout.write(f'{group}: settled {games} games.')
+
+        # The bulk updates skip the signals that invalidate the caches.
+        invalidate_groups(settled)
+
+        self.stdout.write(self.style.SUCCESS(f'Settled {len(settled)} groups.'))
+
+    def settle(self, group, today):
+        """
+        :param group: The Group to settle.
+        :param today: The rating period of today, which isn't settled.
+        :return: The number of games settled.
+        """
+        group = Group.objects.select_for_update().get(pk=group.pk)
+        engine = group.engine
+
+        rows = Game.players.through.objects.filter(
+            game__group=group,
+            game__date_time__lt=RatingEngine.period_start(today),
+        )
+        first_period = None
+        if group.rated_until:
+            rows = rows.filter(game__date_time__gte=group.rated_until)
+            first_period = RatingEngine.period(group.rated_until)
+
+        games = list(finished_games(rows))
+
+        # The clock only starts with the first game.
+        if not games and not group.rated_until:
+            return 0
+
+        date_times = dict(Game.objects.filter(
+            pk__in=[game_pk for game_pk, _, _ in games],
+        ).values_list('pk', 'date_time'))
+
+        # Every member is settled, to grow the deviations of those who
+        # didn't play, along with anyone who has since left.
+        standings = {
+            ranking.player_id: ranking
+            for ranking in group.rankings.all()
+        }
+        index = RatingIndex()
+        for player_pk in standings:
+            index.add(player_pk)
+        winners = np.array(
+            [index.add(winner_pk) for _, winner_pk, _ in games], dtype=np.intp)
+        losers = np.array(
+            [index.add(loser_pk) for _, _, loser_pk in games], dtype=np.intp)
+
+        ratings = {
+            field: np.array([
+                getattr(standings[player_pk], field)
+                if player_pk in standings else default
+                for player_pk in index.keys
+            ], dtype=np.float64)
+            for field, default in engine.fields.items()
+        }
+        ratings, after = engine.replay(
+            ratings,
+            winners,
+            losers,
+            [RatingEngine.period(date_times[game_pk]) for game_pk, _, _ in games],
+            first_period=first_period,
+            last_period=today - 1,
+        )
+
+        peaks = ratings['ranking'].copy()
+        np.maximum.at(peaks, winners, after[:, 0])
+        np.maximum.at(peaks, losers, after[:, 1])
+        ratings = {field: array.tolist() for field, array in ratings.items()}
+
+        values = {}
+        for player_pk, standing in standings.items():
+            position = index[player_pk]
+            values[standing.pk] = {
+                field: array[position] for field, array in ratings.items()
+            }
+            values[standing.pk]['peak_ranking'] = max(
+                standing.peak_ranking, float(peaks[position]))
+
+        if values:
+            bulk_update(GroupRanking, values, self.chunk_size)
+
+        Group.objects.filter(pk=group.pk).update(
+            rated_until=RatingEngine.period_start(today))
+
+        return len(games)
@@ -0,0 +1,103 @@
+"""Snapshot the group leaderboards, for looking back at past days."""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from rankings.engines import RatingEngine
+from rankings.models import (
+    Game,
+    Group,
+    LeaderboardSnapshot,
+    SnapshotRanking,
+)
+from rankings.snapshots import standings_as_of
+
+
+class Command(BaseCommand):
+    """Snapshot each group that has played enough games since its last."""
+
+    help = (
+        'Snapshot the rankings of each group as of the start of today, once '
+        'it has played enough games since its last snapshot. Past '
+        'leaderboards replay the games since the nearest snapshot. Run it '
+        'daily, after settle_ratings.'
+    )
+
+    # Number of rows to write per query, see --chunk-size.
+    chunk_size = 1000
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--games',
+            type=int,
+            default=settings.SNAPSHOT_GAMES,
+            help='Number of new games a group needs for a new snapshot.',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Number of rows to write per query.',
+        )
+
+    def handle(self, *args, **options):
+        self.chunk_size = options['chunk_size']
+        minimum = max(options['games'], 1)
+
+        # Snapshots of the old engine are no use after a change.
+        LeaderboardSnapshot.objects.exclude(
+            rating_engine=F('group__rating_engine'),
+        ).delete()
+
+        today = RatingEngine.period_start(RatingEngine.period(timezone.now()))
+        taken = 0
+
+        for group in Group.objects.order_by('pk'):
+            latest = group.snapshots.filter(
+                rating_engine=group.rating_engine,
+            ).order_by('-date_time').values_list('date_time', flat=True).first()
+
+            games = Game.objects.filter(
+                group=group,
+                active=False,
+                date_time__lt=today,
+            )
+            if latest:
+                games = games.filter(date_time__gte=latest)
+
+            if games.count() < minimum:
+                continue
+
+            with transaction.atomic():
+                players = self.snapshot(group, today)
+            taken += 1
+
+            self.stdout.write(f'{group}: snapshot of {players} players.')
+
+        self.stdout.write(self.style.SUCCESS(f'Took {taken} snapshots.'))
+
+    def snapshot(self, group, date_time):
+        """
+        :param group: The Group to snapshot.
+        :param date_time: The time to snapshot it at.
+        :return: The number of players in the snapshot.
+        """
+        standings, games = standings_as_of(group, date_time)
+
+        snapshot = LeaderboardSnapshot.objects.create(
+            group=group,
+            rating_engine=group.rating_engine,
+            date_time=date_time,
+            games=games,
+        )
+        for standing in standings.values():
+            standing.pk = None
+            standing.snapshot = snapshot
+
+        SnapshotRanking.objects.bulk_create(
+            standings.values(), batch_size=self.chunk_size)
+
+        return len(standings)
@@ -0,0 +1,97 @@
+"""Pair up the players waiting for a game."""
+
+from itertools import combinations
+
+
+def rematches(game_players):
+    """
+    :param game_players: Iterable of (game_pk, player_pk) Tuples.
+    :return: Dict of {frozenset of two player pks: games played}.
+    """
+    games = {}
+    for game_pk, player_pk in game_players:
+        games.setdefault(game_pk, []).append(player_pk)
+
+    counts = {}
+    for player_pks in games.values():
+        for pair in combinations(sorted(set(player_pks)), 2):
+            pair = frozenset(pair)
+            counts[pair] = counts.get(pair, 0) + 1
+
+    return counts
+
+
+def pair_players(rankings, recent, penalty):
+    """
+    :param rankings: Dict of {player_pk: ranking} of the players waiting.
+    :param recent: Dict of {frozenset of two player pks: games played
+    recently}, see rematches().
+    :param penalty: The cost of each recent game between a pair, in
+    ranking points.
+    :return: (pairs, bye) Tuple, a list of (player_pk, opponent_pk)
+    Tuples, and the pk of the player left without a game or None.
+
+    Pairs the players to minimise the total ranking gap, plus the
+    penalty for each rematch. Pairing neighbours in ranking order is
+    optimal without rematches, so the players are sorted and a dynamic
+    programme only looks at neighbouring pairs, or swapping partners
+    within four neighbours to avoid a rematch. That's linear in the
+    number of players after the sort.
+    """
+    players = sorted(rankings, key=lambda pk: (-rankings[pk], pk))
+    size = len(players)
+    byes = size % 2
+
+    def cost(i, j):
+        pair = frozenset((players[i], players[j]))
+        return (
+            abs(rankings[players[i]] - rankings[players[j]]) +
+            penalty * recent.get(pair, 0)
+        )
+
+    # best[i][b] is the (cost, choice) of pairing the players from i on,
+    # with b byes left to give.
+    infinity = float('inf')
+    best = [[(infinity, None)] * (byes + 1) for _ in range(size + 1)]
+    best[size][0] = (0, None)
+
+    for i in range(size - 1, -1, -1):
+        for left in range(byes + 1):
+            options = []
+
+            if i + 1 < size:
+                options.append((
+                    cost(i, i + 1) + best[i + 2][left][0],
+                    ((i, i + 1),),
+                ))
+            if i + 3 < size:
+                for pairs in (
+                        ((i, i + 2), (i + 1, i + 3)),
+                        ((i, i + 3), (i + 1, i + 2))):
+                    options.append((
+                        sum(cost(*pair) for pair in pairs) +
+                        best[i + 4][left][0],
+                        pairs,
+                    ))
+            if left:
+                options.append((best[i + 1][left - 1][0], ('bye',)))
+
+            if options:
+                best[i][left] = min(options, key=lambda option: option[0])
+
+    pairs = []
+    bye = None
+    i = 0
+    left = byes
+    while i < size:
+        choice = best[i][left][1]
+        if choice == ('bye',):
+            bye = players[i]
+            left -= 1
+            i += 1
+            continue
+
+        pairs += [(players[a], players[b]) for a, b in choice]
+        i += 2 * len(choice)
+
+    return pairs, bye
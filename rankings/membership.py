@@ -0,0 +1,90 @@
+"""Which groups the requesting user is a member or admin of."""
+
+from django.db.models import Exists, OuterRef
+from django.shortcuts import get_object_or_404
+
+from rankings.models import Group
+
+
+class Membership(object):
+    """
+    The user's roles in each group asked about, looked up with one
+    query per group and remembered for the rest of the request.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self.roles = {}
+
+    def annotate(self, groups):
+        """
+        :param groups: QuerySet of Groups.
+        :return: The QuerySet, with whether the user 'is_member' and
+        'is_admin' of each group.
+        """
+        user_pk = self.user.pk if self.user.is_authenticated else None
+
+        return groups.annotate(
+            is_member=Exists(Group.players.through.objects.filter(
+                group=OuterRef('pk'),
+                player__user=user_pk,
+            )),
+            is_admin=Exists(Group.admins.through.objects.filter(
+                group=OuterRef('pk'),
+                player__user=user_pk,
+            )),
+        )
+
+    def get_group(self, group_pk):
+        """
+        :param group_pk: The pk of the Group.
+        :return: The Group, with the user's roles in it, raising Http404
+        if there's no such group.
+        """
+        group = get_object_or_404(self.annotate(Group.objects.all()), pk=group_pk)
+        self.roles[group.pk] = (bool(group.is_member), bool(group.is_admin))
+
+        return group
+
+    def get_roles(self, group):
+        """
+        :param group: The Group, or its pk.
+        :return: (is_member, is_admin) Tuple for the user.
+        """
+        group_pk = int(getattr(group, 'pk', group))
+
+        if group_pk not in self.roles:
+            roles = (False, False)
+
+            if self.user.is_authenticated:
+                roles = self.annotate(Group.objects.filter(
+                    pk=group_pk,
+                )).values_list('is_member', 'is_admin').first() or roles
+
+            self.roles[group_pk] = (bool(roles[0]), bool(roles[1]))
+
+        return self.roles[group_pk]
+
+    def is_member(self, group):
+        """Whether the user is a member of the group."""
+
+        return self.get_roles(group)[0]
+
+    def is_admin(self, group):
+        """Whether the user is an admin of the group."""
+
+        return self.get_roles(group)[1]
+
+    def joined(self, group):
+        """Remember the user is now a member of the group."""
+
+        self.roles[group.pk] = (True, self.is_admin(group))
+
+
+def get_membership(request):
+    """:return: The Membership of the request's user, one per request."""
+
+    if not hasattr(request, 'membership'):
+        request.membership = Membership(request.user)
+
+    return request.membership
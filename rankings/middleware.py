@@ -0,0 +1,163 @@
+"""Middleware for Table Tennis Rankings."""
+
+import random
+import threading
+from collections import deque
+from time import perf_counter
+
+import numpy as np
+from django.conf import settings
+
+from rankings.benchmark import SQLTimer, milliseconds
+
+
+class RequestStats(object):
+    """
+    The timings of the latest requests to each url, kept in memory, so
+    each worker process has its own.
+    """
+
+    # The columns of each sample.
+    FIELDS = ('total_ms', 'sql_ms', 'queries', 'render_ms')
+
+    def __init__(self, window):
+        """:param window: The number of requests to keep for each url."""
+
+        self.window = window
+        self.lock = threading.Lock()
+        self.samples = {}
+
+    def add(self, name, sample):
+        """
+        :param name: The url name of the request.
+        :param sample: Tuple of the request's FIELDS.
+        """
+        with self.lock:
+            if name not in self.samples:
+                self.samples[name] = deque(maxlen=self.window)
+            self.samples[name].append(sample)
+
+    def clear(self):
+        with self.lock:
+            self.samples.clear()
+
+    def summary(self):
+        """
+        :return: List of Dicts of the 'name', number of 'requests', and
+        p50, p95 and p99 of each of the FIELDS, like 'total_ms_p95', of
+        each url, the slowest p95 first.
+        """
+        with self.lock:
+            samples = {
+                name: np.array(rows, dtype=np.float64)
+                for name, rows in self.samples.items()
+            }
+
+        rows = []
+        for name, array in samples.items():
+            row = {'name': name, 'requests': len(array)}
+            percentiles = np.percentile(array, [50, 95, 99], axis=0)
+
+            for i, field in enumerate(self.FIELDS):
+                for percentile, values in zip((50, 95, 99), percentiles):
+                    row[f'{field}_p{percentile}'] = round(values[i], 3)
+
+            rows.append(row)
+
+        rows.sort(key=lambda row: (-row['total_ms_p95'], row['name']))
+
+        return rows
+
+
+stats = RequestStats(settings.PERFORMANCE_WINDOW)
+
+
+class PerformanceMiddleware(object):
+    """
+    Time a sample of the requests, PERFORMANCE_SAMPLE_RATE of them.
+
+    The SQL queries, the time spent running them, the time spent
+    rendering the page's template and the total time are added to the
+    rolling stats of the url, and sent back in a Server-Timing header
+    for the browser's developer tools. Requests that aren't sampled
+    aren't touched.
+
+    Streaming responses, like the exports, make their content as it's
+    sent, so they're timed until the last of it is sent. They don't get
+    a Server-Timing header, as it's sent before the content.
+
+    Put it first in MIDDLEWARE, to time everything else.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.PERFORMANCE_SAMPLE_RATE:
+            return self.get_response(request)
+
+        request.render_seconds = 0
+        start = perf_counter()
+        with SQLTimer(debug=False) as timer:
+            response = self.get_response(request)
+
+        if response.streaming:
+            response.streaming_content = self.timed_content(
+                response.streaming_content, request, start, timer)
+            return response
+
+        sample = self.add_sample(request, start, timer)
+
+        response['Server-Timing'] = ', '.join([
+            f'sql;dur={sample[1]};desc="{timer.queries} queries"',
+            f'render;dur={sample[3]}',
+            f'total;dur={sample[0]}',
+        ])
+
+        return response
+
+    def timed_content(self, content, request, start, timer):
+        """
+        Generator of the streaming content, timing each part as it's made,
+        and adding the sample once it's finished or closed.
+        """
+        try:
+            while True:
+                with timer:
+                    part = next(content, None)
+                if part is None:
+                    return
+                yield part
+        finally:
+            self.add_sample(request, start, timer)
+
+    def add_sample(self, request, start, timer):
+        """:return: The sample of the request, added to its url's stats."""
+
+        total = perf_counter() - start
+
+        match = request.resolver_match
+        name = match.view_name if match else 'unresolved'
+
+        sample = (
+            milliseconds(total),
+            milliseconds(timer.seconds),
+            timer.queries,
+            milliseconds(request.render_seconds),
+        )
+        stats.add(name, sample)
+
+        return sample
+
+    def process_template_response(self, request, response):
+        """Time the template being rendered, after the view returns."""
+
+        if hasattr(request, 'render_seconds'):
+            start = perf_counter()
+
+            def rendered(response):
+                request.render_seconds += perf_counter() - start
+
+            response.add_post_render_callback(rendered)
+
+        return response
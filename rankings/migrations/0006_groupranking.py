@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-16 19:02
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rankings', '0005_rankingcheckpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroupRanking',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ranking', models.FloatField(default=1000)),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rankings', to='rankings.Group')),
+                ('player', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='group_rankings', to='rankings.Player')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='groupranking',
+            index=models.Index(fields=['group', '-ranking'], name='rankings_group_leaderboard'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='groupranking',
+            unique_together=set([('group', 'player')]),
+        ),
+    ]
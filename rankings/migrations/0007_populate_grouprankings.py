@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from itertools import groupby
+
+from django.conf import settings
+from django.db import migrations
+
+# The ELO rules as they were when this migration was written, kept here
+# so later changes to rankings.elo don't change what it does.
+RANKING_FLOOR = 100
+
+
+def elo(winner_rank, loser_rank, weighting):
+    """The (winner, loser) rankings after a game."""
+    delta = weighting / (1 + 10 ** ((winner_rank - loser_rank) / 400))
+
+    winner_rank = max(winner_rank + delta, RANKING_FLOOR)
+    loser_rank = max(loser_rank - delta, RANKING_FLOOR)
+
+    return round(winner_rank * 100) / 100, round(loser_rank * 100) / 100
+
+
+def populate_group_rankings(apps, schema_editor):
+    """Create a GroupRanking for every member, replaying the group's games."""
+    Game = apps.get_model('rankings', 'Game')
+    Group = apps.get_model('rankings', 'Group')
+    GroupRanking = apps.get_model('rankings', 'GroupRanking')
+
+    default = GroupRanking._meta.get_field('ranking').default
+    groups = dict(Group.games.through.objects.values_list(
+        'game_id', 'group_id'))
+    rows = Game.players.through.objects.filter(
+        game__active=False,
+        game__winner__isnull=False,
+    ).order_by(
+        'game__date_time',
+        'game_id',
+    ).values_list(
+        'game_id',
+        'game__winner_id',
+        'player_id',
+    )
+
+    # Each (group, player) is rated on the group's games alone.
+    rankings = {}
+    for game_pk, game_rows in groupby(rows.iterator(), lambda row: row[0]):
+        game_rows = list(game_rows)
+        group_pk = groups.get(game_pk)
+        winner_pk = game_rows[0][1]
+        player_pks = [row[2] for row in game_rows]
+
+        if group_pk is None or len(player_pks) != 2 or (
+                winner_pk not in player_pks):
+            continue
+
+        loser_pk = player_pks[0] if player_pks[1] == winner_pk else player_pks[1]
+        winner = (group_pk, winner_pk)
+        loser = (group_pk, loser_pk)
+        rankings[winner], rankings[loser] = elo(
+            rankings.get(winner, default),
+            rankings.get(loser, default),
+            settings.ELO_WEIGHTING,
+        )
+
+    GroupRanking.objects.bulk_create([
+        GroupRanking(
+            group_id=group_pk,
+            player_id=player_pk,
+            ranking=rankings.get((group_pk, player_pk), default),
+        )
+        for group_pk, player_pk in Group.players.through.objects.values_list(
+            'group_id', 'player_id').iterator()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rankings', '0006_groupranking'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            populate_group_rankings,
+            migrations.RunPython.noop,
+        ),
+    ]
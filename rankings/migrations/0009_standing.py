@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-16 19:09
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rankings', '0008_game_recent_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='groupranking',
+            name='losses',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='groupranking',
+            name='peak_ranking',
+            field=models.FloatField(default=1000),
+        ),
+        migrations.AddField(
+            model_name='groupranking',
+            name='points_against',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='groupranking',
+            name='points_for',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='groupranking',
+            name='streak',
+            field=models.IntegerField(default=0, help_text='Games won in a row, or lost in a row when negative.'),
+        ),
+        migrations.AddField(
+            model_name='groupranking',
+            name='wins',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='player',
+            name='losses',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='player',
+            name='peak_ranking',
+            field=models.FloatField(default=1000),
+        ),
+        migrations.AddField(
+            model_name='player',
+            name='points_against',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='player',
+            name='points_for',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='player',
+            name='streak',
+            field=models.IntegerField(default=0, help_text='Games won in a row, or lost in a row when negative.'),
+        ),
+        migrations.AddField(
+            model_name='player',
+            name='wins',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def populate_date_times(apps, schema_editor):
+    """Copy the date_time of each game onto its rank changes."""
+    Game = apps.get_model('rankings', 'Game')
+    RankChange = apps.get_model('rankings', 'RankChange')
+
+    RankChange.objects.update(date_time=Subquery(
+        Game.objects.filter(pk=OuterRef('game_id')).values('date_time')[:1]
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rankings', '0009_standing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rankchange',
+            name='date_time',
+            field=models.DateTimeField(null=True, help_text='When the game was played, copied from the game.'),
+        ),
+        migrations.RunPython(
+            populate_date_times,
+            migrations.RunPython.noop,
+        ),
+    ]
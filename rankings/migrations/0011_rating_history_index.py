@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rankings', '0010_rankchange_date_time'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='rankchange',
+            name='date_time',
+            field=models.DateTimeField(help_text='When the game was played, copied from the game.'),
+        ),
+        migrations.AddIndex(
+            model_name='rankchange',
+            index=models.Index(fields=['player', 'date_time'], name='rankings_rating_history'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-16 19:33
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rankings', '0011_rating_history_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='game',
+            name='date_time',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
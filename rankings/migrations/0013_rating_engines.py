@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-16 19:41
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rankings', '0012_game_date_time_default'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='rated_until',
+            field=models.DateTimeField(blank=True, help_text='When the ratings were last settled, for engines rating a whole day of games at once.', null=True),
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='rating_engine',
+            field=models.CharField(choices=[('elo', 'Elo'), ('glicko2', 'Glicko-2')], default='elo', help_text='How the group rankings are rated, run rebuild_rankings after changing it.', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='groupranking',
+            name='deviation',
+            field=models.FloatField(default=350, help_text='How uncertain the ranking is, for Glicko-2 groups.'),
+        ),
+        migrations.AddField(
+            model_name='groupranking',
+            name='volatility',
+            field=models.FloatField(default=0.06, help_text='How erratic the results are, for Glicko-2 groups.'),
+        ),
+    ]
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Subquery
+import django.db.models.deletion
+
+
+def populate_game_groups(apps, schema_editor):
+    """Point each game at the first group it was added to."""
+    Game = apps.get_model('rankings', 'Game')
+    Group = apps.get_model('rankings', 'Group')
+
+    Game.objects.update(group=Subquery(
+        Group.games.through.objects.filter(
+            game_id=OuterRef('pk'),
+        ).order_by('id').values('group_id')[:1]
+    ))
+
+
+def remove_duplicate_rank_changes(apps, schema_editor):
+    """Keep only the latest rank change of each player in each game."""
+    RankChange = apps.get_model('rankings', 'RankChange')
+
+    duplicates = RankChange.objects.values('player_id', 'game_id').annotate(
+        changes=Count('pk'),
+        latest=Max('pk'),
+    ).filter(changes__gt=1)
+
+    for duplicate in duplicates.iterator():
+        RankChange.objects.filter(
+            player_id=duplicate['player_id'],
+            game_id=duplicate['game_id'],
+        ).exclude(pk=duplicate['latest']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rankings', '0013_rating_engines'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='group',
+            field=models.ForeignKey(blank=True, help_text='The group the game was played in, kept in step with Group.games.', null=True, on_delete=django.db.models.deletion.SET_NULL, to='rankings.Group'),
+        ),
+        migrations.AlterField(
+            model_name='group',
+            name='games',
+            field=models.ManyToManyField(blank=True, related_name='groups', to='rankings.Game'),
+        ),
+        migrations.RunPython(
+            populate_game_groups,
+            migrations.RunPython.noop,
+        ),
+        migrations.RunPython(
+            remove_duplicate_rank_changes,
+            migrations.RunPython.noop,
+        ),
+        migrations.AlterUniqueTogether(
+            name='rankchange',
+            unique_together=set([('player', 'game')]),
+        ),
+        migrations.AddIndex(
+            model_name='game',
+            index=models.Index(fields=['group', 'active', '-date_time', '-id'], name='rankings_game_in_group'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rankings', '0014_game_group'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='away_points',
+            field=models.PositiveIntegerField(default=0, help_text='The live score of the second player, by pk.'),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='home_points',
+            field=models.PositiveIntegerField(default=0, help_text='The live score of the first player, by pk, while the game is in progress.'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+from django.db.models import Case, F, OuterRef, Subquery, Value, When
+from django.db.models.functions import Concat
+
+
+def populate_names(apps, schema_editor):
+    """Copy each user's full name, or username, onto their player."""
+    Player = apps.get_model('rankings', 'Player')
+    User = apps.get_model('auth', 'User')
+
+    # The same as User.get_full_name(), or the username without one.
+    names = User.objects.filter(pk=OuterRef('user_id')).annotate(
+        display_name=Case(
+            When(first_name='', last_name='', then=F('username')),
+            When(first_name='', then=F('last_name')),
+            When(last_name='', then=F('first_name')),
+            default=Concat('first_name', Value(' '), 'last_name'),
+            output_field=models.CharField(),
+        ),
+    ).values('display_name')[:1]
+
+    Player.objects.update(name=Subquery(names))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0008_alter_user_username_max_length'),
+        ('rankings', '0015_game_points'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='player',
+            name='name',
+            field=models.CharField(blank=True, editable=False, help_text="The user's full name, or username, kept in step with the user so showing players doesn't load their users.", max_length=150),
+        ),
+        migrations.RunPython(
+            populate_names,
+            migrations.RunPython.noop,
+        ),
+    ]
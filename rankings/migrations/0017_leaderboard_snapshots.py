@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-16 20:11
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rankings', '0016_player_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardSnapshot',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rating_engine', models.CharField(choices=[('elo', 'Elo'), ('glicko2', 'Glicko-2')], help_text='The engine the group was rated with.', max_length=20)),
+                ('date_time', models.DateTimeField(help_text='Every game played in the group before this is included.')),
+                ('games', models.PositiveIntegerField(default=0, help_text='The number of games included.')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='rankings.Group')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SnapshotRanking',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ranking', models.FloatField(default=1000)),
+                ('peak_ranking', models.FloatField(default=1000)),
+                ('wins', models.PositiveIntegerField(default=0)),
+                ('losses', models.PositiveIntegerField(default=0)),
+                ('streak', models.IntegerField(default=0, help_text='Games won in a row, or lost in a row when negative.')),
+                ('points_for', models.IntegerField(default=0)),
+                ('points_against', models.IntegerField(default=0)),
+                ('deviation', models.FloatField(default=350)),
+                ('volatility', models.FloatField(default=0.06)),
+                ('player', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='rankings.Player')),
+                ('snapshot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rankings', to='rankings.LeaderboardSnapshot')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='snapshotranking',
+            unique_together=set([('snapshot', 'player')]),
+        ),
+        migrations.AlterUniqueTogether(
+            name='leaderboardsnapshot',
+            unique_together=set([('group', 'date_time')]),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import F
+
+
+def populate_finished(apps, schema_editor):
+    """The finished games so far count as finished when they were played."""
+    Game = apps.get_model('rankings', 'Game')
+
+    Game.objects.filter(active=False).update(finished=F('date_time'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rankings', '0017_leaderboard_snapshots'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CheckpointRanking',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ranking', models.FloatField()),
+                ('player', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='rankings.Player')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='finished',
+            field=models.DateTimeField(blank=True, db_index=True, help_text='When the result was entered, which can be long after the game was played.', null=True),
+        ),
+        migrations.AddField(
+            model_name='rankingcheckpoint',
+            name='finished',
+            field=models.DateTimeField(blank=True, help_text='Every game finished by this time has been replayed.', null=True),
+        ),
+        migrations.RunPython(
+            populate_finished,
+            migrations.RunPython.noop,
+        ),
+    ]
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-16 20:42
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+def hide_non_members(apps, schema_editor):
+    """Hide the rankings of players who aren't in the group."""
+    Group = apps.get_model('rankings', 'Group')
+    GroupRanking = apps.get_model('rankings', 'GroupRanking')
+
+    memberships = set(Group.players.through.objects.values_list(
+        'group_id', 'player_id'))
+    pks = [
+        pk
+        for pk, group_pk, player_pk in GroupRanking.objects.values_list(
+            'pk', 'group_id', 'player_id').iterator()
+        if (group_pk, player_pk) not in memberships
+    ]
+
+    for start in range(0, len(pks), 500):
+        GroupRanking.objects.filter(
+            pk__in=pks[start:start + 500],
+        ).update(member=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rankings', '0018_game_finished'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='groupranking',
+            name='rankings_group_leaderboard',
+        ),
+        migrations.AddField(
+            model_name='groupranking',
+            name='member',
+            field=models.BooleanField(default=True, help_text='Whether the player is still in the group, former members keep their ranking but are left off the leaderboard.'),
+        ),
+        migrations.AddIndex(
+            model_name='groupranking',
+            index=models.Index(fields=['group', 'member', '-ranking'], name='rankings_group_leaderboard'),
+        ),
+        migrations.RunPython(
+            hide_non_members,
+            migrations.RunPython.noop,
+        ),
+    ]
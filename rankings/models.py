@@ -1,18 +1,31 @@
 """Models for Table Tennis Rankings."""
 
-from django.conf import settings
 from django.contrib.auth.models import User
 from django.db import models
-from django.db.models.signals import post_save
+from django.db.models import OuterRef, Subquery
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
 from django.dispatch import receiver
+from django.utils import timezone
 
-from rankings.elo import elo
+from rankings.cache import bump_version, invalidate_groups, player_name
+from rankings.engines import (
+    ENGINE_CHOICES,
+    EloEngine,
+    RatingEngine,
+    get_engine,
+)
 
 
 class Game(models.Model):
     """Game model, represents a single game."""
     date_time = models.DateTimeField(
-        auto_now_add=True,
+        default=timezone.now,
     )
 
     players = models.ManyToManyField(
@@ -37,6 +50,44 @@ class Game(models.Model):
         blank=True,
         null=True,
     )
+    home_points = models.PositiveIntegerField(
+        default=0,
+        help_text='The live score of the first player, by pk, while the '
+                  'game is in progress.',
+    )
+    away_points = models.PositiveIntegerField(
+        default=0,
+        help_text='The live score of the second player, by pk.',
+    )
+    group = models.ForeignKey(
+        'Group',
+        blank=True,
+        null=True,
+        on_delete=models.SET_NULL,
+        help_text='The group the game was played in, kept in step with '
+                  'Group.games.',
+    )
+    finished = models.DateTimeField(
+        blank=True,
+        null=True,
+        db_index=True,
+        help_text='When the result was entered, which can be long after '
+                  'the game was played.',
+    )
+
+    class Meta:
+        indexes = [
+            # Game lists are paginated newest first by (date_time, id).
+            models.Index(
+                fields=['active', '-date_time', '-id'],
+                name='rankings_game_recent',
+            ),
+            # The same, within a group.
+            models.Index(
+                fields=['group', 'active', '-date_time', '-id'],
+                name='rankings_game_in_group',
+            ),
+        ]
 
     def __str__(self):
         id_ = self.pk
@@ -62,6 +113,7 @@ class Group(models.Model):
     )
     games = models.ManyToManyField(
         Game,
+        related_name='groups',
         blank=True,
     )
     admins = models.ManyToManyField(
@@ -69,46 +121,204 @@ class Group(models.Model):
         related_name='group_admins',
         blank=True,
     )
+    rating_engine = models.CharField(
+        max_length=20,
+        choices=ENGINE_CHOICES,
+        default=EloEngine.name,
+        help_text=(
+            'How the group rankings are rated, run rebuild_rankings after '
+            'changing it.'
+        ),
+    )
+    rated_until = models.DateTimeField(
+        blank=True,
+        null=True,
+        help_text=(
+            'When the ratings were last settled, for engines rating a '
+            'whole day of games at once.'
+        ),
+    )
 
     def __str__(self):
         name = self.name
         return f'{name}'
 
+    @property
+    def engine(self):
+        """The RatingEngine of the group rankings."""
+        return get_engine(self.rating_engine)
 
-class Player(models.Model):
-    """User profile for players."""
+    def leaderboard(self, limit=None):
+        """The members' rankings, highest first, with their players."""
+
+        rankings = self.rankings.filter(
+            member=True,
+        ).select_related(
+            'player',
+        ).order_by('-ranking', 'player_id')
+
+        if limit:
+            rankings = rankings[:limit]
+
+        return rankings
+
+    def ranking_position(self, player):
+        """The 1-based leaderboard position of the player, or None."""
+
+        rankings = self.rankings.filter(member=True)
+        ranking = rankings.filter(player=player).values_list(
+            'ranking', flat=True).first()
+
+        if ranking is None:
+            return None
+
+        return rankings.filter(ranking__gt=ranking).count() + 1
+
+
+class Standing(models.Model):
+    """A player's ranking, with running totals of their finished games."""
 
-    user = models.OneToOneField(
-        User, 
-        on_delete=models.CASCADE,
-    )
     ranking = models.FloatField(
         default=1000,
     )
+    peak_ranking = models.FloatField(
+        default=1000,
+    )
+    wins = models.PositiveIntegerField(
+        default=0,
+    )
+    losses = models.PositiveIntegerField(
+        default=0,
+    )
+    streak = models.IntegerField(
+        default=0,
+        help_text='Games won in a row, or lost in a row when negative.',
+    )
+    points_for = models.IntegerField(
+        default=0,
+    )
+    points_against = models.IntegerField(
+        default=0,
+    )
 
-    def __str__(self):
-        if self.user.get_full_name():
-            return self.user.get_full_name()
+    # Fields changed by a finished game.
+    standing_fields = [
+        'ranking',
+        'peak_ranking',
+        'wins',
+        'losses',
+        'streak',
+        'points_for',
+        'points_against',
+    ]
+
+    class Meta:
+        abstract = True
+
+    @property
+    def games_played(self):
+        return self.wins + self.losses
+
+    @property
+    def win_rate(self):
+        """Percentage of games won."""
+        if not self.games_played:
+            return 0
+
+        return 100 * self.wins / self.games_played
+
+    @property
+    def streak_label(self):
+        if self.streak > 0:
+            return f'W{self.streak}'
+        if self.streak < 0:
+            return f'L{-self.streak}'
+        return '-'
+
+    def record_result(self, won, points_for, points_against):
+        """
+        Add a finished game to the totals.
+
+        :param won: Whether the player won the game.
+        :param points_for: The player's score, or None.
+        :param points_against: The opponent's score, or None.
+        :return: None, call after updating the ranking.
+        """
+        if won:
+            self.wins += 1
+            self.streak = self.streak + 1 if self.streak > 0 else 1
         else:
-            return self.user.username
+            self.losses += 1
+            self.streak = self.streak - 1 if self.streak < 0 else -1
+
+        self.points_for += points_for or 0
+        self.points_against += points_against or 0
+        self.peak_ranking = max(self.peak_ranking, self.ranking)
 
     @staticmethod
-    def update_rankings(winner, loser):
+    def update_rankings(winner, loser, winner_score=None, loser_score=None,
+                        engine=None):
         """
         Update the ranking for a completed game.
 
-        :param winner: The Player that won the match.
-        :param loser: The Player that lost the match.
-        :return: None, but updates the Player object.
+        :param winner: The Player (or GroupRanking) that won the match.
+        :param loser: The Player (or GroupRanking) that lost the match.
+        :param winner_score: The winner's score, or None.
+        :param loser_score: The loser's score, or None.
+        :param engine: The RatingEngine to rate the game with, by default
+        Elo.
+        :return: None, but updates the Player objects.
 
-        This follows the ELO ranking method.
+        This follows the ELO ranking method, unless another engine is
+        given.
 
         Modify the weighting factor to suit your comp.
         """
-        weighting = settings.ELO_WEIGHTING
-        winner.ranking, loser.ranking = elo(winner.ranking, loser.ranking, weighting)
-        winner.save()
-        loser.save()
+        Standing.play(winner, loser, winner_score, loser_score, engine)
+        winner.save(update_fields=winner.standing_fields)
+        loser.save(update_fields=loser.standing_fields)
+
+    @staticmethod
+    def play(winner, loser, winner_score=None, loser_score=None, engine=None):
+        """
+        Apply a completed game to both standings, without saving them.
+
+        :param winner: The Player (or GroupRanking) that won the match.
+        :param loser: The Player (or GroupRanking) that lost the match.
+        :param winner_score: The winner's score, or None.
+        :param loser_score: The loser's score, or None.
+        :param engine: The RatingEngine to rate the game with, by default
+        Elo. Engines rating a day at a time leave the rankings alone.
+        :return: None
+        """
+        (engine or EloEngine()).play(winner, loser)
+        winner.record_result(True, winner_score, loser_score)
+        loser.record_result(False, loser_score, winner_score)
+
+
+class Player(Standing):
+    """User profile for players."""
+
+    user = models.OneToOneField(
+        User, 
+        on_delete=models.CASCADE,
+    )
+    name = models.CharField(
+        max_length=150,
+        blank=True,
+        editable=False,
+        help_text="The user's full name, or username, kept in step with "
+                  "the user so showing players doesn't load their users.",
+    )
+
+    def __str__(self):
+        return self.name
+
+    @staticmethod
+    def display_name(user):
+        """:return: The name to show for the User's player."""
+
+        return user.get_full_name() or user.username
 
 
 class RankChange(models.Model):
@@ -116,16 +326,362 @@ class RankChange(models.Model):
     game = models.ForeignKey(Game)
     before = models.FloatField()
     after = models.FloatField()
+    date_time = models.DateTimeField(
+        help_text='When the game was played, copied from the game.',
+    )
+
+    class Meta:
+        unique_together = ('player', 'game')
+        indexes = [
+            # Each player's rating history, in the order it was played.
+            models.Index(
+                fields=['player', 'date_time'],
+                name='rankings_rating_history',
+            ),
+        ]
 
     def __str__(self):
         delta = self.after - self.before
         return f'{self.after:.2f} ({delta:.2f})'
 
 
+class GroupRanking(Standing):
+    """A player's ranking within a single group."""
+
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.CASCADE,
+        related_name='rankings',
+    )
+    player = models.ForeignKey(
+        Player,
+        on_delete=models.CASCADE,
+        related_name='group_rankings',
+    )
+    deviation = models.FloatField(
+        default=350,
+        help_text='How uncertain the ranking is, for Glicko-2 groups.',
+    )
+    volatility = models.FloatField(
+        default=0.06,
+        help_text='How erratic the results are, for Glicko-2 groups.',
+    )
+    member = models.BooleanField(
+        default=True,
+        help_text='Whether the player is still in the group, former '
+                  'members keep their ranking but are left off the '
+                  'leaderboard.',
+    )
+
+    class Meta:
+        unique_together = ('group', 'player')
+        indexes = [
+            models.Index(
+                fields=['group', 'member', '-ranking'],
+                name='rankings_group_leaderboard',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.player} in {self.group}: {self.ranking}'
+
+
+class RankingCheckpoint(models.Model):
+    """The last game replayed by the rebuild_rankings command."""
+
+    date_time = models.DateTimeField()
+    game_pk = models.IntegerField()
+    finished = models.DateTimeField(
+        blank=True,
+        null=True,
+        help_text='Every game finished by this time has been replayed.',
+    )
+    updated = models.DateTimeField(
+        auto_now=True,
+    )
+
+    def __str__(self):
+        return f'Checkpoint at game {self.game_pk}'
+
+
+class CheckpointRanking(models.Model):
+    """A player's ranking as of the RankingCheckpoint."""
+
+    player = models.OneToOneField(
+        Player,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    ranking = models.FloatField()
+
+
+class LeaderboardSnapshot(models.Model):
+    """
+    A group's rankings as they stood at the start of a day, taken by the
+    snapshot_rankings command.
+    """
+
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.CASCADE,
+        related_name='snapshots',
+    )
+    rating_engine = models.CharField(
+        max_length=20,
+        choices=ENGINE_CHOICES,
+        help_text='The engine the group was rated with.',
+    )
+    date_time = models.DateTimeField(
+        help_text='Every game played in the group before this is included.',
+    )
+    games = models.PositiveIntegerField(
+        default=0,
+        help_text='The number of games included.',
+    )
+    created = models.DateTimeField(
+        auto_now_add=True,
+    )
+
+    class Meta:
+        unique_together = ('group', 'date_time')
+
+    def __str__(self):
+        return f'{self.group} at {self.date_time}'
+
+
+class SnapshotRanking(Standing):
+    """A player's ranking within a group, in a LeaderboardSnapshot."""
+
+    snapshot = models.ForeignKey(
+        LeaderboardSnapshot,
+        on_delete=models.CASCADE,
+        related_name='rankings',
+    )
+    player = models.ForeignKey(
+        Player,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    deviation = models.FloatField(
+        default=350,
+    )
+    volatility = models.FloatField(
+        default=0.06,
+    )
+
+    class Meta:
+        unique_together = ('snapshot', 'player')
+
+    def __str__(self):
+        return f'{self.player_id} in {self.snapshot}: {self.ranking}'
+
+
 @receiver(post_save, sender=User)
 def create_player_object(sender, instance, created, **kwargs):
-    """Create a player object linked to the User when the user is registered."""
-    
+    """
+    Create a player object linked to the User when the user is registered,
+    and keep the player's name in step with the user's.
+    """
+
+    name = Player.display_name(instance)
     if created:
-        Player.objects.create(user=instance)
-    instance.player.save()
+        Player.objects.create(user=instance, name=name)
+        return
+
+    # Logging in doesn't change the name.
+    if kwargs.get('update_fields') == frozenset(['last_login']):
+        return
+
+    player = instance.player
+    if player.name != name:
+        player.name = name
+        player.save(update_fields=['name'])
+
+
+@receiver(m2m_changed, sender=Group.players.through)
+def update_group_rankings(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Keep a GroupRanking for every member of a group. Those who leave keep
+    theirs, hidden until they rejoin.
+    """
+
+    if reverse:
+        # Changed from the Player side, pk_set holds Group pks.
+        memberships = [(group_pk, instance.pk) for group_pk in pk_set or []]
+        lookup = {'player': instance}
+    else:
+        memberships = [(instance.pk, player_pk) for player_pk in pk_set or []]
+        lookup = {'group': instance}
+    key = 'group_id__in' if reverse else 'player_id__in'
+
+    if action == 'post_add':
+        existing = {
+            (group_pk, player_pk): (pk, member)
+            for pk, group_pk, player_pk, member in GroupRanking.objects.filter(
+                **lookup, **{key: pk_set},
+            ).values_list('pk', 'group_id', 'player_id', 'member')
+        }
+        rejoined = [pk for pk, member in existing.values() if not member]
+        if rejoined:
+            GroupRanking.objects.filter(pk__in=rejoined).update(member=True)
+        GroupRanking.objects.bulk_create([
+            GroupRanking(group_id=group_pk, player_id=player_pk)
+            for group_pk, player_pk in memberships
+            if (group_pk, player_pk) not in existing
+        ])
+    elif action == 'post_remove':
+        GroupRanking.objects.filter(
+            **lookup, **{key: pk_set}).update(member=False)
+    elif action == 'post_clear':
+        GroupRanking.objects.filter(**lookup).update(member=False)
+
+
+@receiver(m2m_changed, sender=Group.games.through)
+def update_game_group(sender, instance, action, reverse, pk_set, **kwargs):
+    """Keep Game.group in step with the groups each game is in."""
+
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if reverse:
+        # Changed from the Game side.
+        games = Game.objects.filter(pk=instance.pk)
+    elif action == 'post_clear':
+        games = Game.objects.filter(group=instance)
+    else:
+        games = Game.objects.filter(pk__in=pk_set)
+
+    if action == 'post_add' and not reverse:
+        # A game only belongs to its first group.
+        games.filter(group__isnull=True).update(group=instance)
+        return
+
+    games.update(group=Subquery(
+        Group.games.through.objects.filter(
+            game_id=OuterRef('pk'),
+        ).order_by('id').values('group_id')[:1]
+    ))
+
+
+@receiver(pre_save, sender=Game)
+def keep_game_group(sender, instance, **kwargs):
+    """Don't let a game loaded before it was added to a group clear it."""
+
+    if instance.pk and not instance.group_id:
+        instance.group_id = Group.games.through.objects.filter(
+            game_id=instance.pk,
+        ).order_by('id').values_list('group_id', flat=True).first()
+
+
+@receiver(pre_save, sender=Game)
+def set_finished(sender, instance, **kwargs):
+    """Note when the game's result is entered."""
+
+    if not instance.active and not instance.finished:
+        instance.finished = timezone.now()
+
+
+def game_groups(game_pks):
+    """The pks of the groups the games were played in."""
+
+    return Game.objects.filter(
+        pk__in=game_pks,
+        group__isnull=False,
+    ).values_list('group_id', flat=True)
+
+
+@receiver(post_save, sender=Game)
+@receiver(pre_delete, sender=Game)
+def invalidate_game(sender, instance, **kwargs):
+    """Invalidate the cached fragments of the game's group."""
+
+    if instance.group_id:
+        invalidate_groups([instance.group_id])
+
+
+@receiver(post_save, sender=Game)
+@receiver(post_delete, sender=Game)
+def invalidate_snapshots(sender, instance, **kwargs):
+    """Forget the snapshots of the game's group taken since it was played."""
+
+    # Snapshots are only taken of the days before today.
+    today = RatingEngine.period_start(RatingEngine.period(timezone.now()))
+
+    if instance.group_id and instance.date_time < today:
+        LeaderboardSnapshot.objects.filter(
+            group=instance.group_id,
+            date_time__gt=instance.date_time,
+        ).delete()
+
+
+@receiver(post_save, sender=RankChange)
+def invalidate_rank_change(sender, instance, **kwargs):
+    """Invalidate the cached fragments of the game's group."""
+
+    invalidate_groups(game_groups([instance.game_id]))
+
+
+@receiver(post_save, sender=GroupRanking)
+def invalidate_group_ranking(sender, instance, **kwargs):
+    """Invalidate the cached leaderboard of the group."""
+
+    invalidate_groups([instance.group_id])
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group(sender, instance, **kwargs):
+    """Invalidate the cached fragments of the group and the groups list."""
+
+    invalidate_groups([instance.pk])
+    bump_version('groups')
+
+
+@receiver(post_save, sender=Player)
+@receiver(post_delete, sender=Player)
+def invalidate_player(sender, instance, **kwargs):
+    """Invalidate the player's data, like their ranking or name."""
+
+    bump_version(player_name(instance.pk))
+
+
+@receiver(post_save, sender=User)
+def invalidate_user(sender, instance, created, update_fields=None, **kwargs):
+    """Invalidate the groups showing the user's name."""
+
+    if created or update_fields == frozenset(['last_login']):
+        return
+
+    invalidate_groups(Group.players.through.objects.filter(
+        player__user=instance,
+    ).values_list('group_id', flat=True))
+
+
+@receiver(m2m_changed, sender=Group.players.through)
+@receiver(m2m_changed, sender=Group.admins.through)
+@receiver(m2m_changed, sender=Group.games.through)
+@receiver(m2m_changed, sender=Game.players.through)
+def invalidate_members(sender, instance, action, reverse, pk_set, **kwargs):
+    """Invalidate the groups whose players or games changed."""
+
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+
+    if sender is Game.players.through:
+        if not reverse:
+            invalidate_groups(game_groups([instance.pk]))
+            return
+
+        # A player's games changed.
+        if pk_set is None:
+            pk_set = instance.games.values_list('pk', flat=True)
+        invalidate_groups(game_groups(pk_set))
+    elif not reverse:
+        invalidate_groups([instance.pk])
+    else:
+        # A player's or game's groups changed.
+        if pk_set is None:
+            pk_set = sender.objects.filter(**{
+                f'{instance._meta.model_name}_id': instance.pk,
+            }).values_list('group_id', flat=True)
+        invalidate_groups(pk_set)
@@ -0,0 +1,61 @@
+"""Keyset pagination for lists of games, newest first."""
+
+from datetime import datetime, timedelta
+
+from django.db.models import Q
+from django.http import Http404
+from django.utils import timezone
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def encode_cursor(game):
+    """Cursor pointing just past the given game."""
+
+    microseconds = (game.date_time - EPOCH) // timedelta(microseconds=1)
+
+    return f'{microseconds}_{game.pk}'
+
+
+def decode_cursor(cursor):
+    """
+    :param cursor: A cursor made by encode_cursor().
+    :return: (date_time, pk) Tuple.
+
+    Raises Http404 for cursors that can't be decoded.
+    """
+    try:
+        microseconds, pk = (int(part) for part in cursor.split('_'))
+        # Overflows for times outside the years datetime supports.
+        return EPOCH + timedelta(microseconds=microseconds), pk
+    except (ValueError, OverflowError):
+        raise Http404('Invalid cursor.')
+
+
+def keyset_page(games, cursor, size):
+    """
+    :param games: QuerySet of the games to paginate.
+    :param cursor: Cursor of the previous page, or None for the first.
+    :param size: The number of games on the page.
+    :return: (games, next_cursor) Tuple, next_cursor is None on the
+    last page.
+
+    Games are ordered by (date_time, pk), newest first. Each page seeks
+    straight to its first game, so it costs the same however deep into
+    the history it is.
+    """
+    games = games.order_by('-date_time', '-pk')
+
+    if cursor:
+        date_time, pk = decode_cursor(cursor)
+        games = games.filter(
+            Q(date_time__lt=date_time) | Q(date_time=date_time, pk__lt=pk))
+
+    # Fetch one extra game to find out if there's another page.
+    games = list(games[:size + 1])
+
+    if len(games) > size:
+        games = games[:size]
+        return games, encode_cursor(games[-1])
+
+    return games, None
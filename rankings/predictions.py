@@ -0,0 +1,47 @@
+"""Predicted results between the members of a group."""
+
+import numpy as np
+
+
+def win_probabilities(group, rankings):
+    """
+    :param group: The Group the rankings are in.
+    :param rankings: List of the GroupRankings to compare.
+    :return: Matrix of the probability each ranking's player (the row)
+    beats each other player (the column), from the group's engine.
+    """
+    engine = group.engine
+
+    return engine.win_probabilities({
+        field: np.array(
+            [getattr(ranking, field) for ranking in rankings],
+            dtype=np.float64,
+        )
+        for field in engine.fields
+    })
+
+
+def balanced_matchups(probabilities, limit):
+    """
+    :param probabilities: Matrix from win_probabilities().
+    :param limit: The most matchups to return.
+    :return: List of (row, column, probability) Tuples, the pairs of
+    players closest to an even game first.
+
+    Only the pairs above the diagonal are compared, each pair once,
+    and only the closest are sorted.
+    """
+    rows, columns = np.triu_indices(len(probabilities), 1)
+    imbalance = np.abs(probabilities[rows, columns] - 0.5)
+
+    closest = np.arange(len(imbalance))
+    if limit < len(imbalance):
+        closest = np.argpartition(imbalance, limit)[:limit]
+
+    # Ties go to the higher ranked pair.
+    closest = closest[np.lexsort((closest, imbalance[closest]))]
+
+    return [
+        (int(rows[i]), int(columns[i]), float(probabilities[rows[i], columns[i]]))
+        for i in closest
+    ]
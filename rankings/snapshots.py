@@ -0,0 +1,229 @@
+"""A group's rankings, replayed from its latest snapshot."""
+
+import numpy as np
+from django.utils import timezone
+
+from rankings.engines import RatingEngine
+from rankings.history import RatingIndex, finished_games
+from rankings.models import Game, SnapshotRanking
+
+
+def game_results(games, rows):
+    """
+    :param games: QuerySet of the Games to replay.
+    :param rows: QuerySet of their Game.players through rows.
+    :return: (played, details) Tuple, a list of (game_pk, winner_pk,
+    loser_pk) Tuples of the finished games in order, see
+    finished_games(), and a dict of {game_pk: (period, home_score,
+    away_score)}.
+    """
+    played = list(finished_games(rows))
+    details = {
+        pk: (RatingEngine.period(date_time), home_score, away_score)
+        for pk, date_time, home_score, away_score in games.filter(
+            active=False,
+        ).values_list('pk', 'date_time', 'home_score', 'away_score')
+    }
+
+    return played, details
+
+
+def record_results(standings, played, details, after=None):
+    """
+    Add the games to the standings' totals.
+
+    :param standings: Dict of {player_pk: Standing}, missing players are
+    added as unsaved SnapshotRankings.
+    :param played: List of (game_pk, winner_pk, loser_pk) Tuples.
+    :param details: Dict of {game_pk: (period, home_score, away_score)}.
+    :param after: List of the (winner, loser) rankings after each game,
+    or None to leave the rankings as they are.
+    :return: None
+    """
+    for i, (game_pk, winner_pk, loser_pk) in enumerate(played):
+        _, winner_score, loser_score = details[game_pk]
+        results = (
+            (winner_pk, True, 0, winner_score, loser_score),
+            (loser_pk, False, 1, loser_score, winner_score),
+        )
+
+        for player_pk, won, side, points_for, points_against in results:
+            if player_pk not in standings:
+                standings[player_pk] = SnapshotRanking(player_id=player_pk)
+
+            standing = standings[player_pk]
+            if after is not None:
+                standing.ranking = after[i][side]
+            standing.record_result(won, points_for, points_against)
+
+
+def latest_snapshot(group, date_time):
+    """The group's latest LeaderboardSnapshot up to the time, or None."""
+
+    return group.snapshots.filter(
+        rating_engine=group.rating_engine,
+        date_time__lte=date_time,
+    ).order_by('-date_time').first()
+
+
+def standings_as_of(group, date_time, results=None):
+    """
+    :param group: The Group.
+    :param date_time: The time to stop at, the start of a rating period
+    (see RatingEngine.period_start()), so any day being rated is
+    finished.
+    :param results: The game_results() of the games to replay, or None
+    for every game in the group since the snapshot.
+    :return: (standings, games) Tuple, a dict of {player_pk: unsaved
+    SnapshotRanking} of everyone who had played in the group, and the
+    number of games included.
+
+    Starts from the group's latest snapshot up to the time, replaying
+    only the games played since with the group's engine. The work is in
+    proportion to the games since the snapshot, however long the
+    group's history.
+    """
+    engine = group.engine
+    snapshot = latest_snapshot(group, date_time)
+
+    games = Game.objects.filter(
+        group=group,
+        date_time__lt=date_time,
+    )
+    rows = Game.players.through.objects.filter(
+        game__group=group,
+        game__date_time__lt=date_time,
+    )
+    standings = {}
+    first_period = None
+    count = 0
+
+    if snapshot:
+        games = games.filter(date_time__gte=snapshot.date_time)
+        rows = rows.filter(game__date_time__gte=snapshot.date_time)
+        first_period = RatingEngine.period(snapshot.date_time)
+        count = snapshot.games
+        standings = {
+            ranking.player_id: ranking
+            for ranking in snapshot.rankings.all()
+        }
+
+    if results is None:
+        results = game_results(games, rows)
+    played, details = results
+
+    index = RatingIndex()
+    for player_pk in standings:
+        index.add(player_pk)
+    winners = np.array(
+        [index.add(winner_pk) for _, winner_pk, _ in played], dtype=np.intp)
+    losers = np.array(
+        [index.add(loser_pk) for _, _, loser_pk in played], dtype=np.intp)
+
+    if not index:
+        return standings, count
+
+    for player_pk in index.keys:
+        if player_pk not in standings:
+            standings[player_pk] = SnapshotRanking(player_id=player_pk)
+
+    ratings = {
+        field: np.array([
+            getattr(standings[player_pk], field) for player_pk in index.keys
+        ], dtype=np.float64)
+        for field in engine.fields
+    }
+    ratings, after = engine.replay(
+        ratings,
+        winners,
+        losers,
+        [details[game_pk][0] for game_pk, _, _ in played],
+        first_period=first_period,
+        last_period=RatingEngine.period(date_time) - 1,
+    )
+
+    # The ranking after each game, for the peaks.
+    record_results(standings, played, details, after.tolist())
+
+    for field, array in ratings.items():
+        for player_pk, value in zip(index.keys, array.tolist()):
+            setattr(standings[player_pk], field, value)
+
+    return standings, count + len(played)
+
+
+def leaderboard_as_of(group, date_time):
+    """
+    :param group: The Group.
+    :param date_time: The start of a rating period, see standings_as_of().
+    :return: List of the unsaved SnapshotRankings of the group's members,
+    with their players, highest first like Group.leaderboard().
+    """
+    standings, _ = standings_as_of(group, date_time)
+    players = group.players.only('name').in_bulk(list(standings))
+
+    for player_pk, player in players.items():
+        standings[player_pk].player = player
+
+    return sorted(
+        (standings[player_pk] for player_pk in players),
+        key=lambda standing: (-standing.ranking, standing.player_id),
+    )
+
+
+def current_period_end():
+    """The start of tomorrow, when the games being rated today end."""
+
+    return RatingEngine.period_start(RatingEngine.period(timezone.now()) + 1)
+
+
+def current_standings(group, results=None):
+    """
+    :param group: The Group.
+    :param results: The game_results() of the games to replay, or None
+    for every game in the group since the snapshot.
+    :return: Dict of {player_pk: unsaved SnapshotRanking} of everyone who
+    has played in the group, as the rankings should stand now.
+
+    Like standings_as_of(), but the days not settled yet, for engines
+    rating a day at a time, only count towards the results, as they do
+    when a game's finished.
+    """
+    tomorrow = current_period_end()
+
+    if group.engine.per_game:
+        standings, _ = standings_as_of(group, tomorrow, results)
+        return standings
+
+    if results is not None:
+        # Split at the last settled day, like the queries below.
+        played, details = results
+        settled_period = (
+            RatingEngine.period(group.rated_until) if group.rated_until
+            else None)
+        settled = [
+            game for game in played
+            if settled_period is not None and
+            details[game[0]][0] < settled_period
+        ]
+        standings = {}
+        if group.rated_until:
+            standings, _ = standings_as_of(
+                group, group.rated_until, (settled, details))
+        record_results(standings, played[len(settled):], details)
+        return standings
+
+    standings = {}
+    games = Game.objects.filter(group=group, date_time__lt=tomorrow)
+    rows = Game.players.through.objects.filter(
+        game__group=group,
+        game__date_time__lt=tomorrow,
+    )
+    if group.rated_until:
+        standings, _ = standings_as_of(group, group.rated_until)
+        games = games.filter(date_time__gte=group.rated_until)
+        rows = rows.filter(game__date_time__gte=group.rated_until)
+
+    record_results(standings, *game_results(games, rows))
+
+    return standings
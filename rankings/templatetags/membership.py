@@ -0,0 +1,15 @@
+"""Check the user's roles in a group, like {% if membership|member_of:group %}."""
+
+from django import template
+
+register = template.Library()
+
+
+@register.filter
+def member_of(membership, group):
+    return membership.is_member(group)
+
+
+@register.filter
+def admin_of(membership, group):
+    return membership.is_admin(group)
@@ -1,3 +1,2874 @@
-from django.test import TestCase
+"""Tests for Rankings app."""
 
-# Create your tests here.
+import csv
+import json
+import os
+import tempfile
+import threading
+from datetime import timedelta
+from importlib import import_module
+from io import StringIO
+
+import numpy as np
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import (
+    DEFAULT_DB_ALIAS,
+    IntegrityError,
+    connection,
+    connections,
+    transaction,
+)
+from django.db.models import F, Sum
+from django.http import Http404
+from django.test import (
+    Client,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from rankings import live
+from rankings.benchmark import SQLTimer, compare
+from rankings.cache import cache_stats
+from rankings.corrections import downstream_games, upstream_games
+from rankings.elo import (
+    MIN_WAVE_SIZE,
+    elo,
+    elo_batch,
+    elo_replay,
+    expected_score,
+    schedule_waves,
+)
+from rankings.engines import EloEngine, Glicko2Engine, RatingEngine
+from rankings.fixtures import bracket_order, elimination_round, round_robin
+from rankings.history import inserted_pks
+from rankings.management.commands.snapshot_rankings import (
+    Command as SnapshotCommand,
+)
+from rankings.matchmaking import pair_players, rematches
+from rankings.membership import Membership
+from rankings.middleware import RequestStats, stats
+from rankings.models import (
+    CheckpointRanking,
+    Game,
+    Group,
+    GroupRanking,
+    LeaderboardSnapshot,
+    Player,
+    RankChange,
+    RankingCheckpoint,
+    Standing,
+)
+from rankings.pagination import EPOCH, encode_cursor, keyset_page
+from rankings.predictions import balanced_matchups, win_probabilities
+from rankings.snapshots import standings_as_of
+from rankings.timeseries import lttb
+from rankings.urls import urlpatterns
+
+# The manifest storage needs collectstatic to have been run.
+STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.StaticFilesStorage'
+
+
+class EloBatchTests(SimpleTestCase):
+    """Check the vectorised ELO functions against elo()."""
+
+    def setUp(self):
+        self.random = np.random.RandomState(42)
+
+    def test_elo_batch_matches_elo(self):
+        winners = self.random.uniform(50, 2500, 1000).round(2)
+        losers = self.random.uniform(50, 2500, 1000).round(2)
+
+        winner_ranks, loser_ranks = elo_batch(winners, losers, 32)
+
+        for i in range(len(winners)):
+            self.assertEqual(
+                (winner_ranks[i], loser_ranks[i]),
+                elo(winners[i], losers[i], 32),
+            )
+
+    def test_elo_batch_floor(self):
+        winner_ranks, loser_ranks = elo_batch([100], [100], 32)
+
+        self.assertEqual(winner_ranks[0], 116)
+        self.assertEqual(loser_ranks[0], 100)
+
+    def test_schedule_waves(self):
+        waves = schedule_waves([0, 2, 0, 3, 1], [1, 3, 2, 4, 5])
+
+        self.assertEqual(waves.tolist(), [0, 0, 1, 1, 1])
+
+    def assertReplayMatches(self, players, winners, losers):
+        ratings, before, after = elo_replay(
+            [1000] * players, winners, losers, 32)
+
+        expected = [1000.0] * players
+        for i, (winner, loser) in enumerate(zip(winners, losers)):
+            self.assertEqual(
+                tuple(before[i]), (expected[winner], expected[loser]))
+            expected[winner], expected[loser] = elo(
+                expected[winner], expected[loser], 32)
+            self.assertEqual(
+                tuple(after[i]), (expected[winner], expected[loser]))
+
+        self.assertEqual(ratings.tolist(), expected)
+
+    def test_elo_replay_matches_elo(self):
+        players = 20
+        winners = self.random.randint(0, players, 2000)
+        losers = (winners + self.random.randint(1, players, 2000)) % players
+
+        self.assertReplayMatches(players, winners, losers)
+
+    def test_elo_replay_waves_match_elo(self):
+        # Enough players for waves of more than MIN_WAVE_SIZE games.
+        players = 1000
+        winners = self.random.randint(0, players, 5000)
+        losers = (winners + self.random.randint(1, players, 5000)) % players
+
+        self.assertGreater(
+            len(winners) / (schedule_waves(winners, losers).max() + 1),
+            MIN_WAVE_SIZE,
+        )
+        self.assertReplayMatches(players, winners, losers)
+
+    def test_elo_replay_sequential_chain(self):
+        # One player in every game gives each game its own wave.
+        games = 2000
+        winners = np.zeros(games, dtype=np.intp)
+        losers = self.random.randint(1, 100, games)
+
+        self.assertEqual(schedule_waves(winners, losers).max() + 1, games)
+        self.assertReplayMatches(100, winners, losers)
+
+    def test_elo_replay_parallel_chains(self):
+        # MIN_WAVE_SIZE pairs each playing every round, so each pair's
+        # games depend on their last one and are rated in waves.
+        rounds = 100
+        pairs = np.arange(MIN_WAVE_SIZE * 2).reshape(-1, 2)
+        games = np.tile(pairs, (rounds, 1))
+        flips = self.random.randint(0, 2, len(games)).astype(bool)
+        games[flips] = games[flips, ::-1]
+        winners, losers = games[:, 0], games[:, 1]
+
+        self.assertEqual(
+            schedule_waves(winners, losers).tolist(),
+            np.repeat(np.arange(rounds), MIN_WAVE_SIZE).tolist(),
+        )
+        self.assertReplayMatches(MIN_WAVE_SIZE * 2, winners, losers)
+
+
+class RebuildRankingsTests(TestCase):
+    """Check rebuild_rankings replays the games in order."""
+
+    def setUp(self):
+        self.players = [
+            User.objects.create(username=f'player{i}').player
+            for i in range(4)
+        ]
+        self.games = []
+        start = timezone.now()
+
+        for i, (winner, loser) in enumerate([(0, 1), (1, 2), (0, 2), (3, 0)]):
+            game = Game.objects.create(
+                active=False,
+                winner=self.players[winner],
+            )
+            game.players.add(self.players[winner], self.players[loser])
+            Game.objects.filter(pk=game.pk).update(
+                date_time=start + timedelta(minutes=i))
+            game.refresh_from_db()
+            self.games.append((game, winner, loser))
+
+    def expected_rankings(self, games):
+        rankings = [1000] * len(self.players)
+
+        for _, winner, loser in games:
+            rankings[winner], rankings[loser] = elo(
+                rankings[winner], rankings[loser], settings.ELO_WEIGHTING)
+
+        return rankings
+
+    def assertRankings(self, rankings):
+        for player, ranking in zip(self.players, rankings):
+            player.refresh_from_db()
+            self.assertEqual(player.ranking, ranking)
+
+    def test_full_rebuild(self):
+        call_command('rebuild_rankings', stdout=StringIO())
+
+        self.assertRankings(self.expected_rankings(self.games))
+        self.assertEqual(RankChange.objects.count(), 8)
+
+        game, winner, _ = self.games[-1]
+        change = RankChange.objects.get(
+            game=game, player=self.players[winner])
+        self.assertEqual(change.after, self.players[winner].ranking)
+
+        checkpoint = RankingCheckpoint.objects.get()
+        self.assertEqual(checkpoint.game_pk, game.pk)
+
+    def add_game(self, winner, loser, date_time, active=False):
+        game = Game.objects.create(
+            active=active,
+            winner=None if active else self.players[winner],
+        )
+        game.players.add(self.players[winner], self.players[loser])
+        Game.objects.filter(pk=game.pk).update(date_time=date_time)
+        game.refresh_from_db()
+
+        return game
+
+    def rebuild(self, *args):
+        stdout = StringIO()
+        call_command('rebuild_rankings', *args, stdout=stdout)
+
+        return stdout.getvalue()
+
+    def test_incremental_rebuild(self):
+        self.rebuild()
+
+        # Rankings finished live don't change where the replay starts.
+        game = self.add_game(
+            1, 3, self.games[-1][0].date_time + timedelta(minutes=1))
+        self.games.append((game, 1, 3))
+        Player.objects.filter(pk=self.players[1].pk).update(ranking=0)
+
+        output = self.rebuild('--incremental')
+
+        self.assertIn('Replayed 1 games', output)
+        self.assertRankings(self.expected_rankings(self.games))
+        self.assertEqual(RankChange.objects.count(), 10)
+        self.assertEqual(RankingCheckpoint.objects.get().game_pk, game.pk)
+
+        # Only the peaks of the replayed players are updated, the stats
+        # aren't rebuilt from every game.
+        self.assertNotIn('Rebuilt stats', output)
+        self.players[1].refresh_from_db()
+        self.assertEqual(
+            self.players[1].peak_ranking,
+            max(RankChange.objects.filter(
+                player=self.players[1],
+            ).values_list('after', flat=True)),
+        )
+
+        self.assertIn('Replayed 0 games', self.rebuild('--incremental'))
+        self.assertRankings(self.expected_rankings(self.games))
+
+    def test_incremental_rebuild_late_game(self):
+        # Started before the checkpoint, but only finished after it.
+        game = self.add_game(
+            2, 3, self.games[1][0].date_time + timedelta(seconds=30),
+            active=True,
+        )
+        self.rebuild()
+
+        game.winner = self.players[2]
+        game.active = False
+        game.save()
+        self.games.insert(2, (game, 2, 3))
+
+        output = self.rebuild('--incremental')
+
+        self.assertIn('Replayed 3 games', output)
+        self.assertRankings(self.expected_rankings(self.games))
+        self.assertEqual(RankChange.objects.count(), 10)
+
+        # The same rank changes as replaying everything.
+        changes = RankChange.objects.order_by(
+            'game_id', 'player_id',
+        ).values_list('game_id', 'player_id', 'before', 'after')
+        incremental = list(changes)
+        self.rebuild()
+        self.assertEqual(list(changes), incremental)
+
+    def test_incremental_rebuild_without_checkpoint(self):
+        self.assertIn('Replayed 4 games', self.rebuild('--incremental'))
+        self.assertEqual(
+            CheckpointRanking.objects.count(), len(self.players))
+
+
+@override_settings(STATICFILES_STORAGE=STATICFILES_STORAGE)
+class FinishGameTests(TestCase):
+    """Check finishing a game updates the rankings."""
+
+    def setUp(self):
+        cache.clear()
+        self.winner = User.objects.create(username='winner').player
+        self.loser = User.objects.create(username='loser').player
+        self.group = Group.objects.create(name='Group')
+        self.group.players.add(self.winner, self.loser)
+        self.game = Game.objects.create()
+        self.game.players.add(self.winner, self.loser)
+        self.group.games.add(self.game)
+        self.client.force_login(self.winner.user)
+        self.url = reverse('finish_game', kwargs={'pk': self.game.pk})
+
+    def finish_game(self):
+        return self.client.post(self.url, {
+            'winner': self.winner.pk,
+            'home_score': 11,
+            'away_score': 7,
+        })
+
+    def test_finish_game(self):
+        with self.assertNumQueries(17):
+            response = self.finish_game()
+
+        self.assertRedirects(response, reverse('game', kwargs={
+            'group_pk': self.group.pk,
+            'game_pk': self.game.pk,
+        }))
+
+        winner_ranking, loser_ranking = elo(1000, 1000, settings.ELO_WEIGHTING)
+        self.winner.refresh_from_db()
+        self.loser.refresh_from_db()
+        self.assertEqual(self.winner.ranking, winner_ranking)
+        self.assertEqual(self.loser.ranking, loser_ranking)
+
+        self.game.refresh_from_db()
+        self.assertFalse(self.game.active)
+        self.assertEqual(self.game.winner, self.winner)
+        self.assertEqual(self.game.home_score, 11)
+
+        change = RankChange.objects.get(game=self.game, player=self.loser)
+        self.assertEqual((change.before, change.after), (1000, loser_ranking))
+
+        self.assertEqual(
+            [(ranking.player, ranking.ranking)
+             for ranking in self.group.leaderboard()],
+            [(self.winner, winner_ranking), (self.loser, loser_ranking)],
+        )
+
+    def test_finish_game_stats(self):
+        self.finish_game()
+
+        self.winner.refresh_from_db()
+        self.loser.refresh_from_db()
+        self.assertEqual(
+            (self.winner.wins, self.winner.losses, self.winner.streak),
+            (1, 0, 1),
+        )
+        self.assertEqual(
+            (self.loser.points_for, self.loser.points_against), (7, 11))
+        self.assertEqual(self.loser.streak_label, 'L1')
+        self.assertEqual(self.loser.peak_ranking, 1000)
+        self.assertEqual(self.winner.peak_ranking, self.winner.ranking)
+
+        group_ranking = self.group.rankings.get(player=self.winner)
+        self.assertEqual((group_ranking.wins, group_ranking.points_for), (1, 11))
+
+    def test_rebuild_stats(self):
+        """rebuild_stats agrees with the stats kept by finishing games."""
+        for winner in (self.winner, self.loser, self.loser):
+            game = Game.objects.create()
+            game.players.add(self.winner, self.loser)
+            self.group.games.add(game)
+            self.client.post(
+                reverse('finish_game', kwargs={'pk': game.pk}),
+                {'winner': winner.pk, 'home_score': 11, 'away_score': 3},
+            )
+
+        fields = Standing.standing_fields
+        players = list(Player.objects.order_by('pk').values(*fields))
+        rankings = list(GroupRanking.objects.order_by('pk').values(*fields))
+
+        Player.objects.update(wins=0, streak=0, peak_ranking=0)
+        GroupRanking.objects.update(losses=0, points_for=0)
+        call_command('rebuild_stats', stdout=StringIO())
+
+        self.assertEqual(
+            list(Player.objects.order_by('pk').values(*fields)), players)
+        self.assertEqual(
+            list(GroupRanking.objects.order_by('pk').values(*fields)), rankings)
+        self.assertEqual(players[1]['streak'], 2)
+
+    def test_finish_game_once(self):
+        self.finish_game()
+        self.finish_game()
+
+        self.assertEqual(RankChange.objects.count(), 2)
+        self.winner.refresh_from_db()
+        self.assertEqual(
+            self.winner.ranking,
+            elo(1000, 1000, settings.ELO_WEIGHTING)[0],
+        )
+
+    def test_finish_game_non_members(self):
+        # One player has left the group, the other was never in it.
+        self.group.players.remove(self.loser)
+        outsider = User.objects.create(username='outsider').player
+        game = Game.objects.create()
+        game.players.add(self.loser, outsider)
+        self.group.games.add(game)
+
+        self.client.post(
+            reverse('finish_game', kwargs={'pk': game.pk}),
+            {'winner': self.loser.pk, 'home_score': 11, 'away_score': 3},
+        )
+        self.finish_game()
+
+        self.assertFalse(GroupRanking.objects.filter(player=outsider).exists())
+        loser_ranking = GroupRanking.objects.get(player=self.loser)
+        self.assertEqual(
+            (loser_ranking.ranking, loser_ranking.wins, loser_ranking.member),
+            (1000, 0, False),
+        )
+        self.assertEqual(
+            [ranking.player for ranking in self.group.leaderboard()],
+            [self.winner],
+        )
+        self.assertEqual(
+            self.group.rankings.get(player=self.winner).ranking,
+            elo(1000, 1000, settings.ELO_WEIGHTING)[0],
+        )
+
+
+@override_settings(STATICFILES_STORAGE=STATICFILES_STORAGE)
+class CorrectGameTests(TestCase):
+    """Check correcting or deleting a game agrees with a full rebuild."""
+
+    def setUp(self):
+        cache.clear()
+        self.players = [
+            User.objects.create(username=f'player{i}').player
+            for i in range(5)
+        ]
+        self.group = Group.objects.create(name='Group')
+        self.group.players.add(*self.players)
+        self.group.admins.add(self.players[0])
+        self.client.force_login(self.players[0].user)
+
+        self.games = [
+            self.play(winner, loser)
+            for winner, loser in [(0, 1), (2, 3), (1, 2), (3, 4), (0, 4), (4, 2)]
+        ]
+
+    def play(self, winner, loser):
+        game = Game.objects.create()
+        game.players.add(self.players[winner], self.players[loser])
+        self.group.games.add(game)
+        self.client.post(
+            reverse('finish_game', kwargs={'pk': game.pk}),
+            {'winner': self.players[winner].pk, 'home_score': 11,
+             'away_score': loser},
+        )
+        return game
+
+    def correct(self, game, winner, home_score=11, away_score=9):
+        return self.client.post(
+            reverse('finish_game', kwargs={'pk': game.pk}),
+            {'winner': self.players[winner].pk, 'home_score': home_score,
+             'away_score': away_score},
+            follow=True,
+        )
+
+    def state(self):
+        return (
+            list(Player.objects.order_by('pk').values_list(
+                'pk', *Standing.standing_fields)),
+            list(RankChange.objects.order_by(
+                'game_id', 'player_id',
+            ).values_list('game_id', 'player_id', 'before', 'after')),
+            list(GroupRanking.objects.order_by('pk').values_list(
+                'player_id', 'deviation', *Standing.standing_fields)),
+        )
+
+    def assertRebuilt(self):
+        """The rankings are the same as replaying every game again."""
+
+        state = self.state()
+        call_command('rebuild_rankings', stdout=StringIO())
+        call_command('rebuild_stats', stdout=StringIO())
+
+        for rows, rebuilt in zip(state, self.state()):
+            self.assertEqual(len(rows), len(rebuilt))
+            for row, expected in zip(rows, rebuilt):
+                for value, expected_value in zip(row, expected):
+                    self.assertAlmostEqual(value, expected_value, places=6)
+
+    def test_correct_winner(self):
+        response = self.correct(self.games[0], 1)
+
+        # Game 3 doesn't involve anyone whose ranking changed.
+        self.assertContains(response, 'Corrected the result, re-rating 3 later')
+        self.games[0].refresh_from_db()
+        self.assertEqual(self.games[0].winner, self.players[1])
+        self.assertEqual(
+            self.players[1].winning_games.count(), 2)
+        self.assertRebuilt()
+
+    def test_correct_scores(self):
+        changes = self.state()[1]
+        self.correct(self.games[1], 2, 11, 7)
+
+        self.players[3].refresh_from_db()
+        self.assertEqual(self.players[3].points_for, 7 + 11)
+        self.assertEqual(self.state()[1], changes)
+        self.assertRebuilt()
+
+    def test_same_result(self):
+        state = self.state()
+
+        response = self.correct(self.games[0], 0, 11, 1)
+        self.assertNotContains(response, 'Corrected')
+        self.assertEqual(self.state(), state)
+
+    def test_only_admins(self):
+        state = self.state()
+        url = reverse('game', kwargs={
+            'group_pk': self.group.pk,
+            'game_pk': self.games[0].pk,
+        })
+        self.assertContains(self.client.get(url), 'Correct the result')
+
+        self.client.force_login(self.players[1].user)
+        self.assertNotContains(self.client.get(url), 'Correct the result')
+
+        response = self.client.get(
+            reverse('finish_game', kwargs={'pk': self.games[0].pk}))
+        self.assertEqual(response.status_code, 403)
+
+        response = self.correct(self.games[0], 1)
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.state(), state)
+
+    def test_delete(self):
+        self.games[2].delete()
+
+        self.assertEqual(RankChange.objects.count(), 10)
+        self.assertRebuilt()
+
+    def test_delete_only_game(self):
+        self.games[3].delete()
+        self.games[4].delete()
+        self.games[5].delete()
+
+        ranking = self.group.rankings.get(player=self.players[4])
+        self.assertEqual(
+            (ranking.ranking, ranking.wins, ranking.losses), (1000, 0, 0))
+        self.assertRebuilt()
+
+    def test_delete_active(self):
+        state = self.state()
+        game = Game.objects.create()
+        game.players.add(self.players[0], self.players[1])
+        game.delete()
+
+        self.assertEqual(self.state(), state)
+
+    def test_incremental_rebuild(self):
+        call_command('rebuild_rankings', stdout=StringIO())
+
+        # A game after the checkpoint is replayed from it.
+        later = self.play(1, 3)
+        self.correct(later, 3)
+        self.assertTrue(RankingCheckpoint.objects.exists())
+
+        # Games before it change the rankings stored with it.
+        self.correct(self.games[0], 1)
+        self.games[4].delete()
+        self.assertFalse(RankingCheckpoint.objects.exists())
+
+        call_command('rebuild_rankings', '--incremental', stdout=StringIO())
+
+        self.assertRebuilt()
+
+    def spread_games(self, engine):
+        """Play the games a day apart, with a snapshot part way through."""
+
+        Group.objects.filter(pk=self.group.pk).update(rating_engine=engine)
+        today = RatingEngine.period_start(RatingEngine.period(timezone.now()))
+        for i, game in enumerate(self.games):
+            Game.objects.filter(pk=game.pk).update(
+                date_time=today - timedelta(days=7 - i, hours=-12))
+        call_command('rebuild_rankings', stdout=StringIO())
+
+        self.group.refresh_from_db()
+        SnapshotCommand().snapshot(self.group, today - timedelta(days=6))
+        for game in self.games:
+            game.refresh_from_db()
+
+    def test_only_affected_games(self):
+        self.spread_games(EloEngine.name)
+        others = [
+            User.objects.create(username=f'other{i}').player
+            for i in range(2)
+        ]
+        self.group.players.add(*others)
+        self.players += others
+        Game.objects.filter(pk=self.play(5, 6).pk).update(
+            date_time=self.games[3].date_time)
+
+        games, entries = downstream_games(
+            self.games[3], [self.players[3].pk, self.players[4].pk],
+            self.group, including=True)
+        self.assertEqual(
+            [result[1] for result in games],
+            [game.pk for game in self.games[3:]],
+        )
+        self.assertNotIn(others[0].pk, entries)
+
+        # From the snapshot after game 0, games 1 and 2, as the later
+        # games start from their players' rankings after them.
+        snapshot = self.group.snapshots.get()
+        self.assertEqual(
+            [result[1] for result in upstream_games(
+                self.group, games, entries, snapshot.date_time)],
+            [self.games[1].pk, self.games[2].pk],
+        )
+
+        self.correct(self.games[3], 4)
+        self.assertRebuilt()
+
+    def test_correct_glicko2(self):
+        self.spread_games(Glicko2Engine.name)
+
+        self.correct(self.games[4], 4)
+        self.games[5].delete()
+
+        self.assertRebuilt()
+
+
+class GroupRankingTests(TestCase):
+    """Check the group rankings follow the group's members."""
+
+    def setUp(self):
+        self.players = [
+            User.objects.create(username=f'player{i}').player
+            for i in range(3)
+        ]
+        self.group = Group.objects.create(name='Group')
+
+    def test_rankings_follow_members(self):
+        self.group.players.add(*self.players)
+        self.assertEqual(self.group.rankings.count(), 3)
+
+        # Former members keep their rankings, off the leaderboard.
+        GroupRanking.objects.filter(player=self.players[0]).update(
+            ranking=1100, wins=3)
+        self.players[0].group_set.remove(self.group)
+        self.assertEqual(self.group.rankings.count(), 3)
+        self.assertEqual(
+            {ranking.player for ranking in self.group.leaderboard()},
+            {self.players[1], self.players[2]},
+        )
+        self.assertIsNone(self.group.ranking_position(self.players[0]))
+
+        self.group.players.add(self.players[0])
+        ranking = self.group.rankings.get(player=self.players[0])
+        self.assertEqual((ranking.ranking, ranking.wins), (1100, 3))
+        self.assertEqual(self.group.ranking_position(self.players[0]), 1)
+
+        self.group.players.clear()
+        self.assertEqual(self.group.rankings.count(), 3)
+        self.assertFalse(self.group.leaderboard().exists())
+
+    def test_rebuild_keeps_former_members(self):
+        self.group.players.add(*self.players[:2])
+        game = Game.objects.create(active=False, winner=self.players[0])
+        game.players.add(*self.players[:2])
+        self.group.games.add(game)
+        self.group.players.remove(self.players[0])
+
+        call_command('rebuild_rankings', stdout=StringIO())
+
+        ranking = self.group.rankings.get(player=self.players[0])
+        self.assertFalse(ranking.member)
+        self.assertEqual(ranking.wins, 1)
+        self.assertEqual(
+            [ranking.player for ranking in self.group.leaderboard()],
+            [self.players[1]],
+        )
+
+    def test_leaderboard(self):
+        self.group.players.add(*self.players)
+        GroupRanking.objects.filter(player=self.players[2]).update(ranking=1100)
+        GroupRanking.objects.filter(player=self.players[0]).update(ranking=900)
+
+        self.assertEqual(
+            [ranking.player for ranking in self.group.leaderboard(limit=2)],
+            [self.players[2], self.players[1]],
+        )
+        self.assertEqual(self.group.ranking_position(self.players[2]), 1)
+        self.assertEqual(self.group.ranking_position(self.players[0]), 3)
+        self.assertIsNone(self.group.ranking_position(
+            User.objects.create(username='outsider').player))
+
+    def test_migration(self):
+        migration = import_module(
+            'rankings.migrations.0007_populate_grouprankings')
+        self.group.players.add(*self.players)
+        expected = [1000] * 3
+        start = timezone.now()
+
+        for i, (winner, loser) in enumerate([(0, 1), (0, 2), (2, 1)]):
+            game = Game.objects.create(
+                active=False,
+                winner=self.players[winner],
+                date_time=start + timedelta(minutes=i),
+            )
+            game.players.add(self.players[winner], self.players[loser])
+            self.group.games.add(game)
+            expected[winner], expected[loser] = elo(
+                expected[winner], expected[loser], settings.ELO_WEIGHTING)
+
+        # Not in the group, so not counted.
+        game = Game.objects.create(active=False, winner=self.players[1])
+        game.players.add(self.players[1], self.players[0])
+
+        GroupRanking.objects.all().delete()
+        migration.populate_group_rankings(apps, None)
+
+        self.assertEqual(
+            [
+                self.group.rankings.get(player=player).ranking
+                for player in self.players
+            ],
+            expected,
+        )
+
+
+@override_settings(STATICFILES_STORAGE=STATICFILES_STORAGE)
+class PlayerNameTests(TestCase):
+    """Check players are shown without loading their users."""
+
+    def setUp(self):
+        cache.clear()
+        self.players = [
+            User.objects.create(username=f'player{i}').player
+            for i in range(5)
+        ]
+        self.group = Group.objects.create(name='Group')
+        self.group.players.add(*self.players)
+        self.game = Game.objects.create()
+        self.game.players.add(*self.players[:2])
+        self.group.games.add(self.game)
+        self.client.force_login(self.players[0].user)
+
+    def test_name_follows_user(self):
+        self.assertEqual(self.players[0].name, 'player0')
+
+        user = self.players[0].user
+        user.first_name = 'First'
+        user.save()
+        self.assertEqual(Player.objects.get(pk=self.players[0].pk).name, 'First')
+
+        user.last_name = 'Last'
+        user.save()
+        self.assertEqual(str(Player.objects.get(pk=self.players[0].pk)),
+                         'First Last')
+
+        # Logging in doesn't touch the player.
+        with self.assertNumQueries(1):
+            user.save(update_fields=['last_login'])
+
+    def test_migration(self):
+        migration = import_module('rankings.migrations.0016_player_name')
+        User.objects.filter(pk=self.players[1].user_id).update(
+            first_name='First', last_name='Last')
+        User.objects.filter(pk=self.players[2].user_id).update(
+            last_name='Last')
+        Player.objects.update(name='')
+
+        migration.populate_names(apps, None)
+        self.assertEqual(
+            list(Player.objects.order_by('pk').values_list('name', flat=True)[:3]),
+            ['player0', 'First Last', 'Last'],
+        )
+
+    def assertNoUsers(self, url):
+        """Only the logged in user is loaded to render the page."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            len([query for query in queries if 'auth_user' in query['sql']]),
+            1,
+        )
+        return response
+
+    def test_pages(self):
+        response = self.assertNoUsers(
+            reverse('finish_game', kwargs={'pk': self.game.pk}))
+        self.assertContains(response, 'player1')
+
+        response = self.assertNoUsers(
+            reverse('create_game', kwargs={'pk': self.group.pk}))
+        self.assertContains(response, 'player4')
+
+        response = self.assertNoUsers(
+            reverse('group', kwargs={'pk': self.group.pk}))
+        self.assertContains(response, 'player4')
+
+        self.assertNoUsers(reverse('game', kwargs={
+            'group_pk': self.group.pk,
+            'game_pk': self.game.pk,
+        }))
+        self.assertNoUsers(
+            reverse('player_profile', kwargs={'pk': self.players[1].pk}))
+
+
+@override_settings(STATICFILES_STORAGE=STATICFILES_STORAGE)
+class MembershipTests(TestCase):
+    """Check the user's roles in a group are looked up once a request."""
+
+    def setUp(self):
+        cache.clear()
+        self.players = [
+            User.objects.create(username=f'player{i}').player
+            for i in range(3)
+        ]
+        self.group = Group.objects.create(name='Group')
+        self.group.players.add(*self.players[:2])
+        self.group.admins.add(self.players[1], self.players[2])
+
+    def test_roles(self):
+        roles = [
+            Membership(player.user).get_roles(self.group)
+            for player in self.players
+        ]
+        self.assertEqual(roles, [(True, False), (True, True), (False, True)])
+
+        membership = Membership(AnonymousUser())
+        with self.assertNumQueries(0):
+            self.assertFalse(membership.is_member(self.group))
+
+        membership = Membership(self.players[0].user)
+        self.assertEqual(membership.get_roles(self.group.pk + 1), (False, False))
+        with self.assertNumQueries(1):
+            self.assertTrue(membership.is_member(self.group.pk))
+            self.assertFalse(membership.is_admin(self.group))
+
+    def test_get_group(self):
+        membership = Membership(self.players[1].user)
+
+        with self.assertNumQueries(1):
+            group = membership.get_group(self.group.pk)
+            self.assertTrue(membership.is_admin(group))
+
+        with self.assertRaises(Http404):
+            membership.get_group(self.group.pk + 1)
+
+    def test_group_page(self):
+        """The page's checks don't grow with the group."""
+        self.client.force_login(self.players[0].user)
+        url = reverse('group', kwargs={'pk': self.group.pk})
+
+        def count():
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertContains(response, 'Start a game')
+            return len(queries)
+
+        queries = count()
+        self.group.players.add(*[
+            User.objects.create(username=f'member{i}').player
+            for i in range(50)
+        ])
+        self.assertEqual(count(), queries)
+
+    def test_context_processor(self):
+        self.client.force_login(self.players[2].user)
+        response = self.client.get(
+            reverse('group', kwargs={'pk': self.group.pk}))
+
+        self.assertIs(
+            response.context['membership'],
+            response.wsgi_request.membership,
+        )
+        self.assertContains(response, 'Join Group')
+
+
+class GameGroupTests(TestCase):
+    """Check each game points at the first group it's in."""
+
+    def setUp(self):
+        self.groups = [Group.objects.create(name=f'Group{i}') for i in range(2)]
+        self.game = Game.objects.create()
+
+    def group_pk(self):
+        return Game.objects.values_list('group', flat=True).get(
+            pk=self.game.pk)
+
+    def test_group_follows_games(self):
+        self.groups[0].games.add(self.game)
+        self.groups[1].games.add(self.game)
+        self.assertEqual(self.group_pk(), self.groups[0].pk)
+
+        self.groups[0].games.remove(self.game)
+        self.assertEqual(self.group_pk(), self.groups[1].pk)
+
+        self.game.groups.add(self.groups[0])
+        self.assertEqual(self.group_pk(), self.groups[1].pk)
+
+        self.groups[1].games.clear()
+        self.assertEqual(self.group_pk(), self.groups[0].pk)
+
+        self.game.groups.clear()
+        self.assertIsNone(self.group_pk())
+
+    def test_stale_game_keeps_group(self):
+        self.groups[0].games.add(self.game)
+
+        self.game.active = False
+        self.game.save()
+        self.assertEqual(self.group_pk(), self.groups[0].pk)
+
+    def test_migration(self):
+        migration = import_module('rankings.migrations.0014_game_group')
+        self.groups[1].games.add(self.game)
+        self.groups[0].games.add(self.game)
+        Game.objects.update(group=None)
+
+        migration.populate_game_groups(apps, None)
+        self.assertEqual(self.group_pk(), self.groups[1].pk)
+
+    def test_one_rank_change_per_game(self):
+        player = User.objects.create(username='player').player
+        change = {
+            'player': player,
+            'game': self.game,
+            'before': 1000,
+            'after': 1010,
+            'date_time': self.game.date_time,
+        }
+        RankChange.objects.create(**change)
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            RankChange.objects.create(**change)
+
+
+class RatingEngineTests(SimpleTestCase):
+    """Check the rating engines against their published examples."""
+
+    def test_elo_engine(self):
+        ratings, after = EloEngine().rate(
+            {'ranking': np.array([1000.0, 1100.0, 900.0])}, [0, 2], [1, 0])
+
+        first = elo(1000, 1100, settings.ELO_WEIGHTING)
+        second = elo(900, first[0], settings.ELO_WEIGHTING)
+        self.assertEqual(
+            ratings['ranking'].tolist(), [second[1], first[1], second[0]])
+        self.assertEqual(after.tolist(), [list(first), list(second)])
+
+    def test_glicko2_example(self):
+        """The example in Glickman's paper, with rankings 500 lower."""
+        ratings, after = Glicko2Engine(tau=0.5).rate(
+            {
+                'ranking': np.array([1000.0, 900.0, 1050.0, 1200.0]),
+                'deviation': np.array([200.0, 30.0, 100.0, 300.0]),
+                'volatility': np.array([0.06] * 4),
+            },
+            [0, 2, 3],
+            [1, 0, 0],
+        )
+
+        self.assertAlmostEqual(ratings['ranking'][0], 964.06, delta=0.02)
+        self.assertAlmostEqual(ratings['deviation'][0], 151.52, delta=0.02)
+        self.assertAlmostEqual(ratings['volatility'][0], 0.059996, places=6)
+
+        # The whole period is rated at once.
+        self.assertEqual(after[:, 1].tolist(), [
+            ratings['ranking'][1], ratings['ranking'][0], ratings['ranking'][0],
+        ])
+
+    def test_glicko2_idle_periods(self):
+        ratings, _ = Glicko2Engine(tau=0.5).replay(
+            {
+                'ranking': np.array([1000.0, 1000.0, 1100.0]),
+                'deviation': np.array([50.0, 350.0, 50.0]),
+                'volatility': np.array([0.06] * 3),
+            },
+            [],
+            [],
+            [],
+            first_period=1,
+            last_period=10,
+        )
+
+        # Idle players only become less certain, up to a new player's.
+        self.assertEqual(ratings['ranking'].tolist(), [1000, 1000, 1100])
+        self.assertGreater(ratings['deviation'][0], 50)
+        self.assertEqual(ratings['deviation'][1], 350)
+
+    def test_play(self):
+        winner = GroupRanking()
+        loser = GroupRanking()
+
+        Standing.play(winner, loser, 11, 4, Glicko2Engine())
+        self.assertEqual((winner.ranking, winner.wins), (1000, 1))
+
+        Standing.play(winner, loser, 11, 4, EloEngine())
+        self.assertGreater(winner.ranking, 1000)
+
+
+@override_settings(STATICFILES_STORAGE=STATICFILES_STORAGE)
+class SettleRatingsTests(TestCase):
+    """Check Glicko-2 groups are rated a day at a time."""
+
+    def setUp(self):
+        cache.clear()
+        self.players = [
+            User.objects.create(username=f'player{i}').player
+            for i in range(4)
+        ]
+        self.group = Group.objects.create(
+            name='Group', rating_engine=Glicko2Engine.name)
+        self.group.players.add(*self.players)
+        self.today = RatingEngine.period_start(
+            RatingEngine.period(timezone.now()))
+
+        results = [(0, 1, 3), (0, 2, 3), (1, 2, 2), (3, 0, 2), (0, 1, 1)]
+        for winner, loser, days in results:
+            game = Game.objects.create(
+                active=False,
+                winner=self.players[winner],
+                date_time=self.today - timedelta(days=days, hours=-12),
+            )
+            game.players.add(self.players[winner], self.players[loser])
+            self.group.games.add(game)
+
+    def rankings(self):
+        return list(self.group.rankings.order_by('player_id').values_list(
+            'ranking', 'deviation', 'volatility', 'peak_ranking'))
+
+    def test_settle(self):
+        call_command('settle_ratings', stdout=StringIO())
+
+        rankings = self.rankings()
+        self.assertGreater(rankings[0][0], rankings[1][0])
+        self.assertLess(rankings[0][1], 350)
+        self.assertGreaterEqual(rankings[0][3], rankings[0][0])
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.rated_until, self.today)
+
+        # Nothing more to settle until tomorrow.
+        call_command('settle_ratings', stdout=StringIO())
+        self.assertEqual(self.rankings(), rankings)
+
+    def test_settle_matches_rebuild(self):
+        call_command('settle_ratings', stdout=StringIO())
+        settled = self.rankings()
+
+        call_command('rebuild_rankings', stdout=StringIO())
+        rebuilt = self.rankings()
+        for expected, ranking in zip(settled, rebuilt):
+            for expected_value, value in zip(expected, ranking):
+                self.assertAlmostEqual(value, expected_value, places=6)
+
+        call_command('settle_ratings', stdout=StringIO())
+        self.assertEqual(self.rankings(), rebuilt)
+
+    def test_finish_game_waits_for_settling(self):
+        call_command('settle_ratings', stdout=StringIO())
+        ranking = self.group.rankings.get(player=self.players[2])
+
+        game = Game.objects.create()
+        game.players.add(self.players[2], self.players[3])
+        self.group.games.add(game)
+        self.client.force_login(self.players[2].user)
+        self.client.post(
+            reverse('finish_game', kwargs={'pk': game.pk}),
+            {'winner': self.players[2].pk, 'home_score': 11, 'away_score': 9},
+        )
+
+        finished = self.group.rankings.get(player=self.players[2])
+        self.assertEqual(finished.ranking, ranking.ranking)
+        self.assertEqual(finished.wins, ranking.wins + 1)
+
+        # The overall rankings are still Elo, rated straight away.
+        self.players[2].refresh_from_db()
+        self.assertGreater(self.players[2].ranking, 1000)
+
+    def test_leaderboard(self):
+        call_command('settle_ratings', stdout=StringIO())
+        self.client.force_login(self.players[0].user)
+
+        response = self.client.get(
+            reverse('group', kwargs={'pk': self.group.pk}))
+        self.assertContains(response, '&plusmn;')
+
+        data = self.client.get(
+            reverse('api_group', kwargs={'pk': self.group.pk})).json()
+        self.assertEqual(data['rating_engine'], Glicko2Engine.name)
+        self.assertLess(data['leaderboard'][0]['deviation'], 350)
+
+    def test_leaderboard_as_of(self):
+        call_command('settle_ratings', stdout=StringIO())
+        expected = self.rankings()
+        SnapshotCommand().snapshot(self.group, self.today - timedelta(days=1))
+
+        # From the snapshot, then settling the last day.
+        standings, games = standings_as_of(self.group, self.today)
+        self.assertEqual(games, 5)
+        rankings = [
+            (standing.ranking, standing.deviation, standing.volatility,
+             standing.peak_ranking)
+            for _, standing in sorted(standings.items())
+        ]
+        for expected_values, values in zip(expected, rankings):
+            for expected_value, value in zip(expected_values, values):
+                self.assertAlmostEqual(value, expected_value, places=6)
+
+
+@override_settings(STATICFILES_STORAGE=STATICFILES_STORAGE)
+class SnapshotTests(TestCase):
+    """Check past leaderboards match replaying the whole history."""
+
+    def setUp(self):
+        cache.clear()
+        self.players = [
+            User.objects.create(username=f'player{i}').player
+            for i in range(4)
+        ]
+        self.group = Group.objects.create(name='Group')
+        self.group.players.add(*self.players)
+        self.today = RatingEngine.period_start(
+            RatingEngine.period(timezone.now()))
+
+        results = [
+            (0, 1, 5), (2, 3, 5), (1, 2, 4), (0, 3, 3), (3, 0, 2), (2, 1, 1),
+        ]
+        for winner, loser, days in results:
+            self.play(winner, loser, days)
+
+    def play(self, winner, loser, days):
+        game = Game.objects.create(
+            active=False,
+            winner=self.players[winner],
+            home_score=11,
+            away_score=winner + 5,
+            date_time=self.today - timedelta(days=days, hours=-12),
+            group=self.group,
+        )
+        game.players.add(self.players[winner], self.players[loser])
+        self.group.games.add(game)
+        return game
+
+    def standings(self, date_time):
+        standings, _ = standings_as_of(self.group, date_time)
+        return {
+            player_pk: tuple(
+                getattr(standing, field) for field in Standing.standing_fields)
+            for player_pk, standing in standings.items()
+        }
+
+    def test_matches_rebuild(self):
+        call_command('rebuild_rankings', stdout=StringIO())
+        call_command('rebuild_stats', stdout=StringIO())
+
+        self.assertEqual(self.standings(self.today), {
+            ranking.player_id: tuple(
+                getattr(ranking, field) for field in Standing.standing_fields)
+            for ranking in self.group.rankings.all()
+        })
+
+    def test_snapshot_replays_later_games(self):
+        two_days_ago = self.today - timedelta(days=2)
+        expected = self.standings(self.today)
+        expected_before = self.standings(two_days_ago)
+
+        SnapshotCommand().snapshot(self.group, two_days_ago)
+        snapshot = self.group.snapshots.get()
+        self.assertEqual(snapshot.games, 4)
+        self.assertEqual(snapshot.rankings.count(), 4)
+
+        # Only the two games since the snapshot are replayed.
+        with CaptureQueriesContext(connection) as queries:
+            standings, games = standings_as_of(self.group, self.today)
+        self.assertEqual(games, 6)
+        self.assertEqual(len(queries), 4)
+
+        self.assertEqual(self.standings(self.today), expected)
+        self.assertEqual(self.standings(two_days_ago), expected_before)
+
+    def test_before_any_games(self):
+        self.assertEqual(standings_as_of(
+            self.group, self.today - timedelta(days=5)), ({}, 0))
+
+    def test_command_needs_enough_games(self):
+        call_command('snapshot_rankings', games=7, stdout=StringIO())
+        self.assertFalse(LeaderboardSnapshot.objects.exists())
+
+        call_command('snapshot_rankings', games=6, stdout=StringIO())
+        snapshot = self.group.snapshots.get()
+        self.assertEqual(snapshot.date_time, self.today)
+        self.assertEqual(snapshot.games, 6)
+
+        # No more games since.
+        call_command('snapshot_rankings', games=1, stdout=StringIO())
+        self.assertEqual(self.group.snapshots.count(), 1)
+
+    def test_late_game_forgets_later_snapshots(self):
+        SnapshotCommand().snapshot(self.group, self.today - timedelta(days=3))
+        SnapshotCommand().snapshot(self.group, self.today - timedelta(days=1))
+
+        self.play(1, 0, 2)
+        self.assertEqual(
+            list(self.group.snapshots.values_list('date_time', flat=True)),
+            [self.today - timedelta(days=3)],
+        )
+
+        # Games being played today can't be in any snapshot.
+        game = Game.objects.create()
+        game.players.add(self.players[0], self.players[1])
+        self.group.games.add(game)
+        game.save()
+        self.assertEqual(self.group.snapshots.count(), 1)
+
+    def test_engine_change(self):
+        call_command('snapshot_rankings', games=1, stdout=StringIO())
+        self.group.rating_engine = Glicko2Engine.name
+        self.group.save()
+
+        # The Elo snapshot isn't used for Glicko-2 rankings.
+        standings, games = standings_as_of(self.group, self.today)
+        self.assertEqual(games, 6)
+        self.assertLess(standings[self.players[0].pk].deviation, 350)
+
+        call_command('snapshot_rankings', games=1, stdout=StringIO())
+        self.assertEqual(
+            self.group.snapshots.get().rating_engine, Glicko2Engine.name)
+
+    def test_view(self):
+        self.client.force_login(self.players[0].user)
+        url = reverse('group_leaderboard', kwargs={'pk': self.group.pk})
+        date = timezone.localdate() - timedelta(days=4)
+
+        response = self.client.get(url, {'date': str(date)})
+        self.assertEqual(response.context['date'], date)
+        self.assertContains(response, 'player3')
+
+        # Three games in, the first winner leads.
+        self.assertLess(
+            response.content.index(b'player0'),
+            response.content.index(b'player1'),
+        )
+
+        response = self.client.get(url, {'date': str(date - timedelta(days=5))})
+        self.assertContains(response, 'No games had been played by then.')
+
+        response = self.client.get(url, {'date': 'yesterday'})
+        self.assertIsNone(response.context['date'])
+        self.assertContains(response, 'Enter a valid date.')
+        self.assertContains(response, 'Players now')
+
+
+@override_settings(STATICFILES_STORAGE=STATICFILES_STORAGE, GAMES_PAGE_SIZE=3)
+class QueryBudgetTests(TestCase):
+    """
+    Check each page runs a fixed number of queries.
+
+    Every named url in rankings.urls needs a budget, and the page must
+    run the same number of queries after more games have been played.
+    Budgets are for an empty cache.
+    """
+
+    budgets = {
+        'index': 3,
+        'groups': 6,
+        'group': 7,
+        'join_group': 9,
+        'matchmaking': 5,
+        'game': 6,
+        'live_game': 2,
+        'game_score': 7,
+        'create_game': 12,
+        'create_fixtures': 12,
+        'edit_group': 8,
+        'finish_game': 17,
+        'player_profile': 7,
+        'group_games': 2,
+        'group_leaderboard': 6,
+        'group_predictions': 3,
+        'player_games': 3,
+        'player_ratings': 3,
+        'performance': 2,
+        'api_groups': 1,
+        'api_group': 2,
+        'api_group_games': 1,
+        'api_group_predictions': 2,
+        'api_game': 3,
+        'api_player': 1,
+        'export_group': 5,
+    }
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create(username='admin').player
+        self.players = [
+            User.objects.create(username=f'player{i}').player
+            for i in range(4)
+        ]
+        self.group = Group.objects.create(name='Group')
+        self.group.players.add(self.admin, *self.players)
+        self.group.admins.add(self.admin)
+        self.other_group = Group.objects.create(name='Other Group')
+        self.add_history()
+        self.client.force_login(self.admin.user)
+
+    def add_history(self, games=5):
+        """Play some more games, half of them involving the admin."""
+
+        for i in range(games):
+            players = [self.admin, self.players[i % 4]]
+            if i % 2:
+                players = self.players[i % 4], self.players[(i + 1) % 4]
+
+            game = self.create_game(*players)
+            self.client.force_login(self.admin.user)
+            self.client.post(
+                reverse('finish_game', kwargs={'pk': game.pk}),
+                {'winner': players[i % 2].pk, 'home_score': 11, 'away_score': 5},
+            )
+
+        self.create_game(self.admin, self.players[0])
+
+    def create_game(self, *players):
+        game = Game.objects.create()
+        game.players.add(*players)
+        self.group.games.add(game)
+        return game
+
+    def assertQueryBudget(self, name, request):
+        """
+        Check the queries run by the request against the budget.
+
+        :param name: The url name of the page.
+        :param request: Callable returning (method, url, data), called
+        before and after more games have been played.
+        """
+        counts = []
+
+        for _ in range(2):
+            # Budget for the worst case, with nothing cached.
+            cache.clear()
+            method, url, data = request()
+            with CaptureQueriesContext(connection) as queries:
+                response = getattr(self.client, method)(url, data)
+                # Streamed responses run their queries as they're read.
+                if response.streaming:
+                    list(response.streaming_content)
+
+            self.assertLess(response.status_code, 400)
+            counts.append(len(queries))
+            self.add_history()
+
+        self.assertEqual(counts[0], counts[1], f'{name} queries grew')
+        self.assertLessEqual(
+            counts[0],
+            self.budgets[name],
+            f'{name} ran more queries than its budget',
+        )
+
+    def test_every_url_has_a_budget(self):
+        names = {pattern.name for pattern in urlpatterns}
+
+        self.assertEqual(names, set(self.budgets))
+
+    def test_index(self):
+        self.assertQueryBudget('index', lambda: (
+            'get', reverse('index'), None))
+
+    def test_groups(self):
+        self.assertQueryBudget('groups', lambda: (
+            'get', reverse('groups'), None))
+
+    def test_group(self):
+        self.assertQueryBudget('group', lambda: (
+            'get', reverse('group', kwargs={'pk': self.group.pk}), None))
+
+    def test_join_group(self):
+        def request():
+            self.other_group.players.clear()
+            return (
+                'get',
+                reverse('join_group', kwargs={'pk': self.other_group.pk}),
+                None,
+            )
+
+        self.assertQueryBudget('join_group', request)
+
+    def test_matchmaking(self):
+        self.assertQueryBudget('matchmaking', lambda: (
+            'get', reverse('matchmaking', kwargs={'pk': self.group.pk}), None))
+
+    def test_game(self):
+        def request():
+            game = self.group.games.filter(active=False).latest('pk')
+            return 'get', reverse('game', kwargs={
+                'group_pk': self.group.pk,
+                'game_pk': game.pk,
+            }), None
+
+        self.assertQueryBudget('game', request)
+
+    def test_live_game(self):
+        def request():
+            game = self.group.games.filter(active=False).latest('pk')
+            return 'get', reverse('live_game', kwargs={
+                'group_pk': self.group.pk,
+                'game_pk': game.pk,
+            }), None
+
+        self.assertQueryBudget('live_game', request)
+
+    def test_game_score(self):
+        def request():
+            game = self.group.games.filter(active=True).latest('pk')
+            return 'post', reverse('game_score', kwargs={
+                'group_pk': self.group.pk,
+                'game_pk': game.pk,
+            }), {'player': self.admin.pk}
+
+        self.assertQueryBudget('game_score', request)
+
+    def test_performance(self):
+        User.objects.filter(pk=self.admin.user_id).update(is_staff=True)
+
+        self.assertQueryBudget('performance', lambda: (
+            'get', reverse('performance'), None))
+
+    def test_game_players(self):
+        game = self.create_game(*self.players)
+        Game.objects.filter(pk=game.pk).update(active=False)
+        url = reverse('game', kwargs={
+            'group_pk': self.group.pk,
+            'game_pk': game.pk,
+        })
+
+        with self.assertNumQueries(self.budgets['game']):
+            response = self.client.get(url)
+
+        self.assertContains(response, 'not available', count=4)
+
+    def test_create_game(self):
+        self.assertQueryBudget('create_game', lambda: (
+            'post',
+            reverse('create_game', kwargs={'pk': self.group.pk}),
+            {'players': [self.admin.pk, self.players[0].pk]},
+        ))
+
+    def test_create_fixtures(self):
+        self.assertQueryBudget('create_fixtures', lambda: (
+            'post',
+            reverse('create_fixtures', kwargs={'pk': self.group.pk}),
+            {
+                'format': 'round_robin',
+                'players': [self.admin.pk] + [p.pk for p in self.players],
+            },
+        ))
+
+    def test_edit_group(self):
+        self.assertQueryBudget('edit_group', lambda: (
+            'post',
+            reverse('edit_group', kwargs={'pk': self.group.pk}),
+            {
+                'name': 'Group',
+                'players': [self.admin.pk] + [p.pk for p in self.players],
+            },
+        ))
+
+    def test_finish_game(self):
+        def request():
+            game = self.create_game(self.admin, self.players[1])
+            return 'post', reverse('finish_game', kwargs={'pk': game.pk}), {
+                'winner': self.admin.pk,
+                'home_score': 11,
+                'away_score': 9,
+            }
+
+        self.assertQueryBudget('finish_game', request)
+
+    def test_group_leaderboard(self):
+        def request():
+            # Play the games days ago, with a snapshot of all but the
+            # newest.
+            Game.objects.update(date_time=F('date_time') - timedelta(days=2))
+            LeaderboardSnapshot.objects.all().delete()
+            newest = Game.objects.order_by('-date_time').first()
+            SnapshotCommand().snapshot(self.group, newest.date_time)
+
+            return 'get', reverse(
+                'group_leaderboard', kwargs={'pk': self.group.pk},
+            ), {'date': str(timezone.localdate() - timedelta(days=1))}
+
+        self.assertQueryBudget('group_leaderboard', request)
+
+    def test_group_predictions(self):
+        self.assertQueryBudget('group_predictions', lambda: (
+            'get',
+            reverse('group_predictions', kwargs={'pk': self.group.pk}),
+            {'player': self.admin.pk, 'opponent': self.players[0].pk},
+        ))
+
+    def test_player_profile(self):
+        self.assertQueryBudget('player_profile', lambda: (
+            'get',
+            reverse('player_profile', kwargs={'pk': self.admin.pk}),
+            None,
+        ))
+
+    def test_group_games(self):
+        self.assertQueryBudget('group_games', lambda: (
+            'get',
+            reverse('group_games', kwargs={'pk': self.group.pk}),
+            {'status': 'completed', 'after': encode_cursor(
+                self.group.games.filter(active=False).latest('date_time'))},
+        ))
+
+    def test_player_games(self):
+        self.assertQueryBudget('player_games', lambda: (
+            'get',
+            reverse('player_games', kwargs={'pk': self.admin.pk}),
+            {'status': 'completed', 'after': encode_cursor(
+                self.admin.games.filter(active=False).latest('date_time'))},
+        ))
+
+    def test_player_ratings(self):
+        self.assertQueryBudget('player_ratings', lambda: (
+            'get',
+            reverse('player_ratings', kwargs={'pk': self.admin.pk}),
+            {'points': 3},
+        ))
+
+    def test_export_group(self):
+        self.assertQueryBudget('export_group', lambda: (
+            'get', reverse('export_group', kwargs={'pk': self.group.pk}), None))
+
+    def test_api_groups(self):
+        self.assertQueryBudget('api_groups', lambda: (
+            'get', reverse('api_groups'), None))
+
+    def test_api_group(self):
+        self.assertQueryBudget('api_group', lambda: (
+            'get', reverse('api_group', kwargs={'pk': self.group.pk}), None))
+
+    def test_api_group_games(self):
+        self.assertQueryBudget('api_group_games', lambda: (
+            'get',
+            reverse('api_group_games', kwargs={'pk': self.group.pk}),
+            {'status': 'completed'},
+        ))
+
+    def test_api_group_predictions(self):
+        self.assertQueryBudget('api_group_predictions', lambda: (
+            'get',
+            reverse('api_group_predictions', kwargs={'pk': self.group.pk}),
+            None,
+        ))
+
+    def test_api_game(self):
+        def request():
+            game = self.group.games.filter(active=False).latest('pk')
+            return 'get', reverse('api_game', kwargs={
+                'group_pk': self.group.pk,
+                'game_pk': game.pk,
+            }), None
+
+        self.assertQueryBudget('api_game', request)
+
+    def test_api_player(self):
+        self.assertQueryBudget('api_player', lambda: (
+            'get', reverse('api_player', kwargs={'pk': self.admin.pk}), None))
+
+
+class LTTBTests(SimpleTestCase):
+    """Check the downsampling keeps the shape of the series."""
+
+    def test_short_series(self):
+        self.assertEqual(lttb([1, 2, 3], [1, 2, 3], 5).tolist(), [0, 1, 2])
+
+    def test_threshold(self):
+        x = np.arange(10000)
+        y = np.random.RandomState(42).normal(size=10000)
+
+        keep = lttb(x, y, 100)
+
+        self.assertEqual(len(keep), 100)
+        self.assertEqual(keep[0], 0)
+        self.assertEqual(keep[-1], 9999)
+        self.assertTrue((np.diff(keep) > 0).all())
+
+    def test_keeps_peaks(self):
+        y = np.zeros(1000)
+        y[333] = 50
+        y[666] = -50
+
+        keep = lttb(np.arange(1000), y, 10).tolist()
+
+        self.assertIn(333, keep)
+        self.assertIn(666, keep)
+
+
+class PlayerRatingsTests(TestCase):
+    """Check the rating history endpoint."""
+
+    def setUp(self):
+        self.players = [
+            User.objects.create(username=f'player{i}').player
+            for i in range(2)
+        ]
+        self.group = Group.objects.create(name='Group')
+        self.group.players.add(*self.players)
+        self.client.force_login(self.players[0].user)
+        self.start = timezone.now() - timedelta(days=10)
+
+        for day in range(10):
+            game = Game.objects.create()
+            Game.objects.filter(pk=game.pk).update(
+                date_time=self.start + timedelta(days=day))
+            game.players.add(*self.players)
+            self.group.games.add(game)
+            self.client.post(
+                reverse('finish_game', kwargs={'pk': game.pk}),
+                {'winner': self.players[day % 2].pk},
+            )
+
+    def get_ratings(self, **params):
+        return self.client.get(
+            reverse('player_ratings', kwargs={'pk': self.players[0].pk}),
+            params,
+        )
+
+    def test_history(self):
+        data = self.get_ratings().json()
+        changes = RankChange.objects.filter(
+            player=self.players[0],
+        ).order_by('date_time')
+
+        self.assertEqual(data['count'], 10)
+        self.assertEqual(data['points'], [
+            [
+                (change.date_time - EPOCH) // timedelta(milliseconds=1),
+                change.after,
+            ]
+            for change in changes
+        ])
+        self.assertEqual(
+            changes[0].date_time, changes[0].game.date_time)
+
+    def test_window(self):
+        data = self.get_ratings(
+            start=(self.start + timedelta(days=2)).isoformat(),
+            end=(self.start + timedelta(days=5)).isoformat(),
+        ).json()
+
+        self.assertEqual(data['count'], 3)
+
+    def test_downsampled(self):
+        data = self.get_ratings(points=4).json()
+
+        self.assertEqual(data['count'], 10)
+        self.assertEqual(len(data['points']), 4)
+
+    def test_invalid(self):
+        self.assertEqual(self.get_ratings(start='yesterday').status_code, 400)
+        self.assertEqual(self.client.get(reverse(
+            'player_ratings', kwargs={'pk': 0})).status_code, 404)
+
+
+@override_settings(STATICFILES_STORAGE=STATICFILES_STORAGE)
+class PredictionsTests(TransactionTestCase):
+    """Check the predicted results between a group's members."""
+
+    def setUp(self):
+        cache.clear()
+        self.players = [
+            User.objects.create(username=f'player{i}').player
+            for i in range(4)
+        ]
+        self.group = Group.objects.create(name='Group')
+        self.group.players.add(*self.players)
+        for player, ranking in zip(self.players, [1200, 1000, 1010, 800]):
+            GroupRanking.objects.filter(player=player).update(ranking=ranking)
+
+    def test_win_probabilities(self):
+        rankings = list(self.group.leaderboard())
+        probabilities = win_probabilities(self.group, rankings)
+
+        for row, ranking in enumerate(rankings):
+            for column, opponent in enumerate(rankings):
+                self.assertAlmostEqual(
+                    probabilities[row, column],
+                    expected_score(ranking.ranking, opponent.ranking),
+                )
+
+    def test_balanced_matchups(self):
+        rng = np.random.RandomState(1)
+        rankings = rng.normal(1000, 200, 50)
+        probabilities = EloEngine().win_probabilities({'ranking': rankings})
+
+        pairs = sorted(
+            (abs(probabilities[row, column] - 0.5), row, column)
+            for row in range(50)
+            for column in range(row + 1, 50)
+        )
+        self.assertEqual(
+            [(row, column) for row, column, _ in balanced_matchups(
+                probabilities, 5)],
+            [(row, column) for _, row, column in pairs[:5]],
+        )
+        self.assertEqual(len(balanced_matchups(probabilities[:3, :3], 5)), 3)
+
+    def test_predictions(self):
+        url = reverse('group_predictions', kwargs={'pk': self.group.pk})
+        response = self.client.get(url, {
+            'player': self.players[1].pk,
+            'opponent': self.players[0].pk,
+        })
+
+        prediction = response.context['prediction']
+        self.assertEqual(
+            (prediction['player'], prediction['opponent']),
+            (self.players[1], self.players[0]),
+        )
+        self.assertContains(response, '24.0%')
+        # The closest matchup is the pair ten points apart.
+        self.assertContains(response, '<td>51.4%</td>', html=True)
+
+        # The table is cached until the rankings change.
+        with self.assertNumQueries(1):
+            self.client.get(url)
+
+        GroupRanking.objects.get(player=self.players[3]).save()
+        with self.assertNumQueries(2):
+            self.client.get(url)
+
+    def test_api(self):
+        data = self.client.get(reverse(
+            'api_group_predictions', kwargs={'pk': self.group.pk})).json()
+
+        self.assertEqual(
+            [player['id'] for player in data['players']],
+            [self.players[i].pk for i in (0, 2, 1, 3)],
+        )
+        self.assertEqual(data['probabilities'][1][1], 0.5)
+        self.assertEqual(
+            (data['matchups'][0]['player'], data['matchups'][0]['opponent']),
+            (self.players[2].pk, self.players[1].pk),
+        )
+
+
+class MatchmakingTests(TestCase):
+    """Check the players waiting are paired by ranking."""
+
+    def setUp(self):
+        self.players = [
+            User.objects.create(username=f'player{i}').player
+            for i in range(5)
+        ]
+        self.group = Group.objects.create(name='Group')
+        self.group.players.add(*self.players)
+        for player, ranking in zip(self.players, [1000, 1210, 990, 1200, 700]):
+            GroupRanking.objects.filter(player=player).update(ranking=ranking)
+        self.client.force_login(self.players[0].user)
+        self.url = reverse('matchmaking', kwargs={'pk': self.group.pk})
+
+    def brute_force(self, rankings):
+        """The smallest total gap of any pairing, with one bye if odd."""
+        pks = sorted(rankings)
+        if len(pks) < 2:
+            return 0
+        if len(pks) % 2:
+            return min(self.brute_force({
+                pk: rankings[pk] for pk in pks if pk != bye
+            }) for bye in pks)
+
+        first = pks[0]
+        return min(
+            abs(rankings[first] - rankings[pk]) + self.brute_force({
+                other: rankings[other] for other in pks[1:] if other != pk
+            })
+            for pk in pks[1:]
+        )
+
+    def test_pair_players(self):
+        rng = np.random.RandomState(2)
+        for size in range(1, 10):
+            rankings = dict(enumerate(rng.normal(1000, 200, size).tolist()))
+            pairs, bye = pair_players(rankings, {}, 200)
+
+            self.assertEqual(
+                sorted([pk for pair in pairs for pk in pair] +
+                       ([bye] if bye is not None else [])),
+                list(range(size)),
+            )
+            self.assertAlmostEqual(
+                sum(abs(rankings[a] - rankings[b]) for a, b in pairs),
+                self.brute_force(rankings),
+            )
+
+    def test_avoids_rematches(self):
+        rankings = {1: 1200, 2: 1190, 3: 1100, 4: 1090}
+        recent = rematches([(1, 1), (1, 2), (2, 2), (2, 1), (3, 3), (3, 4)])
+
+        self.assertEqual(recent[frozenset((1, 2))], 2)
+        self.assertEqual(
+            pair_players(rankings, recent, 200), ([(1, 3), (2, 4)], None))
+        self.assertEqual(pair_players(rankings, {}, 200), ([(1, 2), (3, 4)], None))
+
+    @override_settings(MATCHMAKING_REMATCH_PENALTY=1000)
+    def test_matchmaking(self):
+        game = Game.objects.create()
+        game.players.add(self.players[1], self.players[3])
+        self.group.games.add(game)
+
+        data = self.client.get(self.url).json()
+
+        self.assertEqual(
+            [[player['id'] for player in pair['players']]
+             for pair in data['pairs']],
+            [
+                [self.players[1].pk, self.players[0].pk],
+                [self.players[3].pk, self.players[2].pk],
+            ],
+        )
+        self.assertEqual(data['bye']['id'], self.players[4].pk)
+
+        # A game long ago isn't a rematch.
+        Game.objects.filter(pk=game.pk).update(
+            date_time=timezone.now() - timedelta(days=1))
+        pair = self.client.get(self.url).json()['pairs'][0]
+        self.assertEqual(pair['gap'], 10)
+        self.assertEqual(pair['recent_games'], 0)
+
+    def test_present_players(self):
+        response = self.client.get(self.url, {
+            'players': [self.players[0].pk, self.players[4].pk],
+        })
+        self.assertEqual(response.json()['pairs'][0]['gap'], 300)
+
+        outsider = User.objects.create(username='outsider').player
+        response = self.client.get(self.url, {'players': [outsider.pk]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            self.client.get(self.url, {'players': 'x'}).status_code, 400)
+
+
+@override_settings(
+    STATICFILES_STORAGE=STATICFILES_STORAGE,
+    LIVE_SCORE_POLL_SECONDS=0.05,
+)
+class LiveScoreTests(TestCase):
+    """Check live scores are pushed to everyone watching the game."""
+
+    def setUp(self):
+        cache.clear()
+        self.players = [
+            User.objects.create(username=f'player{i}').player
+            for i in range(3)
+        ]
+        self.group = Group.objects.create(name='Group')
+        self.group.players.add(*self.players)
+        self.game = Game.objects.create()
+        self.game.players.add(*self.players[:2])
+        self.group.games.add(self.game)
+        self.client.force_login(self.players[0].user)
+
+    def url(self, name, group=None):
+        return reverse(name, kwargs={
+            'group_pk': (group or self.group).pk,
+            'game_pk': self.game.pk,
+        })
+
+    def watch(self):
+        """:return: Iterator of the game's events, for an anonymous watcher."""
+        response = Client().get(self.url('live_game'))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.addCleanup(response.close)
+
+        return iter(response.streaming_content)
+
+    def read(self, events):
+        """:return: The next score from the events, skipping keepalives."""
+        for event in events:
+            for line in event.decode().splitlines():
+                if line.startswith('data: '):
+                    return json.loads(line[len('data: '):])
+
+    def score(self, player, points=1, **extra):
+        return self.client.post(
+            self.url('game_score'),
+            {'player': player.pk, 'points': points},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+            **extra
+        )
+
+    @override_settings(LIVE_SCORE_MAX_STREAMS=200)
+    def test_fan_out(self):
+        watchers = [self.watch()]
+        self.assertEqual(self.read(watchers[0])['points'], [0, 0])
+
+        # Later watchers start from the score in memory.
+        with self.assertNumQueries(0):
+            watchers += [self.watch() for _ in range(199)]
+            for events in watchers[1:]:
+                self.assertEqual(self.read(events)['points'], [0, 0])
+
+        self.assertEqual(self.score(self.players[1]).json()['points'], [0, 1])
+
+        with self.assertNumQueries(0):
+            for events in watchers:
+                self.assertEqual(self.read(events)['points'], [0, 1])
+
+    def test_finished(self):
+        events = self.watch()
+        self.read(events)
+
+        self.client.post(
+            reverse('finish_game', kwargs={'pk': self.game.pk}),
+            {'winner': self.players[0].pk, 'home_score': 11, 'away_score': 9},
+        )
+
+        score = self.read(events)
+        self.assertFalse(score['active'])
+        self.assertEqual(score['winner'], self.players[0].pk)
+        self.assertEqual(score['score'], [11, 9])
+        self.assertEqual(list(events), [])
+        self.assertEqual(live.broker.channels, {})
+
+    def test_other_processes(self):
+        events = self.watch()
+        self.read(events)
+
+        # Scored in another process, with its own broker.
+        Game.objects.filter(pk=self.game.pk).update(away_points=3)
+        self.assertEqual(self.read(events)['points'], [0, 3])
+
+    @override_settings(LIVE_SCORE_STREAM_SECONDS=0)
+    def test_reconnect(self):
+        events = self.watch()
+        self.assertEqual(next(events).decode().splitlines()[0], 'retry: 1000')
+        self.assertEqual(list(events), [])
+
+    @override_settings(LIVE_SCORE_MAX_STREAMS=1)
+    def test_too_many_streams(self):
+        watching = Client().get(self.url('live_game'))
+        self.read(iter(watching.streaming_content))
+
+        # Left to poll the score, so the other pages keep their threads.
+        response = Client().get(self.url('live_game'))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '300')
+
+        watching.close()
+        self.assertEqual(live.broker.watchers, 0)
+        self.assertEqual(self.read(self.watch())['points'], [0, 0])
+
+    @override_settings(LIVE_SCORE_MAX_STREAMS=1)
+    def test_stream_never_read(self):
+        # Counted from the request, not from when the stream is read.
+        watching = Client().get(self.url('live_game'))
+        response = Client().get(self.url('live_game'))
+        self.assertEqual(response.status_code, 503)
+
+        watching.close()
+        self.assertEqual(live.broker.watchers, 0)
+        self.assertEqual(live.broker.channels, {})
+
+    def test_subscribe_limit(self):
+        broker = live.Broker()
+        subscribed = []
+        threads = [
+            threading.Thread(target=lambda: subscribed.append(
+                broker.subscribe(self.game.pk, {}, 5)))
+            for _ in range(50)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(
+            len([subscription for subscription in subscribed if subscription]),
+            5,
+        )
+        self.assertEqual(broker.watchers, 5)
+
+    def test_score(self):
+        self.score(self.players[0])
+        self.score(self.players[0])
+        self.score(self.players[1], -1)
+        self.assertEqual(self.score(self.players[0], -1).json()['points'], [1, 0])
+
+        response = self.client.get(self.url('game_score'))
+        self.assertEqual(response.json()['points'], [1, 0])
+
+        response = self.client.get(self.url('game'))
+        self.assertContains(response, 'live-score')
+
+        # Without javascript, back to the game.
+        response = self.client.post(
+            self.url('game_score'), {'player': self.players[1].pk})
+        self.assertRedirects(response, self.url('game'))
+
+    def test_invalid_scores(self):
+        self.assertEqual(self.score(self.players[2]).status_code, 400)
+        self.assertEqual(self.score(self.players[0], 2).status_code, 400)
+
+        response = Client().post(
+            self.url('game_score'), {'player': self.players[0].pk})
+        self.assertEqual(response.status_code, 403)
+
+        other_group = Group.objects.create(name='Other Group')
+        response = self.client.get(self.url('live_game', other_group))
+        self.assertEqual(response.status_code, 404)
+
+        Game.objects.filter(pk=self.game.pk).update(active=False)
+        self.assertEqual(self.score(self.players[0]).status_code, 400)
+
+
+@override_settings(STATICFILES_STORAGE=STATICFILES_STORAGE)
+class FixturesTests(TestCase):
+    """Check the tournament fixtures, and creating their games."""
+
+    def setUp(self):
+        cache.clear()
+        self.players = [
+            User.objects.create(username=f'player{i}').player
+            for i in range(6)
+        ]
+        self.group = Group.objects.create(name='Group')
+        self.group.players.add(*self.players)
+        self.group.admins.add(self.players[0])
+        self.client.force_login(self.players[0].user)
+        self.url = reverse('create_fixtures', kwargs={'pk': self.group.pk})
+
+    def test_round_robin(self):
+        for size in (2, 5, 8):
+            rounds = round_robin(range(size))
+            pairs = [frozenset(pair) for pairs in rounds for pair in pairs]
+
+            self.assertEqual(len(rounds), size - 1 + size % 2)
+            self.assertEqual(len(pairs), size * (size - 1) // 2)
+            self.assertEqual(len(set(pairs)), len(pairs))
+            for pairs in rounds:
+                players = [player for pair in pairs for player in pair]
+                self.assertEqual(len(players), len(set(players)))
+
+    def test_elimination_round(self):
+        self.assertEqual(bracket_order(8), [0, 7, 3, 4, 1, 6, 2, 5])
+
+        pairs, byes = elimination_round(range(6))
+        self.assertEqual(pairs, [(3, 4), (2, 5)])
+        self.assertEqual(byes, [0, 1])
+
+        self.assertEqual(elimination_round(range(4)), ([(0, 3), (1, 2)], []))
+
+    def test_create_round_robin(self):
+        players = User.objects.bulk_create([
+            User(username=f'extra{i}') for i in range(58)
+        ])
+        Player.objects.bulk_create([
+            Player(user=user)
+            for user in User.objects.filter(username__startswith='extra')
+        ])
+        self.group.players.add(*Player.objects.filter(
+            user__username__startswith='extra'))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, {
+                'format': 'round_robin',
+                'players': Player.objects.values_list('pk', flat=True),
+            })
+
+        # A bulk insert per table, split into batches on SQLite.
+        self.assertLess(len(queries), 50)
+
+        self.assertRedirects(
+            response, reverse('group', kwargs={'pk': self.group.pk}))
+        self.assertEqual(self.group.games.filter(active=True).count(), 2016)
+        self.assertEqual(Game.players.through.objects.count(), 4032)
+        self.assertEqual(
+            self.players[1].games.count(), 63)
+
+    def test_create_elimination(self):
+        for player, ranking in zip(self.players, range(1000, 1600, 100)):
+            GroupRanking.objects.filter(player=player).update(ranking=ranking)
+
+        response = self.client.post(self.url, {
+            'format': 'elimination',
+            'players': [player.pk for player in self.players],
+        }, follow=True)
+
+        # The top two seeds go straight through.
+        self.assertContains(
+            response, 'Through to the next round: player5, player4.')
+        self.assertEqual(
+            sorted(
+                sorted(game.players.values_list('pk', flat=True))
+                for game in self.group.games.all()
+            ),
+            sorted([
+                sorted([self.players[2].pk, self.players[1].pk]),
+                sorted([self.players[3].pk, self.players[0].pk]),
+            ]),
+        )
+
+    def test_only_admins(self):
+        self.client.force_login(self.players[1].user)
+        response = self.client.post(self.url, {
+            'format': 'round_robin',
+            'players': [self.players[0].pk, self.players[1].pk],
+        })
+
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Game.objects.exists())
+
+    def test_needs_two_players(self):
+        response = self.client.post(self.url, {
+            'format': 'round_robin',
+            'players': [self.players[0].pk],
+        })
+
+        self.assertFormError(
+            response, 'form', 'players', 'A tournament needs two players.')
+
+    def test_inserted_pks(self):
+        # Another fixture is inserted after the last pk was read.
+        date_time = timezone.now()
+        other = Game.objects.create(date_time=date_time, group=self.group)
+        other.players.add(*self.players[:2])
+
+        games = Game.objects.bulk_create([
+            Game(date_time=date_time, group=self.group),
+            Game(date_time=date_time + timedelta(days=1), group=self.group),
+        ])
+
+        self.assertEqual(
+            inserted_pks(Game, games, 0),
+            list(Game.objects.exclude(pk=other.pk).order_by(
+                'pk').values_list('pk', flat=True)),
+        )
+
+
+class APITests(TransactionTestCase):
+    """Check the JSON API and its conditional GETs."""
+
+    def setUp(self):
+        cache.clear()
+        self.players = [
+            User.objects.create(username=f'player{i}').player
+            for i in range(2)
+        ]
+        self.group = Group.objects.create(name='Group')
+        self.group.players.add(*self.players)
+        self.game = Game.objects.create()
+        self.game.players.add(*self.players)
+        self.group.games.add(self.game)
+
+    def finish_game(self):
+        self.client.force_login(self.players[0].user)
+        self.client.post(
+            reverse('finish_game', kwargs={'pk': self.game.pk}),
+            {'winner': self.players[0].pk, 'home_score': 11, 'away_score': 3},
+        )
+        self.client.logout()
+
+    def assertNotModified(self, url, modify):
+        """Check polling the url gets a 304 until modify() is called."""
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        modify()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        return response.json()
+
+    def test_group(self):
+        url = reverse('api_group', kwargs={'pk': self.group.pk})
+
+        data = self.assertNotModified(url, self.finish_game)
+
+        self.assertEqual(data['name'], 'Group')
+        self.assertEqual(
+            [player['id'] for player in data['leaderboard']],
+            [self.players[0].pk, self.players[1].pk],
+        )
+        self.assertEqual(data['leaderboard'][0]['wins'], 1)
+
+    def test_groups(self):
+        def rename():
+            self.group.name = 'Renamed'
+            self.group.save()
+
+        data = self.assertNotModified(reverse('api_groups'), rename)
+
+        self.assertEqual(data['groups'][0]['name'], 'Renamed')
+
+    def test_game(self):
+        url = reverse('api_game', kwargs={
+            'group_pk': self.group.pk,
+            'game_pk': self.game.pk,
+        })
+
+        data = self.assertNotModified(url, self.finish_game)
+
+        self.assertFalse(data['active'])
+        self.assertEqual(data['winner']['id'], self.players[0].pk)
+        self.assertEqual(data['players'][0]['after'], self.players[0].ranking + 16)
+
+    def test_group_games(self):
+        url = reverse('api_group_games', kwargs={'pk': self.group.pk})
+
+        self.assertEqual(self.client.get(url).json()['games'], [])
+        data = self.assertNotModified(url, self.finish_game)
+
+        self.assertEqual(data['games'][0]['id'], self.game.pk)
+
+    def test_player(self):
+        def rename():
+            self.players[0].user.first_name = 'First'
+            self.players[0].user.save()
+
+        url = reverse('api_player', kwargs={'pk': self.players[0].pk})
+        data = self.assertNotModified(url, rename)
+
+        self.assertEqual(data['name'], 'First')
+
+    def test_not_found(self):
+        response = self.client.get(reverse('api_group', kwargs={'pk': 0}))
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_not_found_with_etag(self):
+        # An ETag from another game of the group doesn't match.
+        etag = self.client.get(reverse('api_game', kwargs={
+            'group_pk': self.group.pk,
+            'game_pk': self.game.pk,
+        }))['ETag']
+
+        response = self.client.get(reverse('api_game', kwargs={
+            'group_pk': self.group.pk,
+            'game_pk': self.game.pk + 1,
+        }), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_ignored_params(self):
+        url = reverse('api_group_games', kwargs={'pk': self.group.pk})
+        self.client.get(url)
+
+        # Unknown parameters, however long, share the cached response.
+        before = cache_stats()
+        response = self.client.get(url, {'_': 'x' * 1000})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(cache_stats()['misses'], before['misses'])
+
+        before = cache_stats()
+        self.client.get(url, {'status': 'active'})
+        self.assertEqual(cache_stats()['misses'], before['misses'] + 1)
+
+
+class KeysetPageTests(TestCase):
+    """Check paging through games visits each of them once, in order."""
+
+    def test_pages(self):
+        now = timezone.now()
+        for i in range(7):
+            game = Game.objects.create()
+            # Pairs of games share a date_time, to check the pk tiebreak.
+            Game.objects.filter(pk=game.pk).update(
+                date_time=now - timedelta(minutes=i // 2))
+
+        expected = list(Game.objects.order_by('-date_time', '-pk'))
+        games = []
+        cursor = None
+
+        while True:
+            page, cursor = keyset_page(Game.objects.all(), cursor, 3)
+            games.extend(page)
+
+            if not cursor:
+                break
+
+        self.assertEqual(games, expected)
+
+    def test_invalid_cursor(self):
+        for cursor in (
+                'not-a-cursor', '99999999999999999999_1',
+                '-99999999999999999999_1'):
+            with self.subTest(cursor=cursor):
+                with self.assertRaises(Http404):
+                    keyset_page(Game.objects.all(), cursor, 3)
+
+
+@override_settings(STATICFILES_STORAGE=STATICFILES_STORAGE)
+class FragmentCacheTests(TransactionTestCase):
+    """Check group pages are cached until the group changes."""
+
+    def setUp(self):
+        cache.clear()
+        self.players = [
+            User.objects.create(username=f'player{i}').player
+            for i in range(2)
+        ]
+        self.group = Group.objects.create(name='Group')
+        self.group.players.add(*self.players)
+        self.url = reverse('group', kwargs={'pk': self.group.pk})
+
+    def get_group(self):
+        """Get the group page, returning the cache hits and misses."""
+        before = cache_stats()
+        response = self.client.get(self.url)
+        after = cache_stats()
+
+        return response, {
+            key: after[key] - before[key] for key in ('hits', 'misses')}
+
+    def assertInvalidates(self, change):
+        self.get_group()
+        change()
+        _, stats = self.get_group()
+        self.assertEqual(stats['misses'], 3)
+
+    def check_backend(self):
+        _, stats = self.get_group()
+        self.assertEqual(stats, {'hits': 0, 'misses': 3})
+
+        response, stats = self.get_group()
+        self.assertEqual(stats, {'hits': 3, 'misses': 0})
+        self.assertContains(response, 'player1')
+
+    def test_locmem(self):
+        self.check_backend()
+
+    def test_file_based(self):
+        with tempfile.TemporaryDirectory() as location:
+            with self.settings(CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': location,
+            }}):
+                self.check_backend()
+
+    def test_game_invalidates(self):
+        def create_game():
+            game = Game.objects.create()
+            game.players.add(*self.players)
+            self.group.games.add(game)
+
+        self.assertInvalidates(create_game)
+
+    def test_finished_game_invalidates(self):
+        game = Game.objects.create()
+        game.players.add(*self.players)
+        self.group.games.add(game)
+
+        def finish_game():
+            game.active = False
+            game.winner = self.players[0]
+            game.save()
+
+        self.assertInvalidates(finish_game)
+
+    def test_invalidates_on_commit(self):
+        game = Game.objects.create()
+        game.players.add(*self.players)
+        self.group.games.add(game)
+        self.get_group()
+
+        with transaction.atomic():
+            game.active = False
+            game.winner = self.players[0]
+            game.save()
+
+            # Until the game commits, the page is what other requests see.
+            _, stats = self.get_group()
+            self.assertEqual(stats, {'hits': 3, 'misses': 0})
+
+        _, stats = self.get_group()
+        self.assertEqual(stats['misses'], 3)
+
+    def test_members_invalidate(self):
+        self.assertInvalidates(lambda: self.players[0].group_set.remove(
+            self.group))
+
+    def test_group_invalidates(self):
+        def rename():
+            self.group.name = 'Renamed'
+            self.group.save()
+
+        self.assertInvalidates(rename)
+
+    def test_user_invalidates(self):
+        def rename():
+            self.players[0].user.username = 'renamed'
+            self.players[0].user.save()
+
+        self.assertInvalidates(rename)
+
+    def test_other_groups_stay_cached(self):
+        self.get_group()
+        Group.objects.create(name='Other').players.add(*self.players)
+
+        _, stats = self.get_group()
+        self.assertEqual(stats, {'hits': 3, 'misses': 0})
+
+
+class SeedLeagueTests(TestCase):
+    """Check seed_league generates the same league for the same seed."""
+
+    options = {
+        'users': 6,
+        'groups': 2,
+        'memberships': 10,
+        'games': 30,
+        'active_games': 2,
+        'stdout': StringIO(),
+    }
+
+    def league(self):
+        return list(Game.objects.order_by('date_time').values_list(
+            'date_time',
+            'active',
+            'winner__user__username',
+            'home_score',
+            'away_score',
+        ))
+
+    def test_seed_league(self):
+        call_command('seed_league', seed=1, **self.options)
+
+        self.assertEqual(Player.objects.count(), 6)
+        self.assertEqual(Game.objects.filter(active=False).count(), 30)
+        self.assertEqual(RankChange.objects.count(), 60)
+        self.assertEqual(
+            GroupRanking.objects.count(),
+            Group.players.through.objects.count(),
+        )
+        self.assertEqual(
+            Player.objects.aggregate(wins=Sum('wins'))['wins'], 30)
+
+        league = self.league()
+        User.objects.all().delete()
+        Game.objects.all().delete()
+        Group.objects.all().delete()
+
+        call_command('seed_league', seed=1, **self.options)
+        self.assertEqual(self.league(), league)
+
+    def test_existing_prefix(self):
+        call_command('seed_league', **self.options)
+
+        with self.assertRaises(CommandError):
+            call_command('seed_league', **self.options)
+
+
+class RequestStatsTests(SimpleTestCase):
+    """Check the rolling request timings."""
+
+    def test_summary(self):
+        request_stats = RequestStats(window=3)
+        for total in range(10):
+            request_stats.add('slow', (total, 1, 2, 3))
+        request_stats.add('fast', (1, 0, 1, 0))
+
+        slow, fast = request_stats.summary()
+        self.assertEqual((slow['name'], slow['requests']), ('slow', 3))
+        self.assertEqual(slow['total_ms_p50'], 8)
+        self.assertAlmostEqual(slow['total_ms_p99'], 8.98)
+        self.assertEqual(slow['queries_p95'], 2)
+        self.assertEqual((fast['name'], fast['total_ms_p95']), ('fast', 1))
+
+
+@override_settings(
+    STATICFILES_STORAGE=STATICFILES_STORAGE,
+    PERFORMANCE_SAMPLE_RATE=1,
+)
+class PerformanceMiddlewareTests(TestCase):
+    """Check the sampled requests are timed."""
+
+    def setUp(self):
+        cache.clear()
+        stats.clear()
+        self.addCleanup(stats.clear)
+        self.player = User.objects.create(username='player').player
+        self.group = Group.objects.create(name='Group')
+        self.group.players.add(self.player)
+        self.client.force_login(self.player.user)
+
+    def test_server_timing(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse('group', kwargs={'pk': self.group.pk}))
+
+        timings = dict(
+            timing.split(';', 1)
+            for timing in response['Server-Timing'].split(', ')
+        )
+        self.assertEqual(set(timings), {'sql', 'render', 'total'})
+        self.assertIn(f'desc="{len(queries)} queries"', timings['sql'])
+
+        [page] = stats.summary()
+        self.assertEqual((page['name'], page['requests']), ('group', 1))
+        self.assertEqual(page['queries_p50'], len(queries))
+        self.assertGreater(page['render_ms_p50'], 0)
+        self.assertGreaterEqual(page['total_ms_p50'], page['sql_ms_p50'])
+
+    def test_streaming(self):
+        self.group.admins.add(self.player)
+        other = User.objects.create(username='other').player
+        game = Game.objects.create(active=False, winner=self.player)
+        game.players.add(self.player, other)
+        self.group.games.add(game)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse('export_group', kwargs={'pk': self.group.pk}))
+            self.assertEqual(stats.summary(), [])
+
+            # Timed until the last of the content is sent.
+            content = b''.join(response.streaming_content)
+            response.close()
+
+        self.assertIn(b'player', content)
+        self.assertNotIn('Server-Timing', response)
+        [page] = stats.summary()
+        self.assertEqual(page['name'], 'export_group')
+        self.assertEqual(page['queries_p50'], len(queries))
+
+    @override_settings(PERFORMANCE_SAMPLE_RATE=0)
+    def test_not_sampled(self):
+        response = self.client.get(reverse('groups'))
+
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(stats.summary(), [])
+
+    def test_staff_only(self):
+        url = reverse('performance')
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        self.client.get(reverse('groups'))
+        User.objects.filter(pk=self.player.user_id).update(is_staff=True)
+        response = self.client.get(url)
+        self.assertContains(response, '<td>groups</td>', html=False)
+
+        self.client.logout()
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+    def test_nested_timers(self):
+        with SQLTimer(debug=False) as outer:
+            Group.objects.count()
+            with SQLTimer() as inner:
+                Group.objects.count()
+
+        self.assertEqual((outer.queries, inner.queries), (2, 1))
+        self.assertNotIn('make_cursor', vars(connections[DEFAULT_DB_ALIAS]))
+
+
+class BenchmarkTests(TestCase):
+    """Check the benchmark covers every page and rolls back its changes."""
+
+    def setUp(self):
+        cache.clear()
+        call_command(
+            'seed_league',
+            users=6,
+            groups=2,
+            memberships=12,
+            games=30,
+            stdout=StringIO(),
+        )
+
+    def test_benchmark(self):
+        memberships = Group.players.through.objects.count()
+
+        with tempfile.NamedTemporaryFile('r') as output:
+            call_command(
+                'benchmark',
+                repeat=2,
+                warmup=0,
+                output=output.name,
+                stdout=StringIO(),
+            )
+            results = json.load(output)
+
+        self.assertEqual(
+            set(results['views']),
+            {pattern.name for pattern in urlpatterns},
+        )
+        for name, result in results['views'].items():
+            self.assertLess(result['status'], 400, name)
+            self.assertGreater(result['queries'], 0, name)
+
+        self.assertEqual(results['size']['games'], 50)
+        self.assertEqual(
+            Group.players.through.objects.count(), memberships)
+
+    def test_compare(self):
+        baseline = {
+            'group': {'queries': 5, 'p50_ms': 10},
+            'groups': {'queries': 5, 'p50_ms': 10},
+            'game': {'queries': 4, 'p50_ms': 10},
+        }
+        results = {
+            'group': {'queries': 6, 'p50_ms': 10},
+            'groups': {'queries': 5, 'p50_ms': 13},
+            'game': {'queries': 4, 'p50_ms': 11},
+        }
+
+        self.assertEqual(compare(baseline, results, 0.2), [
+            'group: 5 -> 6 queries',
+            'groups: p50 10ms -> 13ms',
+        ])
+
+
+class ImportGamesTests(TestCase):
+    """Check import_games rates the games like finishing them would."""
+
+    def setUp(self):
+        self.players = [
+            User.objects.create(username=f'player{i}').player
+            for i in range(3)
+        ]
+        self.group = Group.objects.create(name='Group')
+        self.group.players.add(*self.players)
+        self.rows = [
+            ['2017-01-01T10:00:00', 'Group', 'player0', 'player1', 11, 5],
+            ['2017-01-02T10:00:00', 'Group', 'player1', 'player2', 11, 9],
+            ['2017-01-03', 'Group', 'player0', 'player2', '', ''],
+        ]
+
+    def write(self, rows, suffix='.csv'):
+        output = tempfile.NamedTemporaryFile('w', suffix=suffix, delete=False)
+        self.addCleanup(os.remove, output.name)
+
+        with output:
+            if suffix == '.csv':
+                writer = csv.writer(output)
+                writer.writerow([
+                    'date_time', 'group', 'winner', 'loser',
+                    'winner_score', 'loser_score',
+                ])
+                writer.writerows(rows)
+            else:
+                for row in rows:
+                    output.write(json.dumps(dict(zip(
+                        ['date_time', 'group', 'winner', 'loser',
+                         'winner_score', 'loser_score'],
+                        row,
+                    ))) + '\n')
+
+        return output.name
+
+    def import_games(self, path, **options):
+        call_command(
+            'import_games', path, chunk_size=2, stdout=StringIO(), **options)
+
+    def expected_rankings(self):
+        rankings = {player.user.username: 1000 for player in self.players}
+
+        for row in self.rows:
+            rankings[row[2]], rankings[row[3]] = elo(
+                rankings[row[2]], rankings[row[3]], settings.ELO_WEIGHTING)
+
+        return rankings
+
+    def assertImported(self):
+        rankings = self.expected_rankings()
+
+        for player in Player.objects.select_related('user'):
+            self.assertEqual(player.ranking, rankings[player.user.username])
+
+        leaderboard = self.group.leaderboard()
+        self.assertEqual(len(leaderboard), 3)
+        for ranking in leaderboard:
+            self.assertEqual(
+                ranking.ranking, rankings[ranking.player.user.username])
+
+        player = Player.objects.get(user__username='player0')
+        self.assertEqual((player.wins, player.losses), (2, 0))
+        self.assertEqual(player.points_for, 11)
+        self.assertEqual(RankChange.objects.count(), 6)
+        self.assertEqual(
+            Game.objects.filter(active=False, group=self.group).count(), 3)
+        self.assertEqual(
+            timezone.localtime(
+                Game.objects.earliest('date_time').date_time).date().isoformat(),
+            '2017-01-01',
+        )
+
+    def test_import_csv(self):
+        self.import_games(self.write(self.rows))
+
+        self.assertImported()
+
+    def test_import_jsonl_create_missing(self):
+        User.objects.all().delete()
+        self.group.delete()
+
+        self.import_games(self.write(self.rows, '.jsonl'), create_missing=True)
+
+        self.group = Group.objects.get(name='Group')
+        self.players = list(Player.objects.all())
+        self.assertEqual(len(self.players), 3)
+        self.assertEqual(
+            set(self.group.players.all()), set(self.players))
+        self.assertImported()
+
+    def test_import_non_members(self):
+        # Players join the groups they played in, if they left.
+        self.group.players.remove(self.players[1])
+
+        self.import_games(self.write(self.rows))
+
+        self.assertTrue(
+            self.group.players.filter(pk=self.players[1].pk).exists())
+        self.assertImported()
+
+    def test_snapshots(self):
+        other = Group.objects.create(name='Other')
+        for group in (self.group, other):
+            LeaderboardSnapshot.objects.create(
+                group=group,
+                rating_engine=group.rating_engine,
+                date_time=timezone.now(),
+            )
+
+        self.import_games(self.write(self.rows))
+
+        # Only the snapshots of groups with imported games are forgotten.
+        self.assertEqual(
+            list(LeaderboardSnapshot.objects.values_list('group', flat=True)),
+            [other.pk],
+        )
+
+    def test_backfill(self):
+        # Imported games played before this one are replayed with it.
+        game = Game.objects.create(active=False, winner=self.players[2])
+        game.players.add(self.players[1], self.players[2])
+        self.group.games.add(game)
+        self.rows.append(
+            [timezone.now().isoformat(), 'Group', 'player2', 'player1', 0, 0])
+
+        self.import_games(self.write(self.rows[:-1]))
+
+        rankings = self.expected_rankings()
+        for player in Player.objects.select_related('user'):
+            self.assertEqual(player.ranking, rankings[player.user.username])
+        self.assertEqual(RankChange.objects.count(), 8)
+
+    def test_invalid(self):
+        for rows, message in [
+                (self.rows + [self.rows[0]], 'Line 5: Games must be in the order'),
+                ([self.rows[0][:2] + ['nobody'] + self.rows[0][3:]],
+                 'Line 2: Unknown players: nobody.'),
+                ([self.rows[0][:1] + ['Nowhere'] + self.rows[0][2:]],
+                 'Line 2: Unknown groups: Nowhere.')]:
+            with self.assertRaisesMessage(CommandError, message):
+                self.import_games(self.write(rows))
+
+            self.assertFalse(Game.objects.exists())
+
+
+@override_settings(STATICFILES_STORAGE=STATICFILES_STORAGE)
+class ExportGamesTests(TestCase):
+    """Check the export streams every finished game of the group."""
+
+    def setUp(self):
+        self.players = [
+            User.objects.create(username=f'player{i}').player
+            for i in range(3)
+        ]
+        self.group = Group.objects.create(name='Group')
+        self.group.players.add(*self.players)
+        self.group.admins.add(self.players[0])
+        self.client.force_login(self.players[0].user)
+
+        for winner, loser in [(0, 1), (1, 2), (2, 0)]:
+            game = Game.objects.create()
+            game.players.add(self.players[winner], self.players[loser])
+            self.group.games.add(game)
+            self.client.post(
+                reverse('finish_game', kwargs={'pk': game.pk}),
+                {'winner': self.players[winner].pk, 'home_score': 11,
+                 'away_score': winner},
+            )
+
+        # Neither unfinished games nor other groups are exported.
+        Game.objects.create().players.add(*self.players[:2])
+        self.group.games.add(Game.objects.latest('pk'))
+        other = Group.objects.create(name='Other')
+        game = Game.objects.create(active=False, winner=self.players[0])
+        game.players.add(*self.players[:2])
+        other.games.add(game)
+
+    def export(self, file_format):
+        response = self.client.get(
+            reverse('export_group', kwargs={'pk': self.group.pk}),
+            {'format': file_format},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv(self):
+        rows = list(csv.DictReader(StringIO(self.export('csv'))))
+
+        self.assertEqual(
+            [(row['winner'], row['loser'], row['loser_score']) for row in rows],
+            [('player0', 'player1', '0'), ('player1', 'player2', '1'),
+             ('player2', 'player0', '2')],
+        )
+        change = RankChange.objects.get(
+            game=rows[1]['game'], player=self.players[2])
+        self.assertEqual(float(rows[1]['loser_before']), change.before)
+        self.assertEqual(float(rows[1]['loser_after']), change.after)
+
+    def test_jsonl(self):
+        rows = [json.loads(line) for line in self.export('jsonl').splitlines()]
+
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[0]['winner_after'], 1016)
+
+    def test_round_trip(self):
+        output = StringIO()
+        call_command('export_games', self.group.pk, stdout=output)
+        exported = output.getvalue()
+
+        path = tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False)
+        self.addCleanup(os.remove, path.name)
+        with path:
+            path.write(exported)
+
+        Game.objects.all().delete()
+        call_command('rebuild_rankings', stdout=StringIO())
+        call_command('import_games', path.name, stdout=StringIO())
+
+        self.assertEqual(self.export('csv').splitlines()[0], exported.splitlines()[0])
+        self.assertEqual(
+            [row.split(',')[:10] for row in self.export('csv').splitlines()],
+            [row.split(',')[:10] for row in exported.splitlines()],
+        )
+
+    def test_admins_only(self):
+        self.client.force_login(self.players[1].user)
+
+        response = self.client.get(
+            reverse('export_group', kwargs={'pk': self.group.pk}))
+
+        self.assertEqual(response.status_code, 302)
@@ -0,0 +1,53 @@
+"""Downsampling of rating histories for charts."""
+
+import numpy as np
+
+
+def lttb(x, y, threshold):
+    """
+    :param x: Sorted array of the x values, like timestamps.
+    :param y: Array of the y values, like rankings.
+    :param threshold: The maximum number of points to keep, at least 3.
+    :return: Array of the indices of the points to keep, in order.
+
+    Largest-Triangle-Three-Buckets: the first and last points are kept,
+    the rest are split into equal buckets and the point of each bucket
+    making the largest triangle, with the point kept from the previous
+    bucket and the average of the next bucket, is kept. Peaks and
+    troughs survive, unlike with averaging or striding.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    length = len(x)
+
+    if threshold >= length or length <= 2:
+        return np.arange(length)
+
+    if threshold < 3:
+        raise ValueError('The threshold must be at least 3.')
+
+    # Bucket edges for the points between the first and the last.
+    edges = np.linspace(1, length - 1, threshold - 1).astype(int)
+    keep = np.empty(threshold, dtype=int)
+    keep[0] = 0
+    keep[-1] = length - 1
+    previous = 0
+
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+
+        # Average of the next bucket, or the last point after the last.
+        next_end = edges[i + 2] if i + 2 < len(edges) else length
+        next_x = x[end:next_end].mean()
+        next_y = y[end:next_end].mean()
+
+        # Twice the area of each candidate's triangle.
+        areas = np.abs(
+            (x[previous] - next_x) * (y[start:end] - y[previous]) -
+            (x[previous] - x[start:end]) * (next_y - y[previous])
+        )
+
+        previous = start + int(areas.argmax())
+        keep[i + 1] = previous
+
+    return keep
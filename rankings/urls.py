@@ -2,15 +2,34 @@
 
 from django.conf.urls import url
 
+from rankings.api import (
+    GameAPIView,
+    GroupAPIView,
+    GroupGamesAPIView,
+    GroupPredictionsAPIView,
+    GroupsAPIView,
+    PlayerAPIView,
+)
 from rankings.views import (
+    CreateFixturesView,
     CreateGameView,
     EditGroupView,
+    ExportGroupView,
     FinishGameView,
+    GameScoreView,
     GameView,
+    GroupGamesView,
+    GroupLeaderboardView,
+    GroupPredictionsView,
     GroupView,
     GroupsView,
     IndexView,
     JoinGroupView,
+    LiveGameView,
+    MatchmakingView,
+    PerformanceView,
+    PlayerGamesView,
+    PlayerRatingsView,
     PlayerView,
 )   
 
@@ -35,6 +54,26 @@ urlpatterns = [
         GroupView.as_view(),
         name='group',
     ),
+    url(
+        r'^groups/(?P<pk>\d+)/games/$',
+        GroupGamesView.as_view(),
+        name='group_games',
+    ),
+    url(
+        r'^groups/(?P<pk>\d+)/leaderboard/$',
+        GroupLeaderboardView.as_view(),
+        name='group_leaderboard',
+    ),
+    url(
+        r'^groups/(?P<pk>\d+)/predictions/$',
+        GroupPredictionsView.as_view(),
+        name='group_predictions',
+    ),
+    url(
+        r'^groups/(?P<pk>\d+)/matchmaking/$',
+        MatchmakingView.as_view(),
+        name='matchmaking',
+    ),
     url(
         r'^groups/(?P<pk>\d+)/join/$',
         JoinGroupView.as_view(),
@@ -45,19 +84,84 @@ urlpatterns = [
         GameView.as_view(),
         name='game',
     ),
+    url(
+        r'^groups/(?P<group_pk>\d+)/game/(?P<game_pk>\d+)/live/$',
+        LiveGameView.as_view(),
+        name='live_game',
+    ),
+    url(
+        r'^groups/(?P<group_pk>\d+)/game/(?P<game_pk>\d+)/score/$',
+        GameScoreView.as_view(),
+        name='game_score',
+    ),
     url(
         r'groups/(?P<pk>\d+)/create_game/$',
         CreateGameView.as_view(),
         name='create_game',
     ),
+    url(
+        r'^groups/(?P<pk>\d+)/fixtures/$',
+        CreateFixturesView.as_view(),
+        name='create_fixtures',
+    ),
     url(
         r'^groups/edit_group/(?P<pk>\d+)/$',
         EditGroupView.as_view(),
         name='edit_group',
     ),
+    url(
+        r'^groups/(?P<pk>\d+)/export/$',
+        ExportGroupView.as_view(),
+        name='export_group',
+    ),
     url(
         r'^players/(?P<pk>\d+)/$',
         PlayerView.as_view(),
         name='player_profile',
     ),
+    url(
+        r'^players/(?P<pk>\d+)/games/$',
+        PlayerGamesView.as_view(),
+        name='player_games',
+    ),
+    url(
+        r'^players/(?P<pk>\d+)/ratings/$',
+        PlayerRatingsView.as_view(),
+        name='player_ratings',
+    ),
+    url(
+        r'^performance/$',
+        PerformanceView.as_view(),
+        name='performance',
+    ),
+    url(
+        r'^api/groups/$',
+        GroupsAPIView.as_view(),
+        name='api_groups',
+    ),
+    url(
+        r'^api/groups/(?P<pk>\d+)/$',
+        GroupAPIView.as_view(),
+        name='api_group',
+    ),
+    url(
+        r'^api/groups/(?P<pk>\d+)/games/$',
+        GroupGamesAPIView.as_view(),
+        name='api_group_games',
+    ),
+    url(
+        r'^api/groups/(?P<pk>\d+)/predictions/$',
+        GroupPredictionsAPIView.as_view(),
+        name='api_group_predictions',
+    ),
+    url(
+        r'^api/groups/(?P<group_pk>\d+)/games/(?P<game_pk>\d+)/$',
+        GameAPIView.as_view(),
+        name='api_game',
+    ),
+    url(
+        r'^api/players/(?P<pk>\d+)/$',
+        PlayerAPIView.as_view(),
+        name='api_player',
+    ),
 ]
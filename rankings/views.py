@@ -1,15 +1,59 @@
 """Views for Table Tennis Rankings."""
 
-from django.contrib.auth.mixins import LoginRequiredMixin
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib.messages.views import SuccessMessageMixin
-from django.http import HttpResponseRedirect
+from django.core.exceptions import PermissionDenied
+from django.db import transaction
+from django.db.models import Prefetch
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponseRedirect,
+    JsonResponse,
+    StreamingHttpResponse,
+)
 from django.shortcuts import render, get_object_or_404
-from django.urls import reverse_lazy
+from django.template.loader import render_to_string
+from django.urls import reverse, reverse_lazy
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.http import urlencode
+from django.utils.safestring import mark_safe
 from django.views.generic import TemplateView, View
-from django.views.generic.edit import CreateView, UpdateView
-
-from rankings.forms import RegistrationForm
-from rankings.models import Game, Group, Player, RankChange
+from django.views.generic.edit import CreateView, FormView, UpdateView
+
+from rankings.cache import cached, group_name, invalidate_groups
+from rankings.corrections import correct_game
+from rankings.engines import RatingEngine
+from rankings.export import CONTENT_TYPES, export_lines
+from rankings.fixtures import elimination_round, round_robin
+from rankings.forms import FixturesForm, LeaderboardForm, RegistrationForm
+from rankings.history import insert_games
+from rankings.live import (
+    GameStream,
+    broker,
+    game_message,
+    latest_message,
+    publish_game,
+)
+from rankings.matchmaking import pair_players, rematches
+from rankings.membership import get_membership
+from rankings.middleware import stats
+from rankings.models import Game, Group, GroupRanking, Player, RankChange
+from rankings.pagination import EPOCH, keyset_page
+from rankings.predictions import balanced_matchups, win_probabilities
+from rankings.snapshots import leaderboard_as_of
+from rankings.timeseries import lttb
+
+
+def render_fragment(template_name, context):
+    """Render part of a page, an empty string when there's nothing in it."""
+
+    return mark_safe(render_to_string(template_name, context).strip())
 
 
 class BaseLoginMixin(LoginRequiredMixin):
@@ -18,6 +62,20 @@ class BaseLoginMixin(LoginRequiredMixin):
     login_url = reverse_lazy('ranking_login')
 
 
+class StaffLoginMixin(BaseLoginMixin, UserPassesTestMixin):
+    """Simple mixin to restrict pages to staff."""
+
+    def test_func(self):
+        return self.request.user.is_staff
+
+    def handle_no_permission(self):
+        # Logging in again won't help anyone already logged in.
+        if self.request.user.is_authenticated:
+            raise PermissionDenied
+
+        return super(StaffLoginMixin, self).handle_no_permission()
+
+
 class GroupAdminLoginMixin(BaseLoginMixin):
     """Simple mixin to restrict editing groups to group admins."""
 
@@ -25,14 +83,116 @@ class GroupAdminLoginMixin(BaseLoginMixin):
         if not request.user.is_authenticated:
             return self.handle_no_permission()
 
-        group = get_object_or_404(Group, id=kwargs.get('pk', None))
+        membership = get_membership(request)
+        group = membership.get_group(kwargs.get('pk', None))
 
-        if not request.user.player in group.admins.all():
+        if not membership.is_admin(group):
             return self.handle_no_permission()
 
+        self.group = group
+
         return super().dispatch(request, *args, **kwargs)
 
 
+class GamePagesMixin(object):
+    """Split a list of games into pages of active and completed games."""
+
+    games_url_name = None
+
+    def get_games(self):
+        """The QuerySet of games to paginate."""
+        raise NotImplementedError
+
+    def game_items(self, games):
+        """Pair each game with the group it was played in."""
+        items = []
+
+        for game in games:
+            if game.group:
+                items.append({
+                    'group': game.group,
+                    'game': game,
+                })
+
+        return items
+
+    def get_game_page(self, active, cursor=None):
+        """
+        :param active: Whether to list active or completed games.
+        :param cursor: Cursor of the previous page, or None for the first.
+        :return: Dict of the page's game 'items' and the 'next_url' to
+        load the following page from.
+        """
+        games = self.get_games().filter(
+            active=active,
+        ).select_related('winner')
+
+        games, next_cursor = keyset_page(
+            games, cursor, settings.GAMES_PAGE_SIZE)
+
+        next_url = None
+        if next_cursor:
+            query = urlencode({
+                'status': 'active' if active else 'completed',
+                'after': next_cursor,
+            })
+            url = reverse(self.games_url_name, kwargs={'pk': self.kwargs['pk']})
+            next_url = f'{url}?{query}'
+
+        return {
+            'items': self.game_items(games),
+            'next_url': next_url,
+        }
+
+
+class GamesPageMixin(GamePagesMixin):
+    """Render the next page of games, for the 'load more' links."""
+
+    template_name = 'rankings/includes/game_rows.html'
+
+    def get_context_data(self, **kwargs):
+        context = super(GamesPageMixin, self).get_context_data(**kwargs)
+
+        status = self.request.GET.get('status')
+        if status not in ('active', 'completed'):
+            raise Http404('Unknown game status.')
+
+        context.update(self.get_game_page(
+            status == 'active',
+            self.request.GET.get('after'),
+        ))
+
+        return context
+
+
+class GroupGamesMixin(GamePagesMixin):
+    """Paginate the games played in a group."""
+
+    games_url_name = 'group_games'
+
+    def dispatch(self, request, *args, **kwargs):
+        self.group = get_object_or_404(Group, id=kwargs.get('pk', None))
+
+        return super(GroupGamesMixin, self).dispatch(request, *args, **kwargs)
+
+    def get_games(self):
+        return Game.objects.filter(group=self.group)
+
+    def game_items(self, games):
+        return [{'group': self.group, 'game': game} for game in games]
+
+
+class PlayerGamesMixin(GamePagesMixin):
+    """Paginate the games a player has played."""
+
+    games_url_name = 'player_games'
+
+    def get_games(self):
+        return Game.objects.filter(
+            players=self.kwargs.get('pk', None),
+        ).select_related('group')
+
+
 class IndexView(TemplateView):
     """Main view for site."""
 
@@ -47,48 +207,112 @@ class RegisterView(CreateView):
     success_url = reverse_lazy('ranking_login')
 
 
-class PlayerView(BaseLoginMixin, TemplateView):
+class PlayerView(BaseLoginMixin, PlayerGamesMixin, TemplateView):
     """View a single player and all it's games."""
 
     template_name = 'rankings/players/player.html'
 
     def get_context_data(self, **kwargs):
-        """Compile a list of games for the player."""
+        """Compile the first page of games for the player."""
 
         context = super(PlayerView, self).get_context_data(**kwargs)
 
-        player = get_object_or_404(Player, id=self.kwargs.get('pk', None))
-
-        active_games = []
-        completed_games = []
-
-        for game in player.games.all().order_by('-date_time'):
-            group = game.group_set.first()
-            
-            if not group:
-                continue
-
-            if game.active:
-                active_games.append({
-                    'group': group,
-                    'game': game,    
-                })
-            else:
-                completed_games.append({
-                    'group': group,
-                    'game': game,
-                })
+        player = get_object_or_404(
+            Player,
+            id=self.kwargs.get('pk', None),
+        )
 
         context.update({
             'player': player,
-            'groups': player.group_set.all(),
-            'active_games': active_games,
-            'completed_games': completed_games,
+            'groups': player.group_set.prefetch_related('admins'),
+            'active_games': self.get_game_page(active=True),
+            'completed_games': self.get_game_page(active=False),
         })
 
         return context
 
 
+class PlayerGamesView(BaseLoginMixin, PlayerGamesMixin, GamesPageMixin,
+                      TemplateView):
+    """Load more of a player's games."""
+
+
+class PlayerRatingsView(BaseLoginMixin, View):
+    """
+    A player's rating history, as JSON for charts.
+
+    Takes optional 'start' and 'end' dates (or date times) for the
+    window, and the maximum number of 'points' to return. Long
+    histories are downsampled, keeping their peaks and troughs.
+    """
+
+    def get(self, request, *args, **kwargs):
+        try:
+            start = self.parse_time('start')
+            end = self.parse_time('end')
+        except ValueError as error:
+            return JsonResponse({'error': str(error)}, status=400)
+
+        points = request.GET.get('points', '')
+        if points.isdigit():
+            points = max(3, min(int(points), settings.RATING_HISTORY_POINTS))
+        else:
+            points = settings.RATING_HISTORY_POINTS
+
+        # One scan of the (player, date_time) index.
+        changes = RankChange.objects.filter(
+            player=kwargs['pk'],
+        ).order_by(
+            'date_time',
+        ).values_list(
+            'date_time',
+            'after',
+        )
+        if start:
+            changes = changes.filter(date_time__gte=start)
+        if end:
+            changes = changes.filter(date_time__lt=end)
+
+        changes = list(changes)
+
+        if not changes and not Player.objects.filter(pk=kwargs['pk']).exists():
+            raise Http404('No player found.')
+
+        times = [
+            (date_time - EPOCH) // timedelta(milliseconds=1)
+            for date_time, _ in changes
+        ]
+        rankings = [ranking for _, ranking in changes]
+
+        return JsonResponse({
+            'player': int(kwargs['pk']),
+            'count': len(changes),
+            'points': [
+                [times[i], rankings[i]]
+                for i in lttb(times, rankings, points).tolist()
+            ],
+        })
+
+    def parse_time(self, name):
+        """Parse a date or date time query parameter, None when missing."""
+
+        value = self.request.GET.get(name)
+        if not value:
+            return None
+
+        date_time = parse_datetime(value)
+        if date_time is None:
+            date = parse_date(value)
+            if date is None:
+                raise ValueError(f'Invalid {name}, use YYYY-MM-DD.')
+            date_time = datetime.combine(date, time())
+
+        if timezone.is_naive(date_time):
+            date_time = timezone.make_aware(date_time)
+
+        return date_time
+
+
 class GameView(TemplateView):
     """View for a single game for a given group."""
 
@@ -97,16 +321,21 @@ class GameView(TemplateView):
     def get_context_data(self, **kwargs):
         context = super(GameView, self).get_context_data(**kwargs)
 
-        group = get_object_or_404(Group, id=self.kwargs.get('group_pk', None))
-        game = get_object_or_404(Game, id=self.kwargs.get('game_pk', None))
-        players = game.players.order_by('-ranking')
-        for player in players:
-            try:
-                rank_change = str(player.rankchange_set.get(game=game))
-            except RankChange.DoesNotExist:
-                rank_change = 'not available'
-
-            setattr(player, 'rank_change', rank_change)
+        game = get_object_or_404(
+            Game.objects.select_related('winner', 'group'),
+            id=self.kwargs.get('game_pk', None),
+            group=self.kwargs.get('group_pk', None),
+        )
+        group = game.group
+        # Two queries however many players, one for the players and one
+        # for all of their changes in this game.
+        players = game.players.prefetch_related(
+            Prefetch(
+                'rankchange_set',
+                queryset=RankChange.objects.filter(game=game),
+                to_attr='game_rank_changes',
+            ),
+        ).order_by('-ranking')
 
         context.update({
             'group': group,
@@ -114,9 +343,116 @@ class GameView(TemplateView):
             'players': players,
         })
 
+        if game.active:
+            # The live score, in the order of the players' pks.
+            context['scoreboard'] = zip(
+                sorted(players, key=lambda player: player.pk),
+                [game.home_points, game.away_points],
+            )
+            context['live_poll_ms'] = settings.LIVE_SCORE_POLL_SECONDS * 1000
+
         return context
 
 
+class LiveGameView(View):
+    """Stream the live score of a game as server-sent events."""
+
+    def get(self, request, *args, **kwargs):
+        game_pk = int(kwargs['game_pk'])
+        message = latest_message(game_pk)
+
+        if not message or message['group'] != int(kwargs['group_pk']):
+            raise Http404('No such game in the group.')
+
+        # Each stream holds a thread, leave the rest for the other pages.
+        # The page polls the score instead.
+        subscription = broker.subscribe(
+            game_pk, message, settings.LIVE_SCORE_MAX_STREAMS)
+        if subscription is None:
+            response = HttpResponse(
+                'Too many live scores are being watched, try again later.',
+                content_type='text/plain',
+                status=503,
+            )
+            response['Retry-After'] = settings.LIVE_SCORE_STREAM_SECONDS
+
+            return response
+
+        response = StreamingHttpResponse(
+            GameStream(game_pk, *subscription),
+            content_type='text/event-stream',
+        )
+        response['Cache-Control'] = 'no-cache'
+        # Don't let nginx hold back the events.
+        response['X-Accel-Buffering'] = 'no'
+
+        return response
+
+
+class GameScoreView(View):
+    """
+    The live score of a game in progress, as JSON.
+
+    Posting the pk of one of the game's 'player's adds a point to their
+    score, or takes one off with 'points' of -1, and pushes the new
+    score to everyone watching the game. Posts from the game page without
+    javascript are redirected back to it.
+    """
+
+    def get(self, request, *args, **kwargs):
+        message = latest_message(int(kwargs['game_pk']))
+
+        if not message or message['group'] != int(kwargs['group_pk']):
+            raise Http404('No such game in the group.')
+
+        return JsonResponse(message)
+
+    def post(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': 'Please log in.'}, status=403)
+
+        player = request.POST.get('player', '')
+        points = request.POST.get('points', '1')
+        if not player.isdigit() or points not in ('1', '-1'):
+            return JsonResponse({'error': 'Invalid point.'}, status=400)
+
+        with transaction.atomic():
+            # Lock the game so points scored together are all counted.
+            game = get_object_or_404(
+                Game.objects.select_for_update(),
+                id=kwargs['game_pk'],
+                group=kwargs['group_pk'],
+            )
+            if not game.active:
+                return JsonResponse(
+                    {'error': 'The game is finished.'}, status=400)
+
+            player_pks = list(game.players.order_by('pk').values_list(
+                'pk', flat=True))
+            if int(player) not in player_pks:
+                return JsonResponse(
+                    {'error': 'Not a player in the game.'}, status=400)
+
+            field = ['home_points', 'away_points'][player_pks.index(int(player))]
+            setattr(game, field, max(0, getattr(game, field) + int(points)))
+
+            # Update the points alone, the cached pages don't show them.
+            Game.objects.filter(pk=game.pk).update(
+                **{field: getattr(game, field)})
+
+        message = game_message(game, player_pks)
+        publish_game(message)
+
+        # Without javascript, the scoreboard's forms post here directly.
+        if not request.is_ajax():
+            return HttpResponseRedirect(reverse('game', kwargs={
+                'group_pk': game.group_id,
+                'game_pk': game.pk,
+            }))
+
+        return JsonResponse(message)
+
+
 class CreateGameView(BaseLoginMixin, CreateView):
     """Create a game for the given group."""
 
@@ -135,11 +471,13 @@ class CreateGameView(BaseLoginMixin, CreateView):
             return self.form_invalid(form)
 
         # Otherwise, connect the game to the group.
-        self.object = form.save()
         group = get_object_or_404(Group, id=self.kwargs.get('pk', None))
+        self.object = form.save(commit=False)
+        self.object.group = group
+        self.object.save()
+        form.save_m2m()
 
         group.games.add(self.object)
-        group.save()
 
         return HttpResponseRedirect(self.get_success_url())
 
@@ -153,8 +491,134 @@ class CreateGameView(BaseLoginMixin, CreateView):
         )
 
 
+class MatchmakingView(BaseLoginMixin, View):
+    """
+    Suggest games between the players waiting to play in a group, as
+    JSON.
+
+    Takes the pks of the 'players' present, by default every member,
+    and pairs them by ranking, avoiding the pairs that have played each
+    other in the group recently.
+    """
+
+    def get(self, request, *args, **kwargs):
+        group = get_object_or_404(Group, id=kwargs['pk'])
+
+        pks = request.GET.getlist('players')
+        if not all(pk.isdigit() for pk in pks):
+            return JsonResponse({'error': 'Invalid players.'}, status=400)
+
+        rankings = group.rankings.filter(member=True).select_related('player')
+        if pks:
+            rankings = rankings.filter(player__in=pks)
+        rankings = {ranking.player_id: ranking for ranking in rankings}
+
+        missing = {int(pk) for pk in pks} - set(rankings)
+        if missing:
+            return JsonResponse({
+                'error': 'Not members of the group: ' +
+                ', '.join(str(pk) for pk in sorted(missing)),
+            }, status=400)
+
+        since = timezone.now() - timedelta(
+            hours=settings.MATCHMAKING_REMATCH_HOURS)
+        recent = rematches(Game.players.through.objects.filter(
+            game__group=group,
+            game__date_time__gte=since,
+            player__in=rankings,
+        ).values_list('game_id', 'player_id'))
+
+        pairs, bye = pair_players(
+            {pk: ranking.ranking for pk, ranking in rankings.items()},
+            recent,
+            settings.MATCHMAKING_REMATCH_PENALTY,
+        )
+
+        def player_data(pk):
+            return {
+                'id': pk,
+                'name': rankings[pk].player.name,
+                'ranking': rankings[pk].ranking,
+            }
+
+        return JsonResponse({
+            'pairs': [
+                {
+                    'players': [player_data(pk), player_data(opponent_pk)],
+                    'gap': abs(
+                        rankings[pk].ranking - rankings[opponent_pk].ranking),
+                    'recent_games': recent.get(
+                        frozenset((pk, opponent_pk)), 0),
+                }
+                for pk, opponent_pk in pairs
+            ],
+            'bye': player_data(bye) if bye is not None else None,
+        })
+
+
+class CreateFixturesView(GroupAdminLoginMixin, FormView):
+    """
+    Create the games of a tournament between a group's players.
+
+    Round robins create every game at once. Single elimination creates
+    the first round, seeded by the group rankings, run it again with
+    the players left in for each following round.
+    """
+
+    template_name = 'rankings/groups/create_fixtures.html'
+    form_class = FixturesForm
+
+    def get_form_kwargs(self):
+        kwargs = super(CreateFixturesView, self).get_form_kwargs()
+        kwargs['group'] = self.group
+
+        return kwargs
+
+    def get_context_data(self, **kwargs):
+        context = super(CreateFixturesView, self).get_context_data(**kwargs)
+        context['group'] = self.group
+
+        return context
+
+    def form_valid(self, form):
+        rankings = dict(self.group.rankings.filter(
+            player__in=form.cleaned_data['players'],
+        ).values_list('player_id', 'ranking'))
+        seeds = sorted(
+            (player.pk for player in form.cleaned_data['players']),
+            key=lambda pk: (-rankings.get(pk, 0), pk),
+        )
+
+        byes = []
+        if form.cleaned_data['format'] == 'round_robin':
+            pairs = [pair for pairs in round_robin(seeds) for pair in pairs]
+        else:
+            pairs, byes = elimination_round(seeds)
+
+        # A few bulk inserts, rather than saving each game.
+        now = timezone.now()
+        with transaction.atomic():
+            insert_games(Game, [
+                {'date_time': now, 'group': self.group.pk, 'players': pair}
+                for pair in pairs
+            ])
+
+        # The bulk inserts skip the signals that invalidate the caches.
+        invalidate_groups([self.group.pk])
+
+        message = f'Created {len(pairs)} games.'
+        if byes:
+            names = Player.objects.in_bulk(byes)
+            message += ' Through to the next round: ' + ', '.join(
+                str(names[pk]) for pk in byes) + '.'
+        messages.success(self.request, message)
+
+        return HttpResponseRedirect(
+            reverse('group', kwargs={'pk': self.group.pk}))
+
+
 class FinishGameView(BaseLoginMixin, UpdateView):
-    """Finish a game for the given group."""
+    """Finish a game for the given group, or correct a finished one."""
 
     template_name = 'rankings/groups/edit_game.html'
     model = Game
@@ -164,57 +628,156 @@ class FinishGameView(BaseLoginMixin, UpdateView):
         'away_score',
     ]
 
+    def get_object(self, queryset=None):
+        """Only the group admins can correct a finished game."""
+        game = super(FinishGameView, self).get_object(queryset)
+
+        if not game.active and not (
+                game.group_id and
+                get_membership(self.request).is_admin(game.group_id)):
+            raise PermissionDenied(
+                'The game is finished, only the group admins can correct it.')
+
+        return game
+
     def get_form(self):
         """Restrict the choices for the winner field."""
         form = super(FinishGameView, self).get_form()
 
-        game = get_object_or_404(Game, id=self.kwargs.get('pk', None))
-
-        form.fields['winner'].queryset = game.players
+        form.fields['winner'].queryset = self.object.players.all()
 
         return form
 
     def form_valid(self, form):
-        game = form.save(commit=False)
-        # Only update the game and rankings if it's active.
-        if game.active:
-            # Update each player's ranking.
-            player_1 = game.players.first()
-            player_2 = game.players.last()
-
-            loser = player_1 if player_1 != game.winner else player_2
-
-            player_1_change = RankChange(game=game, player=player_1,
-                                         before=player_1.ranking)
-            player_2_change = RankChange(game=game, player=player_2,
-                                         before=player_2.ranking)
-            Player.update_rankings(
-                game.winner,
-                loser
-            )
-            # Players were saved through
-            # winner/loser instances, must reload.
-            player_1.refresh_from_db()
-            player_2.refresh_from_db()
+        if not form.cleaned_data['winner']:
+            form.add_error('winner', 'Please select the winner.')
+            return self.form_invalid(form)
 
-            player_1_change.after = player_1.ranking
-            player_2_change.after = player_2.ranking
+        with transaction.atomic():
+            # Lock the game so it can only be finished once.
+            game = Game.objects.select_for_update().get(pk=self.object.pk)
+
+            # Only update the game and rankings if it's active.
+            if game.active:
+                # Lock both players, in a consistent order, so concurrent
+                # games can't overwrite each other's ranking changes.
+                players = Player.objects.select_for_update().filter(
+                    games=game,
+                ).order_by('pk')
+
+                winner = form.cleaned_data['winner']
+                winner, loser = sorted(
+                    players, key=lambda player: player.pk != winner.pk)
+
+                changes = [
+                    RankChange(
+                        game=game,
+                        player=player,
+                        before=player.ranking,
+                        date_time=game.date_time,
+                    )
+                    for player in (winner, loser)
+                ]
+
+                winner_score = form.cleaned_data['home_score']
+                loser_score = form.cleaned_data['away_score']
+                Player.update_rankings(winner, loser, winner_score, loser_score)
+
+                changes[0].after = winner.ranking
+                changes[1].after = loser.ranking
+                RankChange.objects.bulk_create(changes)
+
+                self.update_group_rankings(
+                    game, winner, loser, winner_score, loser_score)
+
+                # Mark the game as finished.
+                game.winner = winner
+                game.home_score = winner_score
+                game.away_score = loser_score
+                game.active = False
+                game.save()
+
+                publish = game_message(game, [player.pk for player in players])
+            else:
+                publish = None
+                self.correct_game(game, form)
 
-            player_1_change.save()
-            player_2_change.save()
-            # Mark the game as finished.
-            game.active = False
-            game.save()
+        # Let anyone watching the live score know it's over.
+        if publish:
+            publish_game(publish)
 
         return HttpResponseRedirect(self.get_success_url())
 
+    def correct_game(self, game, form):
+        """
+        Correct the result of a finished game, for its group's admins.
+        Checked again, as the game can have been finished since it was
+        loaded.
+        """
+
+        membership = get_membership(self.request)
+        if not (game.group_id and membership.is_admin(game.group_id)):
+            messages.error(
+                self.request,
+                'The game is finished, only the group admins can correct it.',
+            )
+            return
+
+        games = correct_game(
+            game,
+            form.cleaned_data['winner'],
+            form.cleaned_data['home_score'],
+            form.cleaned_data['away_score'],
+        )
+        if games is not None:
+            messages.success(
+                self.request,
+                f'Corrected the result, re-rating {games} later games.',
+            )
+
+    def update_group_rankings(self, game, winner, loser, winner_score,
+                              loser_score):
+        """Update the rankings within the game's group, with its engine."""
+
+        group = Group.objects.filter(pk=game.group_id).first()
+        if not group:
+            return
+
+        group_rankings = {
+            ranking.player_id: ranking
+            for ranking in GroupRanking.objects.select_for_update().filter(
+                group=group,
+                player__in=[winner, loser],
+            ).order_by('player_id')
+        }
+
+        # Players outside the group are rated against from the default,
+        # or their ranking when they left, but only members are saved.
+        for player in (winner, loser):
+            if player.pk not in group_rankings:
+                group_rankings[player.pk] = GroupRanking(
+                    group=group, player=player, member=False)
+
+        # Groups rated a day at a time only record the result, the
+        # rankings change when the day is settled.
+        GroupRanking.play(
+            group_rankings[winner.pk],
+            group_rankings[loser.pk],
+            winner_score,
+            loser_score,
+            group.engine,
+        )
+        for ranking in group_rankings.values():
+            if ranking.member:
+                ranking.save(update_fields=ranking.standing_fields)
+
     def get_success_url(self):
         """Redirect back to the game."""
 
         return reverse_lazy(
             'game', 
             kwargs={
-                'group_pk': self.object.group_set.first().pk,
+                'group_pk': self.object.group_id,
                 'game_pk': self.object.pk,
             },
         )
@@ -228,12 +791,26 @@ class GroupsView(TemplateView):
     def get_context_data(self, **kwargs):
         context = super(GroupsView, self).get_context_data(**kwargs)
 
-        context['groups'] = Group.objects.all()
+        member_groups = set()
+        admin_groups = set()
+
+        if self.request.user.is_authenticated:
+            player = self.request.user.player
+            member_groups = set(player.group_set.values_list('pk', flat=True))
+            admin_groups = set(
+                player.group_admins.values_list('pk', flat=True))
+
+        context.update({
+            'groups': cached('groups', 'list', lambda: list(
+                Group.objects.order_by('pk').values('pk', 'name'))),
+            'member_groups': member_groups,
+            'admin_groups': admin_groups,
+        })
 
         return context
 
 
-class GroupView(TemplateView):
+class GroupView(GroupGamesMixin, TemplateView):
     """View a single group and all it's players."""
 
     template_name = 'rankings/groups/group.html'
@@ -241,30 +818,199 @@ class GroupView(TemplateView):
     def get_context_data(self, **kwargs):
         context = super(GroupView, self).get_context_data(**kwargs)
 
-        group = get_object_or_404(Group, id=self.kwargs.get('pk', None))
+        # The fragments are only rendered when they aren't cached.
+        name = group_name(self.group.pk)
 
         context.update({
-            'group': group,
-            'players': group.players.order_by('-ranking'),
-            'active_games': group.games.filter(active=True).order_by('-date_time'),
-            'completed_games': group.games.filter(active=False).order_by('-date_time'),
+            'group': self.group,
+            'leaderboard': cached(name, 'leaderboard', self.render_leaderboard),
+            'active_games': cached(
+                name, 'active_games', lambda: self.render_games(active=True)),
+            'completed_games': cached(
+                name, 'completed_games', lambda: self.render_games(active=False)),
+        })
+
+        return context
+
+    def render_leaderboard(self):
+        return render_fragment(
+            'rankings/includes/leaderboard.html',
+            {
+                'rankings': self.group.leaderboard(),
+                'deviations': not self.group.engine.per_game,
+            },
+        )
+
+    def render_games(self, active):
+        return render_fragment(
+            'rankings/includes/game_rows.html',
+            self.get_game_page(active),
+        )
+
+
+class GroupGamesView(GroupGamesMixin, GamesPageMixin, TemplateView):
+    """Load more of a group's games."""
+
+
+class GroupLeaderboardView(TemplateView):
+    """
+    A group's leaderboard as it stood at the end of the optional 'date',
+    for looking back, rebuilt from the nearest snapshot before it.
+    """
+
+    template_name = 'rankings/groups/leaderboard.html'
+
+    def dispatch(self, request, *args, **kwargs):
+        self.group = get_object_or_404(Group, id=kwargs.get('pk', None))
+
+        return super(GroupLeaderboardView, self).dispatch(
+            request, *args, **kwargs)
+
+    def get_context_data(self, **kwargs):
+        context = super(GroupLeaderboardView, self).get_context_data(**kwargs)
+
+        form = LeaderboardForm(self.request.GET)
+        date = form.cleaned_data['date'] if form.is_valid() else None
+
+        # Today isn't over, so it's the leaderboard as it stands.
+        if date is not None and date >= timezone.localdate():
+            date = None
+
+        # The same fragment as the group page when it's now.
+        name = group_name(self.group.pk)
+        if date is None:
+            leaderboard = cached(
+                name, 'leaderboard',
+                lambda: self.render_leaderboard(self.group.leaderboard()))
+        else:
+            date_time = RatingEngine.period_start(date.toordinal() + 1)
+            leaderboard = cached(
+                name, f'leaderboard:{date}',
+                lambda: self.render_leaderboard(
+                    leaderboard_as_of(self.group, date_time)))
+
+        context.update({
+            'group': self.group,
+            'form': form,
+            'date': date,
+            'leaderboard': leaderboard,
+        })
+
+        return context
+
+    def render_leaderboard(self, rankings):
+        return render_fragment(
+            'rankings/includes/leaderboard.html',
+            {
+                'rankings': rankings,
+                'deviations': not self.group.engine.per_game,
+            },
+        )
+
+
+class GroupPredictionsView(TemplateView):
+    """
+    Predicted results between the members of a group.
+
+    Lists the closest matchups, with a table of every pair for smaller
+    groups, and predicts the game between the optional 'player' and
+    'opponent' pks.
+    """
+
+    template_name = 'rankings/groups/predictions.html'
+
+    def dispatch(self, request, *args, **kwargs):
+        self.group = get_object_or_404(Group, id=kwargs.get('pk', None))
+
+        return super(GroupPredictionsView, self).dispatch(
+            request, *args, **kwargs)
+
+    def get_context_data(self, **kwargs):
+        context = super(GroupPredictionsView, self).get_context_data(**kwargs)
+
+        context.update({
+            'group': self.group,
+            'predictions': cached(
+                group_name(self.group.pk), 'predictions',
+                self.render_predictions),
+            'prediction': self.get_prediction(),
         })
 
         return context
 
+    def render_predictions(self):
+        rankings = list(self.group.leaderboard())
+        probabilities = win_probabilities(self.group, rankings)
+
+        matchups = [
+            {
+                'player': rankings[row].player,
+                'opponent': rankings[column].player,
+                'probability': 100 * probability,
+            }
+            for row, column, probability in balanced_matchups(
+                probabilities, settings.PREDICTION_MATCHUPS)
+        ]
+
+        table = None
+        if len(rankings) <= settings.PREDICTION_TABLE_SIZE:
+            table = [
+                (ranking.player, [100 * probability for probability in row])
+                for ranking, row in zip(rankings, probabilities.tolist())
+            ]
+
+        return render_fragment(
+            'rankings/includes/predictions.html',
+            {
+                'rankings': rankings,
+                'matchups': matchups,
+                'table': table,
+            },
+        )
+
+    def get_prediction(self):
+        """The chance 'player' beats 'opponent', when they're both members."""
+
+        pks = [
+            self.request.GET.get('player', ''),
+            self.request.GET.get('opponent', ''),
+        ]
+        if not all(pk.isdigit() for pk in pks) or pks[0] == pks[1]:
+            return None
+
+        rankings = {
+            ranking.player_id: ranking
+            for ranking in self.group.rankings.select_related(
+                'player',
+            ).filter(
+                member=True,
+                player__in=pks,
+            )
+        }
+        if len(rankings) != 2:
+            return None
+
+        rankings = [rankings[int(pk)] for pk in pks]
+
+        return {
+            'player': rankings[0].player,
+            'opponent': rankings[1].player,
+            'probability': 100 * win_probabilities(self.group, rankings)[0, 1],
+        }
+
 
 class JoinGroupView(BaseLoginMixin, View):
     """Enable logged in user to join a group."""
 
     def get(self, request, *args, **kwargs):
 
-        group = get_object_or_404(Group, id=kwargs.get('pk', None))
-
-        player = request.user.player
+        membership = get_membership(request)
+        group = membership.get_group(kwargs.get('pk', None))
 
-        if player not in group.players.all():
-            group.players.add(player)
+        if not membership.is_member(group):
+            group.players.add(request.user.player)
             group.save()
+            membership.joined(group)
 
             return HttpResponseRedirect(
                 reverse_lazy('group', kwargs={'pk': group.pk}))
@@ -272,6 +1018,27 @@ class JoinGroupView(BaseLoginMixin, View):
         return HttpResponseRedirect(reverse_lazy('groups'))
 
 
+class ExportGroupView(GroupAdminLoginMixin, View):
+    """Download every finished game of the group, as CSV or JSON lines."""
+
+    def get(self, request, *args, **kwargs):
+        file_format = request.GET.get('format', 'csv')
+        if file_format not in CONTENT_TYPES:
+            raise Http404('Unknown export format.')
+
+        group = self.group
+
+        # The games are streamed as they're read, however many there are.
+        response = StreamingHttpResponse(
+            export_lines(group, file_format),
+            content_type=CONTENT_TYPES[file_format],
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="group-{group.pk}-games.{file_format}"')
+
+        return response
+
+
 class EditGroupView(GroupAdminLoginMixin, SuccessMessageMixin, UpdateView):
     """Simple EditView for editing a group."""
     
@@ -282,6 +1049,11 @@ class EditGroupView(GroupAdminLoginMixin, SuccessMessageMixin, UpdateView):
         'players',
     ]
 
+    def get_object(self, queryset=None):
+        """The group was already loaded to check the user's an admin."""
+
+        return self.group
+
     def get_success_url(self):
         return reverse_lazy('group', kwargs={'pk': self.object.pk})
     
@@ -289,3 +1061,20 @@ class EditGroupView(GroupAdminLoginMixin, SuccessMessageMixin, UpdateView):
         name = cleaned_data.get('name')
 
         return f'{name} was edited successfully'
+
+
+class PerformanceView(StaffLoginMixin, TemplateView):
+    """The rolling request timings of this process, for staff."""
+
+    template_name = 'rankings/performance.html'
+
+    def get_context_data(self, **kwargs):
+        context = super(PerformanceView, self).get_context_data(**kwargs)
+
+        context.update({
+            'pages': stats.summary(),
+            'sample_rate': 100 * settings.PERFORMANCE_SAMPLE_RATE,
+            'window': settings.PERFORMANCE_WINDOW,
+        })
+
+        return context